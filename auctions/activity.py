@@ -0,0 +1,176 @@
+"""Listing views and watches, counted in memory and written behind.
+
+A listing page view or a watchlist change only bumps a counter of this
+process. ``flush`` swaps the counters out and writes each touched listing
+once, however many events it collected: one UPDATE per batch of listings,
+with CASE expressions keyed on the primary key, adds the views and watches
+to ``view_count`` and ``watch_count`` and folds them into ``popularity``.
+Server processes flush every ``ACTIVITY_FLUSH_INTERVAL`` seconds from a
+background thread started by ``start_flusher`` in the WSGI and ASGI entry
+points, and once more at exit; a crash loses at most one interval of
+counts.
+
+``popularity`` is a trending score with forward decay: each event weighs
+``2 ** ((time - EPOCH) / TRENDING_HALF_LIFE)``, so newer activity outweighs
+older activity without ever rewriting idle listings. The sum is stored as
+its base-2 logarithm to stay within a float, which keeps its ordering.
+"""
+
+import atexit
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuctionsListing, Watchlist, _by_value
+
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc).timestamp()
+
+# How much one event adds to a listing's trending score.
+WEIGHTS = {"views": 1, "watches": 10}
+
+# Listings per UPDATE. Each one takes about five query parameters, which
+# keeps a batch under SQLite's limit of 999.
+FLUSH_BATCH_SIZE = 150
+
+_pending = {"views": Counter(), "watches": Counter()}
+_lock = threading.Lock()
+_flusher = None
+
+
+def record_view(listing_id):
+    with _lock:
+        _pending["views"][listing_id] += 1
+
+
+def record_watch(listing_id, change=1):
+    with _lock:
+        _pending["watches"][listing_id] += change
+
+
+def pending():
+    """Return the counts not flushed yet, as ``{kind: {listing id: count}}``."""
+    with _lock:
+        return {kind: dict(counts) for kind, counts in _pending.items()}
+
+
+def score(weight, now):
+    """Return the log2 trending score of ``weight`` worth of events at ``now``."""
+    return math.log2(weight) + (now - EPOCH) / settings.TRENDING_HALF_LIFE
+
+
+def add_scores(a, b):
+    """Return the log2 of the sum of two log2 scores."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def flush(now=None):
+    """Write the pending counts, one UPDATE per batch of listings; return how many.
+
+    The counts are taken out before writing, so events recorded meanwhile
+    wait for the next flush. If the write fails they are put back.
+    """
+    global _pending
+    with _lock:
+        taken, _pending = _pending, {"views": Counter(), "watches": Counter()}
+    views, watches = taken["views"], taken["watches"]
+    listing_ids = set(views) | set(watches)
+    if not listing_ids:
+        return 0
+    now = now or time.time()
+    try:
+        with transaction.atomic():
+            # Locked, so workers flushing the same listing add up their scores.
+            current = list(
+                AuctionsListing.objects.select_for_update()
+                .filter(pk__in=listing_ids)
+                .values_list("pk", "popularity")
+            )
+            for start in range(0, len(current), FLUSH_BATCH_SIZE):
+                batch = current[start : start + FLUSH_BATCH_SIZE]
+                popularity = {}
+                for listing_id, score_so_far in batch:
+                    weight = views[listing_id] * WEIGHTS["views"] + max(
+                        watches[listing_id], 0
+                    ) * WEIGHTS["watches"]
+                    if weight:
+                        popularity[listing_id] = add_scores(
+                            score_so_far, score(weight, now)
+                        )
+                changes = {
+                    "view_count": F("view_count")
+                    + _by_value({pk: views[pk] for pk, _ in batch}),
+                    # Never below zero, should a backfill race an unwatch.
+                    "watch_count": Greatest(
+                        F("watch_count")
+                        + _by_value({pk: watches[pk] for pk, _ in batch}),
+                        Value(0),
+                    ),
+                }
+                if popularity:
+                    changes["popularity"] = _by_value(
+                        popularity, default=F("popularity")
+                    )
+                AuctionsListing.objects.filter(
+                    pk__in=[pk for pk, _ in batch]
+                ).update(**changes)
+    except Exception:
+        with _lock:
+            for kind, counts in taken.items():
+                _pending[kind].update(counts)
+        raise
+    return len(current)
+
+
+def backfill_watch_counts():
+    """Recompute every listing's watch_count from the Watchlist table.
+
+    Pending watch changes are dropped, as the table already has them.
+    """
+    with _lock:
+        _pending["watches"].clear()
+    watches = (
+        Watchlist.objects.filter(auctionlisting=OuterRef("pk"))
+        .order_by()
+        .values("auctionlisting")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return AuctionsListing.objects.update(
+        watch_count=Coalesce(Subquery(watches), Value(0))
+    )
+
+
+def _flush_forever(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Flushing listing activity failed; retrying later.")
+        finally:
+            close_old_connections()
+
+
+def start_flusher():
+    """Flush from a daemon thread every ACTIVITY_FLUSH_INTERVAL seconds."""
+    global _flusher
+    interval = settings.ACTIVITY_FLUSH_INTERVAL
+    if _flusher is not None or not interval:
+        return
+    _flusher = threading.Thread(
+        target=_flush_forever, args=(interval,), name="activity-flusher", daemon=True
+    )
+    _flusher.start()
+    atexit.register(flush)
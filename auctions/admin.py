@@ -5,10 +5,8 @@ from .models import *
 
 admin.site.register(User)
 admin.site.register(Bids)
-admin.site.register(Titles)
-admin.site.register(Descriptions)
+admin.site.register(BidRollup)
 admin.site.register(AuctionCategories)
-admin.site.register(Urls)
 admin.site.register(Comments)
 admin.site.register(AuctionsListing)
 admin.site.register(Watchlist)
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""Read-only JSON API for listings, their bids and category listings.
+
+Every endpoint takes ``?fields=`` with a comma-separated list of the field
+names in its table below (sparse fieldsets), so a client pays only for the
+columns, and joins, it asks for. Rows are read with ``.values()`` and
+serialized straight from those dicts without instantiating models. Lists
+use the same keyset cursors as the HTML pages (``?after=``, ``?before=``,
+``?page_size=``), and listing lists take the index page's ``?sort=``.
+Errors are JSON with an ``error`` message; unknown listings and categories
+are 404s.
+"""
+
+from functools import wraps
+
+from django.http import Http404, JsonResponse
+
+from .models import AuctionCategories, AuctionsListing, Bids
+from .pagination import SORTS, apaginate_by_cursor
+
+
+# API field name -> ORM lookup.
+LISTING_FIELDS = {
+    "id": "id",
+    "title": "title",
+    "description": "description",
+    "url": "url",
+    "category": "category__category",
+    "category_id": "category_id",
+    "status": "status",
+    "current_bid": "current_bid",
+    "bid_count": "bid_count",
+    "seller": "created_by__username",
+    "winner": "winner__username",
+    "created_at": "created_at",
+    "ends_at": "ends_at",
+    "view_count": "view_count",
+    "watch_count": "watch_count",
+}
+
+LISTING_SUMMARY_FIELDS = [
+    "id",
+    "title",
+    "url",
+    "category",
+    "current_bid",
+    "bid_count",
+    "created_at",
+]
+
+BID_FIELDS = {
+    "id": "id",
+    "value": "value",
+    "bidder": "created_by__username",
+    "created_at": "created_at",
+}
+
+# Compact output: no spaces after separators.
+JSON_PARAMS = {"separators": (",", ":")}
+
+
+class InvalidQuery(ValueError):
+    """A query parameter the endpoint cannot serve; answered with a 400."""
+
+
+def get_fields(request, fields, default):
+    """Return the ``(name, lookup)`` pairs chosen by ``?fields=``."""
+    names = request.GET.get("fields")
+    names = [name for name in names.split(",") if name] if names else default
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise InvalidQuery(f"unknown fields {unknown}; choose from {list(fields)}")
+    return [(name, fields[name]) for name in dict.fromkeys(names)]
+
+
+def get_sort(request):
+    """Return the pagination arguments of the listing ``?sort=``, if any."""
+    sort = request.GET.get("sort")
+    if sort is None:
+        return {}
+    if sort not in SORTS:
+        raise InvalidQuery(f"sort must be one of {list(SORTS)}")
+    return {"key": SORTS[sort], "descending": True}
+
+
+def project(rows, fields):
+    return [{name: row[lookup] for name, lookup in fields} for row in rows]
+
+
+def api_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def api_view(view):
+    """Answer InvalidQuery and Http404 from an async API view as JSON."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except InvalidQuery as error:
+            return api_response({"error": str(error)}, status=400)
+        except Http404 as error:
+            return api_response({"error": str(error)}, status=404)
+
+    return wrapper
+
+
+async def paginated(request, queryset, fields, key="created_at", descending=False):
+    """Return one cursor page of ``queryset`` with only ``fields`` in each row."""
+    # The cursor needs the sort key and id whether or not they were asked for.
+    lookups = dict.fromkeys([lookup for _, lookup in fields] + ["id", key])
+    page = await apaginate_by_cursor(
+        request, queryset.values(*lookups), key=key, descending=descending
+    )
+    return {
+        "results": project(page["auctions"], fields),
+        "next": page["next_cursor"],
+        "previous": page["previous_cursor"],
+        "page_size": page["page_size"],
+    }
+
+
+async def listing_page(request, **filters):
+    return await paginated(
+        request,
+        AuctionsListing.objects.filter(status=AuctionsListing.Status.ACTIVE, **filters),
+        get_fields(request, LISTING_FIELDS, LISTING_SUMMARY_FIELDS),
+        **get_sort(request),
+    )
+
+
+@api_view
+async def listings(request):
+    """Active listings, oldest first or by ``?sort=``."""
+    return api_response(await listing_page(request))
+
+
+@api_view
+async def category_listings(request, category_id):
+    """Active listings of one category, oldest first or by ``?sort=``."""
+    page = await listing_page(request, category=category_id)
+    # Only an empty page needs to tell an empty category from a missing one.
+    if not page["results"] and not page["previous"]:
+        if not await AuctionCategories.objects.filter(pk=category_id).aexists():
+            raise Http404("No AuctionCategories matches the given query.")
+    return api_response(page)
+
+
+@api_view
+async def listing(request, listing_id):
+    """One listing, with every field unless ``?fields=`` picks some."""
+    fields = get_fields(request, LISTING_FIELDS, list(LISTING_FIELDS))
+    row = await (
+        AuctionsListing.objects.filter(pk=listing_id)
+        .values(*dict.fromkeys(lookup for _, lookup in fields))
+        .afirst()
+    )
+    if row is None:
+        raise Http404("No AuctionsListing matches the given query.")
+    return api_response(project([row], fields)[0])
+
+
+@api_view
+async def listing_bids(request, listing_id):
+    """A listing's bids, newest first."""
+    page = await paginated(
+        request,
+        Bids.objects.filter(listing=listing_id),
+        get_fields(request, BID_FIELDS, list(BID_FIELDS)),
+        descending=True,
+    )
+    # Every listing has its starting bid; only an empty page needs a check.
+    if not page["results"] and not page["previous"]:
+        if not await AuctionsListing.objects.filter(pk=listing_id).aexists():
+            raise Http404("No AuctionsListing matches the given query.")
+    return api_response(page)
@@ -0,0 +1,61 @@
+"""Helpers shared by the benchmark management commands."""
+
+import json
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def throwaway_database(verbosity=0):
+    """Run the enclosed block against a freshly migrated scratch database.
+
+    The scratch database is the test database from settings, so benchmarks
+    never touch the development data and clean up after themselves.
+    """
+    old_name = connection.settings_dict["NAME"]
+    setup_test_environment(debug=False)
+    connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, round(pct / 100 * (len(sorted_samples) - 1)))
+    return sorted_samples[index]
+
+
+def summarize(samples_ms):
+    """Return count, mean and tail latencies of a list of millisecond samples."""
+    samples = sorted(samples_ms)
+    total = sum(samples)
+    return {
+        "count": len(samples),
+        "mean_ms": round(total / len(samples), 4) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50), 4),
+        "p99_ms": round(percentile(samples, 99), 4),
+        "max_ms": round(samples[-1], 4) if samples else 0.0,
+    }
+
+
+def measure(fn, repeat):
+    """Call ``fn`` ``repeat`` times and summarize its latency."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def dump(results):
+    return json.dumps(results, indent=2, sort_keys=True, default=str)
@@ -0,0 +1,178 @@
+"""A listing's bid history, rolled up into open/high/low/close time buckets.
+
+Every bid placed through the ORM folds into one ``BidRollup`` row per
+resolution (minute, hour and day) through the signal in ``signals.py``: one
+UPDATE extends the buckets it falls in. When a bucket does not exist yet,
+that UPDATE is rolled back to a savepoint, empty buckets are inserted with
+conflicts ignored, and the UPDATE runs again. Two writers starting the same
+bucket, which the listing row lock does not rule out on every database
+profile, then both fold into the row that won. A price chart reads at most
+``BID_HISTORY_MAX_BUCKETS`` rows however many bids the listing has. Bulk
+writers skip the signals and either write the rollups themselves, with
+``start_buckets`` for starting bids, or call ``rebuild``.
+"""
+
+import itertools
+from datetime import timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Q
+from django.db.models.functions import Cast, Greatest, Least
+
+from .models import BidRollup, Bids
+
+
+RESOLUTIONS = {
+    "minute": BidRollup.Resolution.MINUTE,
+    "hour": BidRollup.Resolution.HOUR,
+    "day": BidRollup.Resolution.DAY,
+}
+
+_TRUNCATED = {
+    BidRollup.Resolution.MINUTE: {"second": 0, "microsecond": 0},
+    BidRollup.Resolution.HOUR: {"minute": 0, "second": 0, "microsecond": 0},
+    BidRollup.Resolution.DAY: {"hour": 0, "minute": 0, "second": 0, "microsecond": 0},
+}
+
+BUCKET_FIELDS = ("bucket", "open", "high", "low", "close", "count")
+
+
+def bucket_start(moment, resolution):
+    """Return the start of the UTC bucket of ``resolution`` holding ``moment``."""
+    return moment.astimezone(dt_timezone.utc).replace(**_TRUNCATED[resolution])
+
+
+def bucket_starts(moment):
+    """Map each resolution to the start of its bucket holding ``moment``."""
+    return {resolution: bucket_start(moment, resolution) for resolution in _TRUNCATED}
+
+
+class _MissingBucket(Exception):
+    pass
+
+
+def record(listing_id, value, created_at):
+    """Fold one bid into the listing's buckets at every resolution."""
+    buckets = bucket_starts(created_at)
+    try:
+        with transaction.atomic():
+            if _fold_into(listing_id, buckets, value) < len(buckets):
+                # Undo the partial fold; the slow path folds into every bucket.
+                raise _MissingBucket
+    except _MissingBucket:
+        BidRollup.objects.bulk_create(
+            [
+                BidRollup(
+                    listing_id=listing_id,
+                    resolution=resolution,
+                    bucket=bucket,
+                    open=value,
+                    high=value,
+                    low=value,
+                    close=value,
+                    count=0,
+                )
+                for resolution, bucket in buckets.items()
+            ],
+            ignore_conflicts=True,
+        )
+        _fold_into(listing_id, buckets, value)
+
+
+def _fold_into(listing_id, buckets, value):
+    in_buckets = Q()
+    for resolution, bucket in buckets.items():
+        in_buckets |= Q(resolution=resolution, bucket=bucket)
+    # SQLite binds decimals as text, which MAX() and MIN() rank above numbers.
+    price = Cast(value, DecimalField(max_digits=7, decimal_places=2))
+    return BidRollup.objects.filter(in_buckets, listing=listing_id).update(
+        high=Greatest("high", price),
+        low=Least("low", price),
+        close=price,
+        count=F("count") + 1,
+    )
+
+
+def start_buckets(listings, created_at):
+    """Start the buckets of ``listings`` holding only a bid placed at ``created_at``.
+
+    For bulk writers creating listings along with their starting bids: each
+    listing's ``current_bid`` opens its buckets, with one INSERT ... SELECT
+    per resolution. Listings without a bid are left out.
+    """
+    listings = listings.filter(current_bid__isnull=False).values_list(
+        "id", "current_bid"
+    )
+    sql, params = listings.query.sql_with_params()
+    quote = connection.ops.quote_name
+    columns = ", ".join(
+        quote(BidRollup._meta.get_field(name).column)
+        for name in ["listing", "resolution", *BUCKET_FIELDS]
+    )
+    prices = ", ".join(["listing.current_bid"] * 4)
+    with connection.cursor() as cursor:
+        for resolution, bucket in bucket_starts(created_at).items():
+            cursor.execute(
+                f"INSERT INTO {quote(BidRollup._meta.db_table)} ({columns}) "
+                f"SELECT listing.id, %s, %s, {prices}, 1 FROM ({sql}) listing",
+                [resolution, connection.ops.adapt_datetimefield_value(bucket), *params],
+            )
+
+
+def rebuild(listing_ids=None, batch_size=5000):
+    """Recompute the buckets of ``listing_ids``, or of every listing, from bids.
+
+    Bids are streamed in listing and time order, so only the open bucket of
+    each resolution is held in memory. Returns the number of buckets written.
+    """
+    bids = Bids.objects.order_by("listing", "created_at")
+    rollups = BidRollup.objects.all()
+    if listing_ids is not None:
+        bids = bids.filter(listing__in=listing_ids)
+        rollups = rollups.filter(listing__in=listing_ids)
+    bids = bids.values_list("listing", "value", "created_at")
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        folded = _fold(bids.iterator(batch_size))
+        while batch := list(itertools.islice(folded, batch_size)):
+            BidRollup.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def _fold(bids):
+    current = {}
+    for listing_id, value, created_at in bids:
+        for resolution in _TRUNCATED:
+            bucket = bucket_start(created_at, resolution)
+            rollup = current.get(resolution)
+            if rollup and rollup.listing_id == listing_id and rollup.bucket == bucket:
+                rollup.high = max(rollup.high, value)
+                rollup.low = min(rollup.low, value)
+                rollup.close = value
+                rollup.count += 1
+                continue
+            if rollup:
+                yield rollup
+            current[resolution] = BidRollup(
+                listing_id=listing_id,
+                resolution=resolution,
+                bucket=bucket,
+                open=value,
+                high=value,
+                low=value,
+                close=value,
+                count=1,
+            )
+    yield from current.values()
+
+
+def buckets(listing_id, resolution, limit):
+    """Return the latest ``limit`` buckets of a listing, newest first."""
+    return (
+        BidRollup.objects.filter(listing=listing_id, resolution=resolution)
+        .order_by("-bucket")
+        .values(*BUCKET_FIELDS)[:limit]
+    )
@@ -0,0 +1,78 @@
+"""Fragment cache for the listing cards rendered by index.html.
+
+Each card is stored under ``listing-card:<id>`` together with the version
+stamp it was rendered from (``modified_at`` plus ``bid_count``), so an entry
+is only served while the listing row still has the same stamp. The rendered
+markup is kept per active language because dates and numbers are localized.
+Writes that change a card also delete its entry through the signals in
+``signals.py``.
+"""
+
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import translation
+
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.LISTING_CARD_CACHE]
+
+
+def card_key(listing_id):
+    return f"listing-card:{listing_id}"
+
+
+def card_version(listing):
+    return f"{listing.modified_at.timestamp()}:{listing.bid_count}"
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def get_or_render(listing, render):
+    """Return the cached card for ``listing``, calling ``render()`` on a miss."""
+    cache = get_cache()
+    key = card_key(listing.id)
+    version = card_version(listing)
+    language = translation.get_language()
+    cached_version, rendered = cache.get(key, (None, {}))
+    if cached_version == version and language in rendered:
+        _count("hits")
+        return rendered[language]
+    _count("misses")
+    if cached_version != version:
+        rendered = {}
+    rendered[language] = render()
+    cache.set(key, (version, rendered), settings.LISTING_CARD_CACHE_TIMEOUT)
+    return rendered[language]
+
+
+def invalidate(listing_id):
+    get_cache().delete(card_key(listing_id))
+    _count("invalidations")
+
+
+def stats():
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+        invalidations = _stats["invalidations"]
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "invalidations": invalidations,
+        "hit_rate": hits / lookups if lookups else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,397 @@
+"""Streaming bulk import and export of listings as JSONL or CSV.
+
+Both directions work through the file in batches of ``batch_size`` listings,
+so memory stays flat however large it is. Rows are validated with the model
+fields and invalid ones are skipped. The importer writes each batch in one
+transaction: an executemany INSERT for the listings and one for their
+starting bids (see ``_insert``), with the denormalized bid columns set up
+front. The bid history buckets and the search index are then filled from
+the new listing rows with INSERT ... SELECT statements, and the active
+listing counts of the categories with one UPDATE. Model signals do not fire
+for these writes, and brand new listings need nothing else from them.
+"""
+
+import csv
+import itertools
+import json
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import bid_history, search
+from .models import AuctionCategories, AuctionsListing, Bids, Comments
+
+
+FORMATS = ["jsonl", "csv"]
+
+# Columns read by the importer; only title and description are required.
+IMPORT_FIELDS = [
+    "title",
+    "description",
+    "url",
+    "category",
+    "starting_bid",
+    "ends_at",
+    "status",
+]
+
+EXPORT_FIELDS = [
+    "id",
+    *IMPORT_FIELDS,
+    "created_by",
+    "created_at",
+    "current_bid",
+    "bid_count",
+    "winner",
+    "bids",
+    "comments",
+]
+
+# Invalid rows reported individually; the rest are only counted.
+MAX_REPORTED_ERRORS = 20
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def format_for(path, format=None):
+    """Return ``format``, or the one named by the file extension."""
+    format = format or path.rsplit(".", 1)[-1].lower()
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format!r}; use one of {FORMATS}.")
+    return format
+
+
+def read_rows(stream, format):
+    """Yield ``(line number, row dict)`` pairs from a JSONL or CSV stream."""
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as error:
+                yield line_number, error
+
+
+def _clean_field(name, value):
+    """Clean ``value`` with the AuctionsListing field ``name``, as a form would."""
+    try:
+        return AuctionsListing._meta.get_field(name).clean(value, None)
+    except ValidationError as error:
+        raise InvalidRow(f"Invalid {name} {value!r}: {' '.join(error.messages)}")
+
+
+def clean_row(row):
+    """Validate a row like CreateListingForm does, returning listing fields."""
+    if isinstance(row, Exception):
+        raise InvalidRow(f"Not valid JSON: {row}")
+    if not isinstance(row, dict):
+        raise InvalidRow("Each line must be a JSON object.")
+    for name in ["title", "description", "url", "category", "ends_at", "status"]:
+        if row.get(name) is not None and not isinstance(row[name], str):
+            raise InvalidRow(f"The {name} must be a string.")
+    title = _clean_field("title", (row.get("title") or "").strip())
+    description = _clean_field("description", (row.get("description") or "").strip())
+    url = _clean_field("url", (row.get("url") or "").strip())
+
+    starting_bid = row.get("starting_bid")
+    if starting_bid not in (None, ""):
+        try:
+            starting_bid = Decimal(str(starting_bid)).quantize(Decimal("0.01"))
+        except InvalidOperation:
+            raise InvalidRow(f"Invalid starting bid {starting_bid!r}.")
+        if not starting_bid.is_finite():
+            raise InvalidRow(f"Invalid starting bid {starting_bid}.")
+        if not Decimal("0.01") <= starting_bid < Decimal("100000"):
+            raise InvalidRow(f"Starting bid {starting_bid} is out of range.")
+    else:
+        starting_bid = None
+
+    ends_at = _clean_field("ends_at", row.get("ends_at") or None)
+    if ends_at is not None and timezone.is_naive(ends_at):
+        ends_at = timezone.make_aware(ends_at)
+
+    status = _clean_field("status", row.get("status") or AuctionsListing.Status.ACTIVE)
+
+    return {
+        "title": title,
+        "description": description,
+        "url": url,
+        "category": (row.get("category") or "").strip()[:100] or None,
+        "starting_bid": starting_bid,
+        "ends_at": ends_at,
+        "status": status,
+    }
+
+
+# Columns the importer fills, in the order of its row tuples. The model's
+# other columns get their defaults (see ``_insert``).
+LISTING_COLUMNS = [
+    "id",
+    "created_by_id",
+    "created_at",
+    "modified_at",
+    "category_id",
+    "url",
+    "title",
+    "description",
+    "status",
+    "current_bid",
+    "bid_count",
+    "current_leader_id",
+    "ends_at",
+    "search_rowid",
+]
+
+BID_COLUMNS = ["id", "value", "listing_id", "created_at", "created_by_id"]
+
+
+def _insert(db, model, columns, rows):
+    """Insert tuples of database values for ``columns`` with one executemany.
+
+    bulk_create spends most of its time building model instances and
+    preparing every value through its field, which caps it at a few thousand
+    listings a second; the importer prepares the values itself instead.
+    Every other concrete field of ``model`` is written with its default, so
+    a field added to the model later needs no change here.
+    """
+    if not rows:
+        return
+    others = [
+        field for field in model._meta.concrete_fields if field.column not in columns
+    ]
+
+    def defaults():
+        return tuple(
+            field.get_db_prep_save(field.get_default(), db) for field in others
+        )
+
+    # A callable default, such as uuid4, needs a fresh value for every row.
+    if any(field.has_default() and callable(field.default) for field in others):
+        rows = [row + defaults() for row in rows]
+    elif others:
+        constant = defaults()
+        rows = [row + constant for row in rows]
+    columns = [*columns, *(field.column for field in others)]
+    quote = db.ops.quote_name
+    with db.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {quote(model._meta.db_table)} "
+            f"({', '.join(quote(column) for column in columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})",
+            rows,
+        )
+
+
+def _category_ids(names, known):
+    """Map category names to ids, creating the missing ones in bulk."""
+    missing = set(names) - known.keys() - {None}
+    if missing:
+        AuctionCategories.objects.bulk_create(
+            [AuctionCategories(category=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        known.update(
+            AuctionCategories.objects.filter(category__in=missing).values_list(
+                "category", "id"
+            )
+        )
+    return known
+
+
+def import_listings(rows, owner, batch_size=10_000, progress=None):
+    """Create a listing for each valid ``(line number, row)`` pair.
+
+    Listings with a starting bid get it recorded as the owner's bid, like
+    add_listing does. Invalid rows are skipped. ``progress`` is called with
+    the running totals after every batch, which are also returned.
+    """
+    totals = {"listings": 0, "bids": 0, "categories": 0, "skipped": 0, "errors": []}
+    categories = dict(AuctionCategories.objects.values_list("category", "id"))
+    # The connection proxy costs a context-local lookup per attribute, which
+    # adds up over a few values per row.
+    db = connections[DEFAULT_DB_ALIAS]
+    uuid_value = AuctionsListing._meta.pk.get_db_prep_value
+    started = time.perf_counter()
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        cleaned = []
+        for line_number, row in batch:
+            try:
+                cleaned.append(clean_row(row))
+            except InvalidRow as error:
+                totals["skipped"] += 1
+                if len(totals["errors"]) < MAX_REPORTED_ERRORS:
+                    totals["errors"].append(f"line {line_number}: {error}")
+
+        created_at = timezone.now()
+        now = db.ops.adapt_datetimefield_value(created_at)
+        listings, bids = [], []
+        active = Counter()
+        with transaction.atomic():
+            known = len(categories)
+            _category_ids([fields["category"] for fields in cleaned], categories)
+            totals["categories"] += len(categories) - known
+
+            first_rowid = rowid = search.allocate_rowids(len(cleaned))
+            for fields in cleaned:
+                listing_id = uuid_value(uuid.uuid4(), db)
+                category = categories.get(fields["category"])
+                if fields["status"] == AuctionsListing.Status.ACTIVE:
+                    active[category] += 1
+                starting_bid = fields["starting_bid"]
+                if starting_bid is not None:
+                    starting_bid = db.ops.adapt_decimalfield_value(starting_bid, 7, 2)
+                    bid_id = uuid_value(uuid.uuid4(), db)
+                    bids.append((bid_id, starting_bid, listing_id, now, owner.pk))
+                listings.append(
+                    (
+                        listing_id,
+                        owner.pk,
+                        now,
+                        now,
+                        category and uuid_value(category, db),
+                        fields["url"],
+                        fields["title"],
+                        fields["description"],
+                        fields["status"],
+                        starting_bid,
+                        0 if starting_bid is None else 1,
+                        None if starting_bid is None else owner.pk,
+                        db.ops.adapt_datetimefield_value(fields["ends_at"]),
+                        rowid,
+                    )
+                )
+                if rowid is not None:
+                    rowid += 1
+            # Rows in key order fill the primary key indexes page by page.
+            listings.sort()
+            bids.sort()
+            _insert(db, AuctionsListing, LISTING_COLUMNS, listings)
+            _insert(db, Bids, BID_COLUMNS, bids)
+            # The listings carry their starting bid, and the search index
+            # copies their text, so both are filled straight from the table.
+            bid_history.start_buckets(
+                AuctionsListing.objects.filter(created_by=owner, created_at=created_at),
+                created_at,
+            )
+            if rowid is not None:
+                search.index_rowids(first_rowid, rowid - 1)
+            AuctionCategories.count_listings(active)
+
+        totals["listings"] += len(listings)
+        totals["bids"] += len(bids)
+        totals["seconds"] = round(time.perf_counter() - started, 3)
+        if progress:
+            progress(totals)
+    return totals
+
+
+def export_listings(stream, format, queryset=None, batch_size=2000, progress=None):
+    """Write listings with their bids and comments, one listing per line.
+
+    Bids and comments are nested lists in JSONL and JSON-encoded columns in
+    CSV. The first bid is also written as ``starting_bid``, so the file can
+    be imported again. Returns the number of listings written.
+    """
+    queryset = AuctionsListing.objects.all() if queryset is None else queryset
+    queryset = queryset.order_by("pk").values(
+        "id",
+        "title",
+        "description",
+        "url",
+        "ends_at",
+        "status",
+        "created_at",
+        "current_bid",
+        "bid_count",
+        category_name=F("category__category"),
+        seller=F("created_by__username"),
+        winner_name=F("winner__username"),
+    )
+    if format == "csv":
+        writer = csv.DictWriter(stream, EXPORT_FIELDS)
+        writer.writeheader()
+    encoder = DjangoJSONEncoder()
+
+    written, last = 0, None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        listings = list(page[:batch_size])
+        if not listings:
+            return written
+        last = listings[-1]["id"]
+        bids, comments = _children([listing["id"] for listing in listings])
+
+        for listing in listings:
+            history = bids.get(listing["id"], [])
+            record = {
+                "id": listing["id"],
+                "title": listing["title"],
+                "description": listing["description"],
+                "url": listing["url"],
+                "category": listing["category_name"],
+                "starting_bid": history[0]["value"] if history else None,
+                "ends_at": listing["ends_at"],
+                "status": listing["status"],
+                "created_by": listing["seller"],
+                "created_at": listing["created_at"],
+                "current_bid": listing["current_bid"],
+                "bid_count": listing["bid_count"],
+                "winner": listing["winner_name"],
+                "bids": history,
+                "comments": comments.get(listing["id"], []),
+            }
+            if format == "csv":
+                record["bids"] = encoder.encode(record["bids"])
+                record["comments"] = encoder.encode(record["comments"])
+                writer.writerow(
+                    {
+                        name: value
+                        if value is None or isinstance(value, (str, int))
+                        else encoder.default(value)
+                        for name, value in record.items()
+                    }
+                )
+            else:
+                stream.write(encoder.encode(record) + "\n")
+        written += len(listings)
+        if progress:
+            progress(written)
+
+
+def _children(listing_ids):
+    """Load the bids and comments of a batch of listings, grouped by listing."""
+    bids, comments = {}, {}
+    for bid in (
+        Bids.objects.filter(listing__in=listing_ids)
+        .order_by("listing", "created_at")
+        .values("listing", "value", "created_at", bidder=F("created_by__username"))
+    ):
+        bids.setdefault(bid.pop("listing"), []).append(bid)
+    for comment in (
+        Comments.objects.filter(listing__in=listing_ids)
+        .order_by("listing", "created_at")
+        .values(
+            "listing",
+            "id",
+            "user_comment",
+            "created_at",
+            parent=F("parent_comment"),
+            author=F("created_by__username"),
+        )
+    ):
+        comments.setdefault(comment.pop("listing"), []).append(comment)
+    return bids, comments
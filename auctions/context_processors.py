@@ -0,0 +1,16 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import watchlist_cache
+
+
+def watchlist(request):
+    """Add the watchlist badge count, read from the cache only if rendered.
+
+    Async views resolve the user themselves and pass ``watchlist_count`` in
+    their context, which takes precedence over this one.
+    """
+    return {
+        "watchlist_count": SimpleLazyObject(
+            lambda: watchlist_cache.count(request.user)
+        )
+    }
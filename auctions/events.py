@@ -0,0 +1,250 @@
+"""Live listing updates pushed to browsers as Server-Sent Events.
+
+Writers call ``publish_listings`` after a bid, close or cancel, and every
+open ``listing_events`` stream of those listings receives the new price,
+bid count and status. Events go through the broker named by the
+``LISTING_EVENTS_BROKER`` setting. The default ``InProcessBroker`` only
+reaches subscribers of the same process; a broker backed by Redis or
+Postgres LISTEN/NOTIFY can replace it by implementing ``publish`` and
+``subscribe``.
+"""
+
+import asyncio
+import json
+import threading
+import uuid
+from collections import defaultdict
+from functools import cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import Resolver404, resolve
+from django.utils.module_loading import import_string
+
+from .models import AuctionsListing
+
+
+SNAPSHOT_FIELDS = ("id", "status", "current_bid", "bid_count")
+
+STREAM_HEADERS = {
+    "Content-Type": "text/event-stream",
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def channel_name(listing_id):
+    return f"listing:{uuid.UUID(str(listing_id))}"
+
+
+def format_event(event, data):
+    """Encode one SSE frame; done once per event, not once per subscriber."""
+    payload = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class Subscription:
+    def __init__(self, broker, channel, max_queued):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_queued)
+
+    def deliver(self, message):
+        # Called on the subscriber's event loop. A subscriber that falls
+        # behind loses its oldest events; each event is a full snapshot.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Return the next message, or None after ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fan messages out to the subscribers of this process.
+
+    ``publish`` is thread-safe, so synchronous views running in a worker
+    thread can publish to streams served by the event loop.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, settings.LISTING_EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers[subscription.channel]
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        loops = defaultdict(list)
+        for subscription in subscribers:
+            loops[subscription.loop].append(subscription)
+        # One wake-up per event loop instead of one per subscriber.
+        for loop, batch in loops.items():
+            loop.call_soon_threadsafe(_deliver_all, batch, message)
+        return len(subscribers)
+
+
+def _deliver_all(subscriptions, message):
+    for subscription in subscriptions:
+        subscription.deliver(message)
+
+
+@cache
+def get_broker():
+    return import_string(settings.LISTING_EVENTS_BROKER)()
+
+
+def listing_snapshots(listing_ids):
+    return AuctionsListing.objects.filter(pk__in=listing_ids).values(*SNAPSHOT_FIELDS)
+
+
+def publish_listings(listing_ids, event):
+    """Publish the current state of each listing to its subscribers."""
+    broker = get_broker()
+    for snapshot in listing_snapshots(listing_ids):
+        broker.publish(channel_name(snapshot["id"]), format_event(event, snapshot))
+
+
+def first_frame(snapshot):
+    """Return the reconnect delay and a listing's current state as SSE."""
+    return f"retry: {settings.LISTING_EVENTS_RETRY_MS}\n" + format_event(
+        "listing", snapshot
+    )
+
+
+async def listing_poll(listing_id):
+    """Return a listing's first frame alone, or None if it does not exist.
+
+    A WSGI worker cannot hold a stream open, so WSGI clients get this short
+    response and their EventSource reconnects after the retry delay.
+    """
+    try:
+        channel_name(listing_id)
+    except ValueError:
+        return None
+    snapshot = await listing_snapshots([listing_id]).afirst()
+    return None if snapshot is None else first_frame(snapshot)
+
+
+async def listing_stream(listing_id):
+    """Subscribe to a listing and return its SSE frames as an async iterator.
+
+    The first frame is the listing's current state. Returns None when the
+    listing does not exist.
+    """
+    try:
+        channel = channel_name(listing_id)
+    except ValueError:
+        return None
+    broker = get_broker()
+    # Subscribe before reading the snapshot so no event falls in between.
+    subscription = broker.subscribe(channel)
+    snapshot = await listing_snapshots([listing_id]).afirst()
+    if snapshot is None:
+        broker.unsubscribe(subscription)
+        return None
+    return _frames(subscription, snapshot)
+
+
+async def _frames(subscription, snapshot):
+    async with subscription:
+        yield first_frame(snapshot)
+        while True:
+            message = await subscription.get(settings.LISTING_EVENTS_KEEPALIVE)
+            yield message or ": keepalive\n\n"
+
+
+class ListingEventsRouter:
+    """ASGI wrapper that serves listing event streams itself.
+
+    The streams are public and read-only, so they skip the Django handler
+    and its middleware, which hop to a worker thread several times per
+    request and dominate the cost of thousands of clients connecting at
+    once. Every other request goes to ``application``.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        listing_id = self.match(scope)
+        if listing_id is None:
+            return await self.application(scope, receive, send)
+        await self.serve(listing_id, receive, send)
+
+    def match(self, scope):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return None
+        try:
+            match = resolve(scope["path"])
+        except Resolver404:
+            return None
+        if match.url_name != "listing_events":
+            return None
+        return match.kwargs["listing_id"]
+
+    async def serve(self, listing_id, receive, send):
+        stream = await listing_stream(listing_id)
+        if stream is None:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 404,
+                    "headers": [(b"content-type", b"text/plain")],
+                }
+            )
+            await send({"type": "http.response.body", "body": b"Not Found"})
+            return
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (name.lower().encode(), value.encode())
+                    for name, value in STREAM_HEADERS.items()
+                ],
+            }
+        )
+
+        async def pump():
+            async for frame in stream:
+                await send(
+                    {"type": "http.response.body", "body": frame.encode(), "more_body": True}
+                )
+
+        async def wait_for_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        tasks = [asyncio.create_task(pump()), asyncio.create_task(wait_for_disconnect())]
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
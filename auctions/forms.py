@@ -1,5 +1,6 @@
 from decimal import Decimal
 from django import forms
+from django.utils import timezone
 from .models import AuctionCategories
 
 
@@ -52,6 +53,19 @@ class CreateListingForm(forms.Form):
             attrs={"class": "form-control", "placeholder": "Enter image URL"}
         ),
     )
+    ends_at = forms.DateTimeField(
+        required=False,
+        label="Ends at",
+        widget=forms.DateTimeInput(
+            attrs={"class": "form-control", "type": "datetime-local"}
+        ),
+    )
+
+    def clean_ends_at(self):
+        ends_at = self.cleaned_data["ends_at"]
+        if ends_at is not None and ends_at <= timezone.now():
+            raise forms.ValidationError("The end time must be in the future.")
+        return ends_at
 
 
 class NewBiddingForm(BaseBidForm):
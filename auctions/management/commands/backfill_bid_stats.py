@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from auctions.models import AuctionsListing
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized bid columns of every listing from its bids."
+
+    def handle(self, *args, **options):
+        updated = AuctionsListing.backfill_bid_stats()
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} listings."))
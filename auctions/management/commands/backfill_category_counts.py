@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from auctions.models import AuctionCategories
+
+
+class Command(BaseCommand):
+    help = "Recompute the active listing count of every category from its listings."
+
+    def handle(self, *args, **options):
+        updated = AuctionCategories.backfill_listing_counts()
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} categories."))
@@ -0,0 +1,102 @@
+import random
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from auctions import api, card_cache, catalog
+from auctions.benchmarks import dump, measure, throwaway_database
+from auctions.models import AuctionsListing, User
+from auctions.seeding import ADJECTIVES, NOUNS
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database with listings and compare serializing a page "
+        "of them through the JSON API against rendering index.html."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=10_000)
+        # Pages are capped at LISTINGS_MAX_PER_PAGE.
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        page_size = options["page_size"]
+        repeat = options["repeat"]
+        with throwaway_database():
+            owner = User.objects.create(username="benchmark")
+            catalog.import_listings(self.rows(rng, options), owner)
+
+            active = AuctionsListing.objects.filter(
+                status=AuctionsListing.Status.ACTIVE
+            ).order_by("created_at", "id")[:page_size]
+            fields = [
+                (name, api.LISTING_FIELDS[name]) for name in api.LISTING_SUMMARY_FIELDS
+            ]
+            rows = list(active.values(*[lookup for _, lookup in fields]))
+            cards = list(active.cards())
+            request = RequestFactory().get("/")
+            request.user = AnonymousUser()
+            context = {"title": "Active Listings", "auctions": cards}
+
+            def serialize():
+                JsonResponse(
+                    {"results": api.project(rows, fields)},
+                    json_dumps_params=api.JSON_PARAMS,
+                )
+
+            def render():
+                render_to_string("auctions/index.html", context, request)
+
+            def render_cold():
+                card_cache.get_cache().clear()
+                render()
+
+            client = Client()
+            params = {"page_size": page_size}
+            timings = {
+                "serialize": {
+                    "json": measure(serialize, repeat),
+                    "template": measure(render, repeat),
+                },
+                "view": {
+                    "api_listings": measure(
+                        lambda: client.get(reverse("api_listings"), params), repeat
+                    ),
+                    "index": measure(
+                        lambda: client.get(reverse("index"), params), repeat
+                    ),
+                },
+            }
+            # The template numbers above had every card in the card cache.
+            timings["serialize"]["template_cold_cards"] = measure(render_cold, repeat)
+        results = {
+            "listings": options["listings"],
+            "page_size": page_size,
+            "listings_per_second": {
+                group: {
+                    name: round(page_size / (timing["mean_ms"] / 1000))
+                    for name, timing in named.items()
+                }
+                for group, named in timings.items()
+            },
+            "timings": timings,
+        }
+        self.stdout.write(dump(results))
+
+    def rows(self, rng, options):
+        for line in range(options["listings"]):
+            noun, adjective = rng.choice(NOUNS), rng.choice(ADJECTIVES)
+            yield line, {
+                "title": f"{adjective.title()} {noun}",
+                "description": f"A {adjective} {noun}.",
+                "category": rng.choice(NOUNS).title(),
+                "starting_bid": f"{rng.randint(1, 500)}.00",
+            }
@@ -0,0 +1,154 @@
+import asyncio
+import io
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.urls import reverse
+
+from auctions.benchmarks import dump, summarize, throwaway_database
+from auctions.models import AuctionCategories, AuctionsListing, Comments, User
+from commerce.asgi import application as asgi_application
+from commerce.wsgi import application as wsgi_application
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the read-heavy pages through the WSGI and the ASGI entry "
+        "points at the same concurrency and compare throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 128])
+        parser.add_argument("--listings", type=int, default=500)
+        parser.add_argument("--comments", type=int, default=50)
+
+    def handle(self, *args, **options):
+        results = {}
+        with throwaway_database():
+            paths = self.seed(options)
+            for concurrency in options["concurrency"]:
+                results[f"concurrency_{concurrency}"] = {
+                    "wsgi": self.run_wsgi(paths, concurrency, options["requests"]),
+                    "asgi": asyncio.run(
+                        self.run_asgi(paths, concurrency, options["requests"])
+                    ),
+                }
+        self.stdout.write(dump(results))
+
+    def seed(self, options):
+        owner = User.objects.create(username="owner")
+        categories = AuctionCategories.objects.bulk_create(
+            [AuctionCategories(category=f"Category {n}") for n in range(10)]
+        )
+        AuctionsListing.objects.bulk_create(
+            [
+                AuctionsListing(
+                    created_by=owner,
+                    category=categories[n % len(categories)],
+                    title=f"Listing {n}",
+                    description="Seeded by benchmark_asgi.",
+                    current_bid=Decimal("10.00"),
+                    bid_count=1,
+                    current_leader=owner,
+                )
+                for n in range(options["listings"])
+            ]
+        )
+        hot = AuctionsListing.objects.first()
+        Comments.objects.bulk_create(
+            [
+                Comments(user_comment=f"Comment {n}", listing=hot, created_by=owner)
+                for n in range(options["comments"])
+            ]
+        )
+        close_old_connections()
+        return [
+            reverse("index"),
+            reverse("listings", args=[hot.id]),
+            reverse("categories"),
+            reverse("filter_category", args=[categories[0].pk]),
+        ]
+
+    def report(self, latencies_ms, elapsed, statuses):
+        return {
+            **summarize(latencies_ms),
+            "requests_per_second": round(len(latencies_ms) / elapsed, 1),
+            "non_200": sum(status != 200 for status in statuses),
+        }
+
+    def run_wsgi(self, paths, concurrency, requests):
+        def call(path):
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": path,
+                "QUERY_STRING": "",
+                "SERVER_NAME": "testserver",
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "wsgi.url_scheme": "http",
+                "wsgi.input": io.BytesIO(),
+                "wsgi.errors": io.StringIO(),
+            }
+            status = []
+            started = time.perf_counter()
+            response = wsgi_application(
+                environ, lambda code, headers, exc_info=None: status.append(code)
+            )
+            b"".join(response)
+            response.close()
+            return (time.perf_counter() - started) * 1000, int(status[0][:3])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(call, itertools.islice(itertools.cycle(paths), requests)))
+        elapsed = time.perf_counter() - started
+        return self.report([r[0] for r in results], elapsed, [r[1] for r in results])
+
+    async def run_asgi(self, paths, concurrency, requests):
+        async def call(path):
+            messages = []
+
+            async def receive():
+                if not messages:
+                    messages.append(None)
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # Never disconnect; the handler cancels this once it has responded.
+                await asyncio.Future()
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": b"",
+                "root_path": "",
+                "headers": [(b"host", b"testserver")],
+                "client": ("127.0.0.1", 10000),
+                "server": ("testserver", 80),
+            }
+            started = time.perf_counter()
+            await asgi_application(scope, receive, send)
+            return (time.perf_counter() - started) * 1000, messages[1]["status"]
+
+        queue = itertools.islice(itertools.cycle(paths), requests)
+        results = []
+
+        async def worker():
+            for path in queue:
+                results.append(await call(path))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        return self.report([r[0] for r in results], elapsed, [r[1] for r in results])
@@ -0,0 +1,127 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.test import Client
+from django.urls import reverse
+
+from auctions import catalog
+from auctions.benchmarks import dump, measure, throwaway_database
+from auctions.models import AuctionCategories, AuctionsListing, User
+from auctions.seeding import ADJECTIVES, NOUNS, zipf
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database with categories and listings and compare "
+        "counting and filtering listings per category through the listings "
+        "table against the category counters and primary keys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=1_000_000)
+        parser.add_argument("--categories", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with throwaway_database():
+            started = time.perf_counter()
+            owner = User.objects.create(username="benchmark")
+            catalog.import_listings(self.rows(rng, options), owner)
+            seeded = time.perf_counter() - started
+
+            categories = list(AuctionCategories.objects.values_list("pk", "category"))
+            draw = zipf(rng, categories)
+
+            def category():
+                return draw()[0]
+
+            active = AuctionsListing.objects.filter(
+                status=AuctionsListing.Status.ACTIVE
+            )
+            page_size = settings.LISTINGS_PER_PAGE
+            client = Client()
+            repeat = options["repeat"]
+
+            counters = AuctionCategories.objects.values_list("pk", "active_listings")
+            counted = dict(counters)
+            AuctionCategories.backfill_listing_counts()
+            results = {
+                "listings": options["listings"],
+                "categories": len(categories),
+                "seed_seconds": round(seeded, 2),
+                "counters_match": counted == dict(counters),
+                "counts": {
+                    "aggregate": measure(
+                        lambda: list(
+                            AuctionCategories.objects.annotate(
+                                total=Count(
+                                    "listings",
+                                    filter=Q(
+                                        listings__status=AuctionsListing.Status.ACTIVE
+                                    ),
+                                )
+                            )
+                        ),
+                        repeat,
+                    ),
+                    "counter": measure(
+                        lambda: list(
+                            AuctionCategories.objects.only(
+                                "category", "active_listings"
+                            )
+                        ),
+                        repeat,
+                    ),
+                },
+                "filter": {
+                    "by_name": measure(
+                        lambda: list(
+                            active.cards()
+                            .filter(category__category=category()[1])
+                            .order_by("created_at", "id")[:page_size]
+                        ),
+                        repeat,
+                    ),
+                    "by_key": measure(
+                        lambda: list(
+                            active.cards()
+                            .filter(category=category()[0])
+                            .order_by("created_at", "id")[:page_size]
+                        ),
+                        repeat,
+                    ),
+                },
+                "views": {
+                    "categories": measure(
+                        lambda: client.get(reverse("categories")), repeat
+                    ),
+                    "filter_category": measure(
+                        lambda: client.get(
+                            reverse("filter_category", args=[category()[0]])
+                        ),
+                        repeat,
+                    ),
+                },
+            }
+        self.stdout.write(dump(results))
+
+    def rows(self, rng, options):
+        # A few categories hold most listings, as in seeding.
+        names = zipf(rng, [f"Category {n}" for n in range(options["categories"])])
+        statuses = [AuctionsListing.Status.ACTIVE] * 8 + [
+            AuctionsListing.Status.SOLD,
+            AuctionsListing.Status.INACTIVE,
+        ]
+        for line in range(options["listings"]):
+            noun, adjective = rng.choice(NOUNS), rng.choice(ADJECTIVES)
+            yield line, {
+                "title": f"{adjective.title()} {noun}",
+                "description": f"A {adjective} {noun}.",
+                "category": names()[0],
+                "status": rng.choice(statuses),
+            }
@@ -0,0 +1,105 @@
+import random
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from auctions.benchmarks import dump, measure, throwaway_database
+from auctions.models import AuctionsListing, Bids, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database with one heavy bidder among many and time "
+        "their dashboard standings against looking each listing up in turn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=5000)
+        parser.add_argument("--bids", type=int, default=10_000)
+        parser.add_argument("--other-bids", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with throwaway_database():
+            bidder = self.seed(rng, options)
+            limit = settings.DASHBOARD_ROWS
+            client = Client()
+            client.force_login(bidder)
+            with CaptureQueriesContext(connection) as queries:
+                client.get(reverse("dashboard"))
+            repeat = options["repeat"]
+            results = {
+                "listings": options["listings"],
+                "bids": options["bids"],
+                "other_bids": options["other_bids"],
+                "dashboard_queries": len(queries),
+                "standings": {
+                    "window": measure(
+                        lambda: AuctionsListing.bid_standings(bidder, limit), repeat
+                    ),
+                    "per_listing": measure(lambda: self.per_listing(bidder), repeat),
+                },
+                "view": measure(lambda: client.get(reverse("dashboard")), repeat),
+            }
+        self.stdout.write(dump(results))
+
+    def per_listing(self, bidder):
+        """Group the bidder's listings one lookup at a time, for comparison."""
+        standings = {}
+        listing_ids = (
+            Bids.objects.filter(created_by=bidder)
+            .order_by()
+            .values_list("listing", flat=True)
+            .distinct()
+        )
+        for listing_id in listing_ids:
+            listing = AuctionsListing.objects.get(pk=listing_id)
+            my_bid = listing.bids.filter(created_by=bidder).aggregate(Max("value"))
+            standings[listing_id] = (listing.current_leader_id, my_bid)
+        return standings
+
+    def seed(self, rng, options):
+        owner = User.objects.create(username="benchmark")
+        bidder = User.objects.create(username="bidder")
+        rivals = User.objects.bulk_create(
+            User(username=f"rival{n}") for n in range(100)
+        )
+        listings = AuctionsListing.objects.bulk_create(
+            (
+                AuctionsListing(
+                    created_by=owner,
+                    title="Benchmark listing",
+                    description="Seeded by benchmark_dashboard.",
+                )
+                for _ in range(options["listings"])
+            ),
+            batch_size=5000,
+        )
+        # The bidder spreads their bids over a fifth of the listings.
+        watched = rng.sample(listings, max(1, len(listings) // 5))
+        bids = [(rng.choice(watched), bidder) for _ in range(options["bids"])] + [
+            (rng.choice(listings), rng.choice(rivals))
+            for _ in range(options["other_bids"])
+        ]
+        rng.shuffle(bids)
+        Bids.objects.bulk_create(
+            (
+                Bids(
+                    listing=listing,
+                    created_by=user,
+                    value=Decimal("10.00") + n // 100,
+                )
+                for n, (listing, user) in enumerate(bids)
+            ),
+            batch_size=5000,
+        )
+        AuctionsListing.backfill_bid_stats()
+        return bidder
@@ -0,0 +1,85 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from auctions.benchmarks import dump, throwaway_database
+from auctions.models import AuctionsListing, User
+from auctions.services import close_expired_auctions
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database with expired and open listings and time the "
+        "expiry worker closing them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=50_000)
+        parser.add_argument("--open-listings", type=int, default=50_000)
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with throwaway_database():
+            now = timezone.now()
+            self.seed(rng, now, options)
+
+            started = time.perf_counter()
+            closed = close_expired_auctions(now=now, batch_size=options["batch_size"])
+            elapsed = time.perf_counter() - started
+
+            started = time.perf_counter()
+            rerun = close_expired_auctions(now=now, batch_size=options["batch_size"])
+            idle = time.perf_counter() - started
+
+            statuses = dict(
+                AuctionsListing.objects.order_by()
+                .values_list("status")
+                .annotate(total=Count("pk"))
+            )
+        self.stdout.write(
+            dump(
+                {
+                    "expired_listings": options["listings"],
+                    "open_listings": options["open_listings"],
+                    "closed": closed,
+                    "close_seconds": round(elapsed, 3),
+                    "listings_per_second": round(closed / elapsed) if elapsed else None,
+                    "idle_rerun": {"closed": rerun, "seconds": round(idle, 4)},
+                    "listings_by_status": statuses,
+                }
+            )
+        )
+
+    def seed(self, rng, now, options):
+        owner = User.objects.create(username="benchmark")
+        bidder = User.objects.create(username="bidder")
+
+        def listing(ends_at):
+            # Roughly two thirds received a bid on top of the starting bid.
+            outbid = rng.random() < 0.66
+            return AuctionsListing(
+                created_by=owner,
+                title="Benchmark listing",
+                description="Seeded by benchmark_expiry.",
+                ends_at=ends_at,
+                current_bid=Decimal("10.00") + (1 if outbid else 0),
+                bid_count=2 if outbid else 1,
+                current_leader=bidder if outbid else owner,
+            )
+
+        expired = [
+            listing(now - timedelta(seconds=rng.randint(1, 86_400)))
+            for _ in range(options["listings"])
+        ]
+        open_ = [
+            listing(now + timedelta(seconds=rng.randint(1, 86_400)))
+            for _ in range(options["open_listings"])
+        ]
+        AuctionsListing.objects.bulk_create(expired + open_, batch_size=5000)
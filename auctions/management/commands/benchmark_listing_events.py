@@ -0,0 +1,120 @@
+import asyncio
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from auctions import events
+from auctions.benchmarks import dump, summarize, throwaway_database
+from auctions.models import AuctionsListing, User
+from auctions.services import place_bid
+from commerce.asgi import application, django_application
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many Server-Sent Event streams on one listing through the ASGI "
+        "application, place bids, and report how fast they fan out."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=5000)
+        parser.add_argument("--bids", type=int, default=20)
+        parser.add_argument("--timeout", type=float, default=60)
+        parser.add_argument(
+            "--django-stack",
+            action="store_true",
+            help="Serve the streams through the Django handler and middleware "
+            "instead of commerce.asgi.application.",
+        )
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            owner = User.objects.create(username="owner")
+            bidder = User.objects.create(username="bidder")
+            listing = AuctionsListing.objects.create(
+                created_by=owner, title="Hot listing", description="Benchmark"
+            )
+            listing.record_bid(Decimal("1.00"), owner)
+            results = asyncio.run(self.run(listing, bidder, options))
+        self.stdout.write(dump(results))
+
+    async def run(self, listing, bidder, options):
+        app = django_application if options["django_stack"] else application
+        path = reverse("listing_events", args=[listing.id])
+        count = options["subscribers"]
+        disconnect = asyncio.Event()
+        arrivals = [[] for _ in range(count)]
+        # received[k] is set once every subscriber has received k messages.
+        received = defaultdict(asyncio.Event)
+        tallies = defaultdict(int)
+
+        async def subscribe(n):
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.body" and message.get("body"):
+                    arrivals[n].append((time.perf_counter(), message["body"]))
+                    tallies[len(arrivals[n])] += 1
+                    if tallies[len(arrivals[n])] == count:
+                        received[len(arrivals[n])].set()
+
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": b"",
+                "root_path": "",
+                "headers": [(b"host", b"testserver")],
+                "client": ("127.0.0.1", 10000 + n),
+                "server": ("testserver", 80),
+            }
+            await app(scope, receive, send)
+
+        async def wait_for(messages):
+            await asyncio.wait_for(received[messages].wait(), options["timeout"])
+
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(subscribe(n)) for n in range(count)]
+        await wait_for(1)
+        connect_seconds = time.perf_counter() - started
+
+        bid = sync_to_async(place_bid)
+        write_ms, delivery_ms = [], []
+        for n in range(options["bids"]):
+            sent = time.perf_counter()
+            await bid(listing.id, bidder, Decimal("2.00") + n)
+            write_ms.append((time.perf_counter() - sent) * 1000)
+            await wait_for(n + 2)
+            delivery_ms.extend(
+                (messages[n + 1][0] - sent) * 1000 for messages in arrivals
+            )
+
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        return {
+            "subscribers": count,
+            "django_stack": options["django_stack"],
+            "connect_seconds": round(connect_seconds, 3),
+            "bids": options["bids"],
+            "bid_write": summarize(write_ms),
+            "bid_to_delivery": summarize(delivery_ms),
+            "open_subscriptions_after_disconnect": events.get_broker().subscriber_count(
+                events.channel_name(listing.id)
+            ),
+        }
@@ -0,0 +1,94 @@
+import itertools
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+
+from auctions.benchmarks import dump, measure, throwaway_database
+
+
+LOOKUP_LAYOUT = ("auctions", "0005_composite_indexes")
+INLINE_LAYOUT = ("auctions", "0006_inline_listing_text")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare listing creation and index-page card loading between the "
+        "Titles/Descriptions/Urls lookup tables and inline listing columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=1000)
+        parser.add_argument("--page-size", type=int, default=24)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        results = {}
+        with throwaway_database() as connection:
+            for name, target in [("before", LOOKUP_LAYOUT), ("after", INLINE_LAYOUT)]:
+                executor = MigrationExecutor(connection)
+                executor.migrate([target])
+                state = executor.loader.project_state(target)
+                results[name] = self.run_layout(
+                    state.apps, connection, name == "before", options
+                )
+        self.stdout.write(dump(results))
+
+    def run_layout(self, apps, connection, lookups, options):
+        User = apps.get_model("auctions", "User")
+        AuctionsListing = apps.get_model("auctions", "AuctionsListing")
+        Bids = apps.get_model("auctions", "Bids")
+        AuctionsListing.objects.all().delete()
+        user, _ = User.objects.get_or_create(username="benchmark")
+        counter = itertools.count()
+
+        def text_fields(n):
+            fields = {
+                "title": f"Listing {n}",
+                "description": f"Description of listing {n}",
+                "url": f"https://example.com/images/{n}.png",
+            }
+            if not lookups:
+                return fields
+            return {
+                name: apps.get_model("auctions", model).objects.get_or_create(
+                    **{name: fields[name]}
+                )[0]
+                for name, model in [
+                    ("title", "Titles"),
+                    ("description", "Descriptions"),
+                    ("url", "Urls"),
+                ]
+            }
+
+        def create_listing():
+            n = next(counter)
+            with transaction.atomic():
+                listing = AuctionsListing.objects.create(
+                    created_by=user, **text_fields(n)
+                )
+                Bids.objects.create(value=Decimal("1.00"), listing=listing, created_by=user)
+                AuctionsListing.objects.filter(pk=listing.pk).update(
+                    current_bid=Decimal("1.00"),
+                    bid_count=F("bid_count") + 1,
+                    current_leader=user,
+                )
+
+        def load_cards():
+            page = AuctionsListing.objects.filter(status="A").order_by(
+                "created_at", "id"
+            )[: options["page_size"]]
+            for auction in page:
+                str(auction.title), str(auction.url), str(auction.description)
+
+        creation = measure(create_listing, options["listings"])
+        cards = measure(load_cards, options["repeat"])
+        with CaptureQueriesContext(connection) as ctx:
+            load_cards()
+        return {
+            "create_listing": creation,
+            "index_page_cards": {**cards, "queries": len(ctx.captured_queries)},
+        }
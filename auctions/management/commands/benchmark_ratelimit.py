@@ -0,0 +1,98 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import resolve, reverse
+
+from auctions import ratelimit
+from auctions.benchmarks import dump
+from auctions.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the rate limiter on a POST to new_bid against the bare view and "
+        "report the overhead per request in microseconds for each store."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100_000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument("--threads", type=int, default=8)
+
+    def handle(self, *args, **options):
+        path = reverse("new_bid", args=["00000000-0000-0000-0000-000000000000"])
+        factory = RequestFactory()
+        requests = []
+        for n in range(options["users"]):
+            request = factory.post(path, {"new_bid": "1"}, REMOTE_ADDR=f"10.0.{n}.1")
+            request.resolver_match = resolve(path)
+            request.user = User(pk=n + 1, username=f"user{n}")
+            requests.append(request)
+
+        def view(request):
+            return HttpResponse()
+
+        # Generous limits, so every request pays for the buckets but passes.
+        limits = {"new_bid": {"user": "1000000/s", "ip": "1000000/s"}}
+        stores = {
+            "in_process": {"RATE_LIMIT_STORE": "auctions.ratelimit.InProcessStore"},
+            "locmem_cache": {
+                "RATE_LIMIT_STORE": "auctions.ratelimit.CacheStore",
+                "CACHES": {
+                    "default": {
+                        "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+                    },
+                    "rate_limits": {
+                        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                        "LOCATION": "rate-limit-benchmark",
+                    },
+                },
+            },
+        }
+        bare = self.time(view, requests, options)
+        bare_threaded = self.time(view, requests, options, options["threads"])
+        results = {
+            "requests": options["requests"],
+            "threads": options["threads"],
+            "bare_view_us": bare,
+        }
+        for name, store_settings in stores.items():
+            with override_settings(RATE_LIMITS=limits, **store_settings):
+                ratelimit.get_store.cache_clear()
+                limited = ratelimit.rate_limited(view)
+                single = self.time(limited, requests, options)
+                threaded = self.time(limited, requests, options, options["threads"])
+            results[name] = {
+                "overhead_us": round(single - bare, 2),
+                "threaded_overhead_us": round(threaded - bare_threaded, 2),
+            }
+        ratelimit.get_store.cache_clear()
+        self.stdout.write(dump(results))
+
+    def time(self, view, requests, options, threads=1):
+        """Return the best mean microseconds per request over the rounds."""
+        per_thread = options["requests"] // threads
+
+        def run(offset):
+            for n in range(per_thread):
+                view(requests[(offset + n) % len(requests)])
+
+        best = None
+        for _ in range(options["rounds"]):
+            workers = [
+                threading.Thread(target=run, args=(n * per_thread,))
+                for n in range(threads)
+            ]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+            mean = elapsed / (per_thread * threads) * 1_000_000
+            best = mean if best is None else min(best, mean)
+        return round(best, 2)
@@ -0,0 +1,96 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from auctions import search
+from auctions.benchmarks import dump, measure, throwaway_database
+from auctions.models import AuctionCategories, AuctionsListing, User
+from auctions.seeding import ADJECTIVES, NOUNS
+
+
+QUERIES = ["lamp", "vintage camera", "wireless key", "leather jacket", "rare vinyl", "sofa"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database with listings and report full-text search "
+        "latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=1_000_000)
+        parser.add_argument("--categories", type=int, default=50)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            self.stderr.write("The full-text search benchmark needs SQLite.")
+            return
+        rng = random.Random(options["seed"])
+        with throwaway_database():
+            started = time.perf_counter()
+            self.seed(rng, options)
+            seeded = time.perf_counter() - started
+
+            started = time.perf_counter()
+            search.rebuild_index()
+            indexed = time.perf_counter() - started
+
+            categories = list(AuctionCategories.objects.values_list("id", flat=True))
+            results = {
+                "listings": options["listings"],
+                "seed_seconds": round(seeded, 2),
+                "index_seconds": round(indexed, 2),
+                "queries": {},
+            }
+            for query in QUERIES:
+                results["queries"][query] = {
+                    "all_categories": measure(
+                        lambda: search.search_listings(query), options["repeat"]
+                    ),
+                    "one_category": measure(
+                        lambda: search.search_listings(
+                            query, category=rng.choice(categories)
+                        ),
+                        options["repeat"],
+                    ),
+                }
+        self.stdout.write(dump(results))
+
+    def seed(self, rng, options):
+        owner = User.objects.create(username="benchmark")
+        categories = AuctionCategories.objects.bulk_create(
+            [
+                AuctionCategories(category=f"Category {n}")
+                for n in range(options["categories"])
+            ]
+        )
+        statuses = [AuctionsListing.Status.ACTIVE] * 8 + [
+            AuctionsListing.Status.SOLD,
+            AuctionsListing.Status.INACTIVE,
+        ]
+        remaining = options["listings"]
+        while remaining:
+            size = min(remaining, options["batch_size"])
+            AuctionsListing.objects.bulk_create(
+                [self.listing(rng, owner, categories, statuses) for _ in range(size)]
+            )
+            remaining -= size
+
+    def listing(self, rng, owner, categories, statuses):
+        # Skew towards the first nouns so term frequencies follow a long tail.
+        noun = NOUNS[min(int(rng.paretovariate(1.2)) - 1, len(NOUNS) - 1)]
+        adjectives = rng.sample(ADJECTIVES, 2)
+        return AuctionsListing(
+            created_by=owner,
+            category=rng.choice(categories),
+            status=rng.choice(statuses),
+            title=f"{adjectives[0].title()} {noun}",
+            description=(
+                f"A {adjectives[1]} {noun} in good condition, "
+                f"also great with a {rng.choice(NOUNS)}."
+            ),
+        )
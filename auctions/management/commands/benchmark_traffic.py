@@ -0,0 +1,264 @@
+import http.cookiejar
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from auctions import metrics, seeding
+from auctions.benchmarks import dump, summarize, throwaway_database
+from auctions.models import AuctionCategories, AuctionsListing, Comments, User
+
+
+# Relative weights of the actions in each traffic mix.
+MIXES = {
+    "browse": {"browse": 60, "view": 35, "watch": 5},
+    "mixed": {"browse": 35, "view": 40, "bid": 10, "comment": 8, "watch": 7},
+    "bidding": {"browse": 10, "view": 40, "bid": 50},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay browse, view, bid, comment and watchlist traffic mixes and "
+        "report throughput, latency percentiles and queries per view as JSON. "
+        "Runs in-process against a freshly seeded scratch database, or "
+        "against a running server with --url."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mix", nargs="+", choices=MIXES, default=list(MIXES))
+        parser.add_argument("--requests", type=int, default=2000, help="Per mix.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--url",
+            help="Base URL of a server started on a database filled by "
+            "seed_auctions; run this command with the same database settings. "
+            "The server's RATE_LIMITS apply, and rejected writes count as errors.",
+        )
+        seeding.add_arguments(parser)
+
+    def handle(self, *args, **options):
+        if options["url"]:
+            results = {"target": options["url"], "mixes": self.replay(options)}
+        else:
+            with throwaway_database():
+                started = time.perf_counter()
+                dataset = seeding.seed(random.Random(options["seed"]), **options)
+                dataset["seconds"] = round(time.perf_counter() - started, 2)
+                close_old_connections()
+                # A handful of replayed users write far faster than people
+                # do, so the rate limits would reject most of their writes.
+                with override_settings(RATE_LIMITS={}):
+                    mixes = self.replay(options)
+                results = {"target": "test client", "dataset": dataset, "mixes": mixes}
+        self.stdout.write(dump(results))
+
+    def replay(self, options):
+        rng = random.Random(options["seed"])
+        traffic = Traffic(rng)
+        return {
+            mix: self.run_mix(traffic, rng, MIXES[mix], options)
+            for mix in options["mix"]
+        }
+
+    def run_mix(self, traffic, rng, weights, options):
+        plan = iter(
+            rng.choices(list(weights), list(weights.values()), k=options["requests"])
+        )
+        lock = threading.Lock()
+        latencies, errors = defaultdict(list), defaultdict(int)
+        usernames = traffic.usernames(options["concurrency"])
+
+        def worker(username):
+            session = (
+                LiveSession(options["url"], username)
+                if options["url"]
+                else TestClientSession(username)
+            )
+            try:
+                while True:
+                    with lock:
+                        action = next(plan, None)
+                    if action is None:
+                        return
+                    method, path, data = traffic.request(action)
+                    started = time.perf_counter()
+                    status = session.request(method, path, data)
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        latencies[action].append(elapsed)
+                        errors[action] += status >= 400
+            finally:
+                connection.close()
+
+        metrics.reset_stats()
+        threads = [threading.Thread(target=worker, args=(user,)) for user in usernames]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        completed = sum(len(samples) for samples in latencies.values())
+        return {
+            "requests": completed,
+            "concurrency": options["concurrency"],
+            "seconds": round(elapsed, 3),
+            "requests_per_second": round(completed / elapsed, 1),
+            "errors": sum(errors.values()),
+            "actions": {
+                action: {**summarize(samples), "errors": errors[action]}
+                for action, samples in latencies.items()
+            },
+            "views": self.view_stats(options, usernames[0]),
+        }
+
+    def view_stats(self, options, staff):
+        if not options["url"]:
+            return metrics.stats()
+        # A server reports everything it has served since it started, not
+        # just this mix.
+        session = LiveSession(options["url"], staff)
+        return session.json(reverse("request_stats"))["views"]
+
+
+class Traffic:
+    """Pick the next request, favouring the listings with the most bids."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.lock = threading.Lock()
+        listings = list(
+            AuctionsListing.objects.order_by("-bid_count").values_list(
+                "id", "status", "current_bid"
+            )
+        )
+        self.listing = seeding.zipf(rng, [row[0] for row in listings])
+        self.open_listing = seeding.zipf(
+            rng,
+            [row[0] for row in listings if row[1] == AuctionsListing.Status.ACTIVE],
+        )
+        self.prices = {row[0]: row[2] for row in listings}
+        self.categories = list(AuctionCategories.objects.values_list("pk", flat=True))
+        self.comments = defaultdict(list)
+        for listing_id, comment_id in Comments.objects.values_list("listing", "id"):
+            self.comments[listing_id].append(comment_id)
+
+    def usernames(self, count):
+        # user0 is staff, the others are regular bidders.
+        return ["user0"] + [
+            user.username
+            for user in User.objects.exclude(username="user0").order_by("?")[
+                : count - 1
+            ]
+        ]
+
+    def request(self, action):
+        rng = self.rng
+        if action == "browse":
+            return rng.choice(
+                [
+                    ("get", reverse("index"), None),
+                    ("get", reverse("categories"), None),
+                    (
+                        "get",
+                        reverse("filter_category", args=[rng.choice(self.categories)]),
+                        None,
+                    ),
+                    ("get", reverse("search"), {"q": rng.choice(seeding.NOUNS)}),
+                    ("get", reverse("watchlist"), None),
+                ]
+            )
+        if action == "view":
+            return "get", reverse("listings", args=[self.listing()[0]]), None
+        if action == "bid":
+            listing_id = self.open_listing()[0]
+            with self.lock:
+                self.prices[listing_id] += Decimal(rng.randint(1, 100)) / 100
+                price = self.prices[listing_id]
+            return "post", reverse("new_bid", args=[listing_id]), {"new_bid": price}
+        if action == "comment":
+            listing_id = self.listing()[0]
+            replies = self.comments[listing_id]
+            args = [listing_id]
+            if replies and rng.random() < 0.7:
+                args.append(rng.choice(replies))
+            return (
+                "post",
+                reverse("insert_comments", args=args),
+                {"comment": "Still available?"},
+            )
+        if action == "watch":
+            return "post", reverse("toggle_watchlist", args=[self.listing()[0]]), None
+        raise ValueError(f"Unknown action {action!r}.")
+
+
+class TestClientSession:
+    """Send requests through the Django test client, logged in as a user."""
+
+    def __init__(self, username):
+        self.client = Client()
+        self.client.force_login(User.objects.get(username=username))
+
+    def request(self, method, path, data=None):
+        return getattr(self.client, method)(path, data).status_code
+
+
+class LiveSession:
+    """Send requests to a running server over HTTP, logged in as a user."""
+
+    class NoRedirects(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base_url, username):
+        self.base_url = base_url.rstrip("/")
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), self.NoRedirects
+        )
+        self.request("get", reverse("login"))
+        self.request(
+            "post",
+            reverse("login"),
+            {"username": username, "password": seeding.PASSWORD},
+        )
+
+    def open(self, method, path, data=None):
+        body, url = None, self.base_url + path
+        headers = {"Referer": self.base_url + "/"}
+        if method == "post":
+            token = next(
+                cookie.value
+                for cookie in self.cookies
+                if cookie.name == settings.CSRF_COOKIE_NAME
+            )
+            data = {**(data or {}), "csrfmiddlewaretoken": token}
+            body = urllib.parse.urlencode(data).encode()
+        elif data:
+            url += "?" + urllib.parse.urlencode(data)
+        request = urllib.request.Request(url, body, headers, method=method.upper())
+        try:
+            response = self.opener.open(request)
+        except urllib.error.HTTPError as error:
+            response = error
+        with response:
+            return response.status, response.read()
+
+    def request(self, method, path, data=None):
+        return self.open(method, path, data)[0]
+
+    def json(self, path):
+        return json.loads(self.open("get", path)[1])
@@ -0,0 +1,144 @@
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from auctions.benchmarks import dump, summarize, throwaway_database
+from auctions.models import AuctionsListing, User
+from auctions.services import BidRejected, place_bid
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a few hot listings with concurrent bids while readers load "
+        "listing cards, once per DATABASE_PROFILE, and compare the profiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles", nargs="+", default=["sqlite-legacy", "sqlite"]
+        )
+        parser.add_argument("--writers", type=int, default=16)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--bids", type=int, default=200, help="Bids per writer.")
+        parser.add_argument("--listings", type=int, default=4)
+        parser.add_argument(
+            "--run-profile",
+            action="store_true",
+            help="Benchmark the profile of this process only (used internally).",
+        )
+
+    def handle(self, *args, **options):
+        if options["run_profile"]:
+            with throwaway_database():
+                self.stdout.write(json.dumps(self.run(options), default=str))
+            return
+
+        # Settings are read once per process, so every profile gets its own.
+        results = {}
+        for profile in options["profiles"]:
+            command = [
+                sys.executable,
+                sys.argv[0],
+                "benchmark_write_contention",
+                "--run-profile",
+                *[
+                    f"--{name}={options[name]}"
+                    for name in ["writers", "readers", "bids", "listings"]
+                ],
+            ]
+            completed = subprocess.run(
+                command,
+                env={**os.environ, "DATABASE_PROFILE": profile},
+                capture_output=True,
+                text=True,
+            )
+            if completed.returncode:
+                results[profile] = {"error": completed.stderr.strip().splitlines()[-1]}
+            else:
+                results[profile] = json.loads(completed.stdout)
+        self.stdout.write(dump(results))
+
+    def run(self, options):
+        owner = User.objects.create(username="owner")
+        bidders = User.objects.bulk_create(
+            [User(username=f"bidder{n}") for n in range(options["writers"])]
+        )
+        listings = []
+        for n in range(options["listings"]):
+            listing = AuctionsListing.objects.create(
+                created_by=owner, title=f"Hot listing {n}", description="Benchmark"
+            )
+            listing.record_bid(Decimal("1.00"), owner)
+            listings.append(listing.id)
+
+        prices = itertools.count(2)
+        lock = threading.Lock()
+        outcomes = {"accepted": 0, "rejected": 0, "locked": 0}
+        write_ms, read_ms = [], []
+        writing = threading.Event()
+
+        def writer(n):
+            try:
+                for i in range(options["bids"]):
+                    with lock:
+                        price = Decimal(next(prices))
+                    started = time.perf_counter()
+                    try:
+                        place_bid(listings[i % len(listings)], bidders[n], price)
+                        outcome = "accepted"
+                    except BidRejected:
+                        outcome = "rejected"
+                    except OperationalError:
+                        outcome = "locked"
+                    write_ms.append((time.perf_counter() - started) * 1000)
+                    with lock:
+                        outcomes[outcome] += 1
+            finally:
+                connection.close()
+
+        def reader():
+            try:
+                while writing.is_set():
+                    started = time.perf_counter()
+                    list(AuctionsListing.objects.cards().filter(id__in=listings))
+                    read_ms.append((time.perf_counter() - started) * 1000)
+            finally:
+                connection.close()
+
+        database = settings.DATABASES["default"]
+        writing.set()
+        readers = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        writers = [
+            threading.Thread(target=writer, args=(n,)) for n in range(options["writers"])
+        ]
+        started = time.perf_counter()
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writing.clear()
+        for thread in readers:
+            thread.join()
+
+        return {
+            "engine": database["ENGINE"].rsplit(".", 1)[-1],
+            "options": database.get("OPTIONS", {}),
+            "conn_max_age": database.get("CONN_MAX_AGE", 0),
+            "writers": options["writers"],
+            "readers": options["readers"],
+            "bids": outcomes,
+            "bids_per_second": round(len(write_ms) / elapsed, 1),
+            "accepted_per_second": round(outcomes["accepted"] / elapsed, 1),
+            "bid_latency": summarize(write_ms),
+            "read_latency": summarize(read_ms),
+        }
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auctions.services import close_expired_auctions
+
+
+class Command(BaseCommand):
+    help = (
+        "Close every listing whose end time has passed. Safe to run "
+        "repeatedly from cron, or continuously with --interval."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Keep running, sweeping for expired listings every N seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            closed = close_expired_auctions(batch_size=options["batch_size"])
+            if closed or options["verbosity"] > 1:
+                self.stdout.write(self.style.SUCCESS(f"Closed {closed} listings."))
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
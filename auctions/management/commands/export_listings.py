@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions import catalog
+from auctions.models import AuctionsListing
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream listings with their bids and comments to a JSONL or CSV file "
+        "(or - for stdout)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=catalog.FORMATS)
+        parser.add_argument(
+            "--status", choices=AuctionsListing.Status.values, help="Only this status."
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            format = catalog.format_for(path, options["format"])
+        except ValueError as error:
+            raise CommandError(error)
+        queryset = AuctionsListing.objects.all()
+        if options["status"]:
+            queryset = queryset.filter(status=options["status"])
+
+        if path == "-":
+            stream = sys.stdout
+        else:
+            stream = open(path, "w", newline="", encoding="utf-8")
+        try:
+            written = catalog.export_listings(
+                stream,
+                format,
+                queryset,
+                batch_size=options["batch_size"],
+                progress=lambda written: self.stderr.write(
+                    f"{written} listings exported"
+                ),
+            )
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        self.stderr.write(self.style.SUCCESS(f"Exported {written} listings."))
@@ -0,0 +1,50 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions import catalog
+from auctions.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Create listings in bulk from a JSONL or CSV file (or - for stdin), "
+        f"with the columns {', '.join(catalog.IMPORT_FIELDS)}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--owner", required=True, help="Username of the seller.")
+        parser.add_argument("--format", choices=catalog.FORMATS)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['owner']!r}.")
+        path = options["path"]
+        try:
+            format = catalog.format_for(path, options["format"])
+        except ValueError as error:
+            raise CommandError(error)
+
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        with stream:
+            totals = catalog.import_listings(
+                catalog.read_rows(stream, format),
+                owner,
+                batch_size=options["batch_size"],
+                progress=self.progress,
+            )
+        for error in totals.pop("errors"):
+            self.stderr.write(error)
+        self.stdout.write(json.dumps(totals))
+
+    def progress(self, totals):
+        rate = totals["listings"] / totals["seconds"] if totals["seconds"] else 0
+        self.stderr.write(
+            f"{totals['listings']} listings imported, {totals['skipped']} skipped "
+            f"({rate:.0f}/s)"
+        )
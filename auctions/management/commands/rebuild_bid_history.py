@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from auctions import bid_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the bid history buckets of every listing from the bids table, "
+        "e.g. after writing bids in bulk."
+    )
+
+    def handle(self, *args, **options):
+        written = bid_history.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} bid history buckets."))
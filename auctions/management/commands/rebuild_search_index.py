@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from auctions import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from the listings table."
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            self.stdout.write("Full-text search index is only used on SQLite.")
+            return
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Rebuilt the search index."))
@@ -0,0 +1,29 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from auctions import seeding
+from auctions.models import AuctionsListing
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill an empty database with a realistic auction dataset, e.g. for "
+        "load-testing a local server with benchmark_traffic --url. Point "
+        "SQLITE_PATH at a scratch file and migrate it first."
+    )
+
+    def add_arguments(self, parser):
+        seeding.add_arguments(parser)
+
+    def handle(self, *args, **options):
+        if AuctionsListing.objects.exists():
+            raise CommandError("The database already has listings; seed an empty one.")
+        started = time.perf_counter()
+        with transaction.atomic():
+            created = seeding.seed(random.Random(options["seed"]), **options)
+        created["seconds"] = round(time.perf_counter() - started, 2)
+        self.stdout.write(json.dumps(created))
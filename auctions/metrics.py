@@ -0,0 +1,161 @@
+"""Per-request SQL, template and latency measurements, keyed by URL name.
+
+``RequestMetricsMiddleware`` opens a measurement for each request in a
+context variable. Every database connection gets ``record_query`` as an
+execute wrapper when it is created, and the ``DjangoTemplates`` backend
+below times each top-level render, so both add to the open measurement
+whichever thread runs them. The finished measurement is logged as one JSON
+line on the ``auctions.requests`` logger, checked against the view's entry
+in ``REQUEST_BUDGETS``, and aggregated in memory for ``stats()``.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+from .benchmarks import summarize
+
+
+logger = logging.getLogger("auctions.requests")
+
+# Budget keys and the measurement each one limits.
+BUDGETS = {
+    "queries": "sql_count",
+    "sql_ms": "sql_ms",
+    "template_ms": "template_ms",
+    "total_ms": "total_ms",
+}
+
+_current = ContextVar("request_metrics", default=None)
+_samples = defaultdict(lambda: deque(maxlen=settings.REQUEST_METRICS_SAMPLES))
+_over_budget = defaultdict(int)
+_samples_lock = threading.Lock()
+
+
+class BudgetExceeded(AssertionError):
+    """Raised instead of a warning when REQUEST_BUDGET_STRICT is on.
+
+    Only for requests that returned a response; a request that raised is
+    logged instead, so its own exception is the one that propagates.
+    """
+
+
+def start():
+    measurement = {"sql_count": 0, "sql_ms": 0.0, "template_ms": 0.0}
+    return measurement, _current.set(measurement)
+
+
+def add(name, value):
+    measurement = _current.get()
+    if measurement is not None:
+        measurement[name] += value
+
+
+def record_query(execute, sql, params, many, context):
+    if _current.get() is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        add("sql_count", 1)
+        add("sql_ms", (time.perf_counter() - started) * 1000)
+
+
+def finish(measurement, token, request, response, started):
+    _current.reset(token)
+    match = request.resolver_match
+    view = match.view_name if match else "<unresolved>"
+    measurement.update(
+        view=view,
+        method=request.method,
+        status=response.status_code if response is not None else 500,
+        total_ms=(time.perf_counter() - started) * 1000,
+    )
+    over = over_budget(view, measurement)
+    with _samples_lock:
+        _samples[view].append(measurement)
+        if over:
+            _over_budget[view] += 1
+
+    line = json.dumps(
+        {
+            **{
+                name: round(value, 3) if isinstance(value, float) else value
+                for name, value in measurement.items()
+            },
+            "over_budget": over,
+        },
+        sort_keys=True,
+    )
+    if not over:
+        logger.info(line)
+        return
+    if settings.REQUEST_BUDGET_STRICT and response is not None:
+        raise BudgetExceeded(f"{view} exceeded its budget: {line}")
+    logger.warning(line)
+
+
+def over_budget(view, measurement):
+    budget = settings.REQUEST_BUDGETS.get(view, {})
+    return sorted(
+        name for name, limit in budget.items() if measurement[BUDGETS[name]] > limit
+    )
+
+
+def stats():
+    with _samples_lock:
+        samples = {view: list(recorded) for view, recorded in _samples.items()}
+        over = dict(_over_budget)
+    return {
+        view: {
+            "requests": len(recorded),
+            "over_budget": over.get(view, 0),
+            "budget": settings.REQUEST_BUDGETS.get(view, {}),
+            "sql_count": {
+                "mean": round(
+                    sum(m["sql_count"] for m in recorded) / len(recorded), 2
+                ),
+                "max": max(m["sql_count"] for m in recorded),
+            },
+            "sql": summarize([m["sql_ms"] for m in recorded]),
+            "template": summarize([m["template_ms"] for m in recorded]),
+            "total": summarize([m["total_ms"] for m in recorded]),
+        }
+        for view, recorded in samples.items()
+    }
+
+
+def reset_stats():
+    with _samples_lock:
+        _samples.clear()
+        _over_budget.clear()
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            add("template_ms", (time.perf_counter() - started) * 1000)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The stock Django template backend, with render times recorded."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
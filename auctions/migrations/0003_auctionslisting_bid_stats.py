@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0002_auctionslisting_winner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionslisting',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='auctionslisting',
+            name='current_bid',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='auctionslisting',
+            name='current_leader',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leading_listings', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0003_auctionslisting_bid_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auctionslisting',
+            index=models.Index(fields=['created_at', 'id'], name='listing_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0004_auctionslisting_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auctionslisting',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='listing_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auctionslisting',
+            index=models.Index(condition=models.Q(('status', 'A')), fields=['category', 'created_at', 'id'], name='listing_active_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bids',
+            index=models.Index(fields=['listing', 'created_at'], name='bid_listing_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bids',
+            index=models.Index(fields=['listing', 'value'], name='bid_listing_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comments',
+            index=models.Index(fields=['listing', 'parent_comment', 'created_at'], name='comment_listing_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='watchlist',
+            index=models.Index(fields=['user', 'auctionlisting'], name='watchlist_user_listing_idx'),
+        ),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+# A one-way change of layout: the Titles, Descriptions and Urls tables are
+# dropped and the code only reads and writes the inline columns. Migrating
+# back restores the old tables and their rows, which is enough to undo a
+# failed deploy, but no release of the code runs on that schema.
+LOOKUPS = [
+    ("title", "Titles"),
+    ("description", "Descriptions"),
+    ("url", "Urls"),
+]
+
+
+def copy_text_to_listing(apps, schema_editor):
+    # The lookup tables use the text itself as primary key, so the foreign
+    # key columns already hold the values and no join is needed.
+    AuctionsListing = apps.get_model("auctions", "AuctionsListing")
+    AuctionsListing.objects.update(
+        **{f"{field}_text": F(f"{field}_id") for field, _ in LOOKUPS}
+    )
+
+
+def copy_text_to_lookups(apps, schema_editor):
+    AuctionsListing = apps.get_model("auctions", "AuctionsListing")
+    for field, model_name in LOOKUPS:
+        Lookup = apps.get_model("auctions", model_name)
+        values = AuctionsListing.objects.values_list(f"{field}_text", flat=True)
+        Lookup.objects.bulk_create(
+            [Lookup(**{field: value}) for value in values.distinct().iterator()],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+    AuctionsListing.objects.update(
+        **{f"{field}_id": F(f"{field}_text") for field, _ in LOOKUPS}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0005_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionslisting',
+            name='title_text',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='auctionslisting',
+            name='description_text',
+            field=models.CharField(default='', max_length=1000),
+        ),
+        migrations.AddField(
+            model_name='auctionslisting',
+            name='url_text',
+            field=models.URLField(blank=True, default='', max_length=2000),
+        ),
+        migrations.AlterField(
+            model_name='auctionslisting',
+            name='title',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='listings', to='auctions.titles'),
+        ),
+        migrations.AlterField(
+            model_name='auctionslisting',
+            name='description',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='listings', to='auctions.descriptions'),
+        ),
+        migrations.AlterField(
+            model_name='auctionslisting',
+            name='url',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='listings', to='auctions.urls'),
+        ),
+        migrations.RunPython(copy_text_to_listing, copy_text_to_lookups),
+        migrations.RemoveField(
+            model_name='auctionslisting',
+            name='title',
+        ),
+        migrations.RemoveField(
+            model_name='auctionslisting',
+            name='description',
+        ),
+        migrations.RemoveField(
+            model_name='auctionslisting',
+            name='url',
+        ),
+        migrations.RenameField(
+            model_name='auctionslisting',
+            old_name='title_text',
+            new_name='title',
+        ),
+        migrations.RenameField(
+            model_name='auctionslisting',
+            old_name='description_text',
+            new_name='description',
+        ),
+        migrations.RenameField(
+            model_name='auctionslisting',
+            old_name='url_text',
+            new_name='url',
+        ),
+        migrations.AlterField(
+            model_name='auctionslisting',
+            name='title',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='auctionslisting',
+            name='description',
+            field=models.CharField(max_length=1000),
+        ),
+        migrations.AlterField(
+            model_name='auctionslisting',
+            name='url',
+            field=models.URLField(blank=True, max_length=2000),
+        ),
+        migrations.DeleteModel(
+            name='Descriptions',
+        ),
+        migrations.DeleteModel(
+            name='Titles',
+        ),
+        migrations.DeleteModel(
+            name='Urls',
+        ),
+    ]
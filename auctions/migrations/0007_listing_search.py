@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:54
+
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE auctions_listing_fts USING fts5("
+        "title, description, tags, prefix='2 3', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute("UPDATE auctions_auctionslisting SET search_rowid = rowid")
+    schema_editor.execute(
+        "INSERT INTO auctions_listing_fts (rowid, title, description, tags) "
+        "SELECT search_rowid, title, description, "
+        "'category' || coalesce(category_id, 'none') "
+        "FROM auctions_auctionslisting"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE auctions_listing_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0006_inline_listing_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionslisting',
+            name='search_rowid',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0007_listing_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionslisting',
+            name='ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='auctionslisting',
+            index=models.Index(condition=models.Q(('ends_at__isnull', False)), fields=['status', 'ends_at'], name='listing_status_ends_idx'),
+        ),
+    ]
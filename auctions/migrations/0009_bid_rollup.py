@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0008_listing_ends_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BidRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('m', 'Minute'), ('h', 'Hour'), ('d', 'Day')], max_length=1)),
+                ('bucket', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bid_rollups', to='auctions.auctionslisting')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('listing', 'resolution', 'bucket'), name='bid_rollup_bucket_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:59
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_active_listings(apps, schema_editor):
+    AuctionCategories = apps.get_model("auctions", "AuctionCategories")
+    AuctionsListing = apps.get_model("auctions", "AuctionsListing")
+    totals = (
+        AuctionsListing.objects.filter(status="A", category__isnull=False)
+        .order_by()
+        .values_list("category")
+        .annotate(total=Count("pk"))
+    )
+    for category, total in totals:
+        AuctionCategories.objects.filter(pk=category).update(active_listings=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0009_bid_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctioncategories',
+            name='active_listings',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_active_listings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:14
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_watches(apps, schema_editor):
+    AuctionsListing = apps.get_model("auctions", "AuctionsListing")
+    Watchlist = apps.get_model("auctions", "Watchlist")
+    watches = (
+        Watchlist.objects.filter(auctionlisting=OuterRef("pk"))
+        .order_by()
+        .values("auctionlisting")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    AuctionsListing.objects.update(watch_count=Coalesce(Subquery(watches), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0010_category_active_listings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionslisting',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='auctionslisting',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='auctionslisting',
+            name='watch_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_watches, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auctionslisting',
+            index=models.Index(fields=['status', 'popularity', 'id'], name='listing_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auctionslisting',
+            index=models.Index(fields=['status', 'watch_count', 'id'], name='listing_watch_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auctionslisting',
+            index=models.Index(fields=['status', 'view_count', 'id'], name='listing_view_count_idx'),
+        ),
+    ]
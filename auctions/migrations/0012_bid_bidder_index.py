@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0011_listing_activity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bids',
+            index=models.Index(fields=['created_by', 'listing', 'value', 'created_at'], name='bid_bidder_listing_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0012_bid_bidder_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comments',
+            name='comment_listing_parent_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comments',
+            index=models.Index(fields=['listing', 'parent_comment', 'created_at', 'id'], name='comment_listing_parent_idx'),
+        ),
+    ]
@@ -1,31 +1,24 @@
+from collections import defaultdict
 from decimal import Decimal
 import uuid
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 
 class User(AbstractUser):
     pass
 
 
-class Titles(models.Model):
-    title = models.CharField(max_length=100, primary_key=True)
-
-    def __str__(self):
-        return self.title
-
-
-class Descriptions(models.Model):
-    description = models.CharField(max_length=1000, primary_key=True)
-
-    def __str__(self):
-        return self.description
-
-
 class AuctionCategories(models.Model):
     id = models.UUIDField(default=uuid.uuid4, primary_key=True, editable=False)
     category = models.CharField(max_length=100, unique=True)
+    # Kept in step with listing creates, closes and cancels; see count_listings.
+    active_listings = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["category"]
@@ -33,12 +26,90 @@ class AuctionCategories(models.Model):
     def __str__(self):
         return self.category
 
+    @classmethod
+    def count_listings(cls, changes):
+        """Apply ``{category id: change}`` to the active listing counts at once."""
+        changes = {pk: change for pk, change in changes.items() if pk and change}
+        if changes:
+            cls.objects.filter(pk__in=changes).update(
+                active_listings=F("active_listings") + _by_value(changes)
+            )
+
+    @classmethod
+    def backfill_listing_counts(cls):
+        """Recompute active_listings of every category from the listings table."""
+        totals = (
+            AuctionsListing.objects.filter(
+                status=AuctionsListing.Status.ACTIVE, category__isnull=False
+            )
+            .order_by()
+            .values_list("category")
+            .annotate(total=Count("pk"))
+        )
+        return cls.objects.update(active_listings=_by_value(dict(totals)))
 
-class Urls(models.Model):
-    url = models.URLField(primary_key=True, max_length=2000)
 
-    def __str__(self):
-        return self.url
+def _by_value(values, default=0):
+    """Return a CASE mapping each primary key of ``values`` to its value.
+
+    Keys sharing a value share one WHEN, so the expression stays short
+    however many rows it updates; other rows get ``default``.
+    """
+    keys = defaultdict(list)
+    for pk, value in values.items():
+        keys[value].append(pk)
+    return Case(
+        *[When(pk__in=pks, then=value) for value, pks in keys.items()],
+        default=default,
+    )
+
+
+class ListingQuerySet(models.QuerySet):
+    def cards(self):
+        """Project only what a listing card renders, with its FKs joined."""
+        latest_bid = Bids.objects.filter(listing=OuterRef("pk")).order_by("-created_at")
+        return (
+            self.select_related("category")
+            .only(
+                "id",
+                "created_at",
+                "title",
+                "url",
+                "status",
+                "winner",
+                "current_bid",
+                "bid_count",
+                "modified_at",
+                "view_count",
+                "watch_count",
+                "popularity",
+                "category__category",
+            )
+            .annotate(
+                price=Coalesce(
+                    "current_bid",
+                    Subquery(latest_bid.values("value")[:1]),
+                    output_field=models.DecimalField(max_digits=7, decimal_places=2),
+                )
+            )
+        )
+
+    def freshness(self):
+        """Annotate when the latest bid and comment on each listing were made.
+
+        With ``modified_at`` these date everything a listing page shows, so
+        a conditional GET can be answered without building the page.
+        """
+        return self.annotate(
+            **{
+                f"latest_{name}_at": Subquery(
+                    model.objects.filter(listing=OuterRef("pk"))
+                    .order_by("-created_at")
+                    .values("created_at")[:1]
+                )
+                for name, model in [("bid", Bids), ("comment", Comments)]
+            }
+        )
 
 
 class AuctionsListing(models.Model):
@@ -47,6 +118,14 @@ class AuctionsListing(models.Model):
         INACTIVE = "I", "Inactive"
         SOLD = "S", "Sold"
 
+    class Standing(models.TextChoices):
+        """Where a bidder stands on a listing; see bid_standings."""
+
+        LEADING = "leading", "Leading"
+        OUTBID = "outbid", "Outbid"
+        WON = "won", "Won"
+        LOST = "lost", "Ended"
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_by = models.ForeignKey(
         User,
@@ -63,25 +142,172 @@ class AuctionsListing(models.Model):
         blank=True,
         null=True,
     )
-    url = models.ForeignKey(
-        Urls, on_delete=models.RESTRICT, blank=True, related_name="listings"
-    )
-    title = models.ForeignKey(
-        Titles, on_delete=models.RESTRICT, blank=False, related_name="listings"
-    )
-    description = models.ForeignKey(
-        Descriptions,
-        on_delete=models.RESTRICT,
-        blank=False,
-        related_name="listings",
-    )
+    url = models.URLField(max_length=2000, blank=True)
+    title = models.CharField(max_length=100)
+    description = models.CharField(max_length=1000)
     status = models.CharField(max_length=1, default=Status.ACTIVE, choices=Status)
     winner = models.ForeignKey(
         User, models.SET_NULL, blank=True, null=True, related_name="winner_listings"
     )
+    current_bid = models.DecimalField(
+        decimal_places=2, max_digits=7, blank=True, null=True
+    )
+    bid_count = models.PositiveIntegerField(default=0)
+    current_leader = models.ForeignKey(
+        User, models.SET_NULL, blank=True, null=True, related_name="leading_listings"
+    )
+    ends_at = models.DateTimeField(blank=True, null=True)
+    search_rowid = models.BigIntegerField(blank=True, null=True, unique=True, editable=False)
+    # Written behind by auctions.activity, so they trail the last few seconds.
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    watch_count = models.PositiveIntegerField(default=0, editable=False)
+    popularity = models.FloatField(default=0, editable=False)
+
+    objects = ListingQuerySet.as_manager()
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="listing_created_id_idx"),
+            models.Index(
+                fields=["status", "created_at", "id"], name="listing_status_created_idx"
+            ),
+            models.Index(
+                fields=["category", "created_at", "id"],
+                condition=models.Q(status="A"),
+                name="listing_active_category_idx",
+            ),
+            models.Index(
+                fields=["status", "ends_at"],
+                condition=models.Q(ends_at__isnull=False),
+                name="listing_status_ends_idx",
+            ),
+            models.Index(
+                fields=["status", "popularity", "id"], name="listing_popularity_idx"
+            ),
+            models.Index(
+                fields=["status", "watch_count", "id"], name="listing_watch_count_idx"
+            ),
+            models.Index(
+                fields=["status", "view_count", "id"], name="listing_view_count_idx"
+            ),
+        ]
+
+    @property
+    def is_open(self):
+        """Whether bids are accepted; ended listings stay ACTIVE until closed."""
+        return self.status == self.Status.ACTIVE and (
+            self.ends_at is None or self.ends_at > timezone.now()
+        )
+
+    def record_bid(self, value, user):
+        """Create a bid and update the denormalized bid columns in one transaction."""
+        with transaction.atomic():
+            bid = Bids.objects.create(value=value, listing=self, created_by=user)
+            AuctionsListing.objects.filter(pk=self.pk).update(
+                current_bid=value,
+                bid_count=F("bid_count") + 1,
+                current_leader=user,
+            )
+        self.refresh_from_db(fields=["current_bid", "bid_count", "current_leader"])
+        return bid
+
+    @classmethod
+    def backfill_bid_stats(cls, queryset=None):
+        """Recompute current_bid, bid_count and current_leader from the Bids table."""
+        queryset = cls.objects.all() if queryset is None else queryset
+        top_bid = Bids.objects.filter(listing=OuterRef("pk")).order_by(
+            "-value", "-created_at"
+        )
+        bid_count = (
+            Bids.objects.filter(listing=OuterRef("pk"))
+            .order_by()
+            .values("listing")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        return queryset.update(
+            current_bid=Subquery(top_bid.values("value")[:1]),
+            bid_count=Coalesce(Subquery(bid_count), Value(0)),
+            current_leader=Subquery(top_bid.values("created_by")[:1]),
+        )
+
+    @classmethod
+    def bid_standings(cls, user, limit):
+        """Sort the listings ``user`` bid on by where they stand, in one query.
+
+        Their bids are grouped per listing, each listing gets a Standing from
+        its denormalized leader, winner and status, and window functions
+        number and count the listings of each standing, so only the ``limit``
+        most recently bid on come back however many bids the user has. The
+        user's own listings are left out, since the starting bid is theirs.
+        Returns a ``{"standing", "total", "listings"}`` dict per Standing;
+        each listing carries ``my_bid`` (their highest) and ``my_bids``.
+        """
+        listings, bids = cls._meta.db_table, Bids._meta.db_table
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        rows = cls.objects.raw(
+            f"""
+            WITH mine AS (
+                SELECT listing_id, MAX(value) AS my_bid, COUNT(*) AS my_bids,
+                       MAX(created_at) AS last_bid_at
+                FROM {bids}
+                WHERE created_by_id = %s
+                GROUP BY listing_id
+            ), standing AS (
+                SELECT l.id, l.title, l.url, l.status, l.current_bid, l.bid_count,
+                       l.winner_id, l.current_leader_id, l.ends_at,
+                       mine.my_bid, mine.my_bids, mine.last_bid_at,
+                       CASE
+                           WHEN l.winner_id = %s THEN %s
+                           WHEN l.status = %s AND (l.ends_at IS NULL OR l.ends_at > %s)
+                           THEN CASE WHEN l.current_leader_id = %s THEN %s ELSE %s END
+                           WHEN l.status = %s AND l.current_leader_id = %s THEN %s
+                           ELSE %s
+                       END AS standing
+                FROM mine JOIN {listings} l ON l.id = mine.listing_id
+                WHERE l.created_by_id IS NULL OR l.created_by_id <> %s
+            )
+            SELECT * FROM (
+                SELECT standing.*,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY standing ORDER BY last_bid_at DESC, id
+                       ) AS standing_rank,
+                       COUNT(*) OVER (PARTITION BY standing) AS standing_total
+                FROM standing
+            ) ranked
+            WHERE standing_rank <= %s
+            ORDER BY standing_rank
+            """,
+            [
+                user.pk,
+                user.pk,
+                cls.Standing.WON,
+                cls.Status.ACTIVE,
+                now,
+                user.pk,
+                cls.Standing.LEADING,
+                cls.Standing.OUTBID,
+                # Ended but not closed yet: close_auctions will make it won.
+                cls.Status.ACTIVE,
+                user.pk,
+                cls.Standing.WON,
+                cls.Standing.LOST,
+                user.pk,
+                limit,
+            ],
+        )
+        standings = {
+            standing: {"standing": standing, "total": 0, "listings": []}
+            for standing in cls.Standing
+        }
+        for listing in rows:
+            # Aggregates skip the field's converters on some backends.
+            listing.my_bid = Decimal(str(listing.my_bid)).quantize(Decimal("0.01"))
+            section = standings[listing.standing]
+            section["total"] = listing.standing_total
+            section["listings"].append(listing)
+        return list(standings.values())
 
 
 class Comments(models.Model):
@@ -106,25 +332,88 @@ class Comments(models.Model):
         null=True,
     )
 
-    def get_all_comments(self):
-        comments = [{"comment": self.user_comment, "id": self.id, "responses": []}]
+    @classmethod
+    def get_comment_tree(cls, listing_id, page=1, per_page=None, max_depth=None, root=None):
+        """Load one page of a listing's comment threads with a single query.
 
-        for response in self.responses.all():
-            comments[0]["responses"].append(
-                {
-                    "comment": response.user_comment,
-                    "id": response.id,
-                    "responses": response.get_all_comments(),
-                }
+        A recursive CTE selects a page of top-level comments (or the single
+        comment ``root``) and their replies down to ``max_depth`` levels, and
+        the tree is assembled in memory. Every returned comment carries a
+        ``replies`` list and a ``has_more_replies`` flag for replies that were
+        cut off by the depth limit. Comments are ordered newest first, with the
+        id breaking ties so that comments sharing a timestamp keep their page.
+        """
+        per_page = per_page or settings.COMMENTS_PER_PAGE
+        max_depth = max_depth or settings.COMMENT_MAX_DEPTH
+        table = cls._meta.db_table
+        listing_id = cls._meta.get_field("listing").target_field.get_db_prep_value(
+            listing_id, connection
+        )
+        if root is None:
+            root_filter, root_params = "parent_comment_id IS NULL", []
+        else:
+            root_filter = "id = %s"
+            root_params = [
+                cls._meta.pk.get_db_prep_value(root, connection)
+            ]
+        comments = list(
+            cls.objects.raw(
+                f"""
+                WITH RECURSIVE thread (id, depth, total_roots) AS (
+                    SELECT id, 0, total_roots FROM (
+                        SELECT id, created_at, COUNT(*) OVER () AS total_roots
+                        FROM {table}
+                        WHERE listing_id = %s AND {root_filter}
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT %s OFFSET %s
+                    ) roots
+                    UNION ALL
+                    SELECT c.id, thread.depth + 1, thread.total_roots
+                    FROM {table} c JOIN thread ON c.parent_comment_id = thread.id
+                    WHERE thread.depth < %s
+                )
+                SELECT c.*, thread.depth, thread.total_roots
+                FROM {table} c JOIN thread ON c.id = thread.id
+                ORDER BY c.created_at DESC, c.id DESC
+                """,
+                [listing_id, *root_params, per_page, (page - 1) * per_page, max_depth],
             )
+        )
 
-        return comments
+        roots, by_id = [], {}
+        for comment in comments:
+            comment.replies = []
+            comment.has_more_replies = False
+            by_id[comment.id] = comment
+        for comment in comments:
+            if comment.depth == 0:
+                roots.append(comment)
+            elif comment.depth == max_depth:
+                by_id[comment.parent_comment_id].has_more_replies = True
+            else:
+                by_id[comment.parent_comment_id].replies.append(comment)
+
+        total = roots[0].total_roots if roots else 0
+        return {
+            "comments": roots,
+            "page": page,
+            "has_previous": page > 1,
+            "has_next": page * per_page < total,
+            "total": total,
+        }
 
     def __str__(self):
         return self.user_comment
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Ends in id too: the comment pages break created_at ties by id.
+            models.Index(
+                fields=["listing", "parent_comment", "created_at", "id"],
+                name="comment_listing_parent_idx",
+            ),
+        ]
 
 
 class Bids(models.Model):
@@ -146,6 +435,46 @@ class Bids(models.Model):
     class Meta:
         get_latest_by = "created_at"
         ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["listing", "created_at"], name="bid_listing_created_idx"),
+            models.Index(fields=["listing", "value"], name="bid_listing_value_idx"),
+            # Covers bid_standings, which groups a bidder's bids by listing.
+            models.Index(
+                fields=["created_by", "listing", "value", "created_at"],
+                name="bid_bidder_listing_idx",
+            ),
+        ]
+
+
+class BidRollup(models.Model):
+    """Open, high, low and close of a listing's bids over one time bucket.
+
+    Maintained incrementally by ``bid_history.record`` as bids are placed.
+    """
+
+    class Resolution(models.TextChoices):
+        MINUTE = "m", "Minute"
+        HOUR = "h", "Hour"
+        DAY = "d", "Day"
+
+    listing = models.ForeignKey(
+        AuctionsListing, on_delete=models.CASCADE, related_name="bid_rollups"
+    )
+    resolution = models.CharField(max_length=1, choices=Resolution)
+    bucket = models.DateTimeField()
+    open = models.DecimalField(decimal_places=2, max_digits=7)
+    high = models.DecimalField(decimal_places=2, max_digits=7)
+    low = models.DecimalField(decimal_places=2, max_digits=7)
+    close = models.DecimalField(decimal_places=2, max_digits=7)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["listing", "resolution", "bucket"],
+                name="bid_rollup_bucket_unique",
+            ),
+        ]
 
 
 class Watchlist(models.Model):
@@ -160,3 +489,10 @@ class Watchlist(models.Model):
         AuctionsListing, models.CASCADE, related_name="user_watchlist"
     )
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "auctionlisting"], name="watchlist_user_listing_idx"
+            ),
+        ]
@@ -0,0 +1,99 @@
+import base64
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# ?sort= orderings of active listings, highest first, from the activity
+# counters; each value is the cursor key of its pages.
+SORTS = {"trending": "popularity", "watched": "watch_count", "viewed": "view_count"}
+
+
+def encode_cursor(listing, key="created_at"):
+    """Encode the position of a listing, or of a ``.values()`` row of one."""
+    if isinstance(listing, dict):
+        value, listing_id = listing[key], listing["id"]
+    else:
+        value, listing_id = getattr(listing, key), listing.id
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = f"{value}|{listing_id.hex}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, parse=datetime.fromisoformat):
+    """Return the (key, id) pair of a cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        value, listing_id = raw.split("|")
+        return parse(value), uuid.UUID(listing_id)
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+
+def get_page_size(request):
+    try:
+        page_size = int(request.GET["page_size"])
+    except (KeyError, ValueError):
+        return settings.LISTINGS_PER_PAGE
+    return min(max(page_size, 1), settings.LISTINGS_MAX_PER_PAGE)
+
+
+def _cursor_query(request, queryset, key, descending):
+    page_size = get_page_size(request)
+    parse = queryset.model._meta.get_field(key).to_python
+    after = decode_cursor(request.GET.get("after", ""), parse)
+    before = decode_cursor(request.GET.get("before", ""), parse) if not after else None
+
+    # Walking back reverses the order and the comparisons, and so does a
+    # descending sort.
+    forward = before is None
+    cursor = after if forward else before
+    if cursor:
+        value, listing_id = cursor
+        op = "gt" if forward != descending else "lt"
+        queryset = queryset.filter(
+            Q(**{f"{key}__{op}": value}) | Q(**{key: value, f"id__{op}": listing_id})
+        )
+    sign = "" if forward != descending else "-"
+    queryset = queryset.order_by(f"{sign}{key}", f"{sign}id")
+    return queryset[: page_size + 1], page_size, after, before, key
+
+
+def _cursor_page(rows, page_size, after, before, key):
+    if before:
+        has_previous, has_next = len(rows) > page_size, True
+        rows = rows[:page_size][::-1]
+    else:
+        has_previous, has_next = after is not None, len(rows) > page_size
+        rows = rows[:page_size]
+
+    return {
+        "auctions": rows,
+        "next_cursor": encode_cursor(rows[-1], key) if rows and has_next else None,
+        "previous_cursor": (
+            encode_cursor(rows[0], key) if rows and has_previous else None
+        ),
+        "page_size": page_size,
+    }
+
+
+def paginate_by_cursor(request, queryset, key="created_at", descending=False):
+    """Slice a listing queryset with keyset pagination on (key, id).
+
+    ``?after=<cursor>`` moves forward and ``?before=<cursor>`` moves back;
+    each page is a single indexed range scan no matter how deep it is.
+    """
+    queryset, *page = _cursor_query(request, queryset, key, descending)
+    return _cursor_page(list(queryset), *page)
+
+
+async def apaginate_by_cursor(
+    request, queryset, key="created_at", descending=False
+):
+    """Async version of paginate_by_cursor()."""
+    queryset, *page = _cursor_query(request, queryset, key, descending)
+    return _cursor_page([row async for row in queryset], *page)
@@ -0,0 +1,144 @@
+"""Token-bucket rate limits on the write endpoints.
+
+``RATE_LIMITS`` maps URL names to a limit per signed-in user and per client
+IP, written ``"<requests>/<s|m|h>"``: a bucket holds that many tokens and
+refills at that rate, so bursts up to the limit pass and sustained traffic
+is held to the rate. Views decorated with ``rate_limited`` spend one token
+from each bucket per POST and answer 429 with ``Retry-After`` once one is
+empty. Buckets live in the store named by ``RATE_LIMIT_STORE``: the default
+``InProcessStore`` needs no services but only limits its own process;
+``CacheStore`` shares buckets between workers through the
+``RATE_LIMIT_CACHE`` alias, at the cost of letting a few extra requests
+through when workers race on the same bucket.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import cache, lru_cache, wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """Return ``(capacity, tokens per second)`` for a ``"<requests>/<period>"``."""
+    requests, period = rate.split("/")
+    capacity = int(requests)
+    return capacity, capacity / PERIODS[period]
+
+
+def _refill(tokens, updated, capacity, refill, now):
+    return min(capacity, tokens + (now - updated) * refill)
+
+
+class InProcessStore:
+    """Buckets in a dict of this process, behind one lock."""
+
+    # Beyond this many buckets, the least recently used ones are dropped.
+    max_buckets = 100_000
+
+    def __init__(self):
+        # Kept in order of last use, so the oldest bucket is evicted first.
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, refill, now):
+        """Spend a token; return 0, or the seconds until one is available."""
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (capacity, now))
+            tokens = _refill(tokens, updated, capacity, refill, now)
+            allowed = tokens >= 1
+            self.buckets[key] = (tokens - 1 if allowed else tokens, now)
+            # A dropped bucket counts as full, which only favours clients
+            # idle for longest.
+            while len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+            return 0 if allowed else (1 - tokens) / refill
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheStore:
+    """Buckets in a Django cache, shared by every worker that uses it."""
+
+    def __init__(self):
+        self.cache = caches[settings.RATE_LIMIT_CACHE]
+
+    def take(self, key, capacity, refill, now):
+        tokens, updated = self.cache.get(key, (capacity, now))
+        tokens = _refill(tokens, updated, capacity, refill, now)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # Expire the entry once the bucket would be full again.
+        timeout = math.ceil((capacity - tokens) / refill) + 1
+        self.cache.set(key, (tokens, now), timeout)
+        return 0 if allowed else (1 - tokens) / refill
+
+
+@cache
+def get_store():
+    return import_string(settings.RATE_LIMIT_STORE)()
+
+
+def client_ip(request):
+    # Behind a proxy, have it set REMOTE_ADDR (e.g. uWSGI, or gunicorn's
+    # --forwarded-allow-ips) rather than trusting X-Forwarded-For here.
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def check(request):
+    """Spend a token from each bucket the request falls in, in order.
+
+    Returns 0 if it may proceed, or the seconds to wait before retrying. The
+    buckets after an empty one are left alone, so a user over their limit
+    does not use up the allowance of everyone else behind the same address.
+    """
+    limits = settings.RATE_LIMITS.get(request.resolver_match.url_name)
+    if not limits:
+        return 0
+    # Wall-clock time, as CacheStore buckets are shared between processes.
+    now = time.time()
+    store = get_store()
+    for scope, rate in limits.items():
+        if scope == "user":
+            if not request.user.is_authenticated:
+                continue
+            subject = request.user.pk
+        else:
+            subject = client_ip(request)
+        capacity, refill = parse_rate(rate)
+        key = f"ratelimit:{request.resolver_match.url_name}:{scope}:{rate}:{subject}"
+        wait = store.take(key, capacity, refill, now)
+        if wait:
+            return wait
+    return 0
+
+
+def rate_limited(view):
+    """Apply the view's RATE_LIMITS to its POST requests."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method == "POST":
+            wait = check(request)
+            if wait:
+                return HttpResponse(
+                    "Too many requests; please slow down.",
+                    status=429,
+                    content_type="text/plain",
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+        return view(request, *args, **kwargs)
+
+    return wrapper
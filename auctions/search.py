@@ -0,0 +1,205 @@
+"""Full-text search over listing titles and descriptions.
+
+On SQLite the text lives in an FTS5 table whose rowid is stored on the
+listing as ``search_rowid``. The category is indexed as a token in a
+``tags`` column so a category filter is answered by the full-text index
+itself; the status filter joins the listing row, since most matches pass
+it. The write paths keep the index in sync through the listing signals;
+bulk writers call ``index_rowids``, ``reindex_listings`` or ``rebuild_index``
+afterwards.
+Other database backends fall back to a substring match.
+"""
+
+import re
+import uuid
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import AuctionsListing
+
+
+FTS_TABLE = "auctions_listing_fts"
+
+_terms = re.compile(r"\w+", re.UNICODE)
+
+
+def is_enabled():
+    return connection.vendor == "sqlite"
+
+
+def category_tag(category_id):
+    return f"category{uuid.UUID(str(category_id)).hex}" if category_id else "categorynone"
+
+
+def listing_tags(listing):
+    return category_tag(listing.category_id)
+
+
+# SQL equivalent of listing_tags(), for set-based (re)indexing.
+TAGS_SQL = "'category' || coalesce(category_id, 'none')"
+
+
+def rebuild_index():
+    """Re-index every listing with set-based statements."""
+    if not is_enabled():
+        return
+    table = AuctionsListing._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(f"UPDATE {table} SET search_rowid = NULL")
+        cursor.execute(f"UPDATE {table} SET search_rowid = rowid")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, tags) "
+            f"SELECT search_rowid, title, description, {TAGS_SQL} FROM {table}"
+        )
+
+
+def allocate_rowids(count):
+    """Return the first of ``count`` consecutive unused index rowids.
+
+    Bulk writers store them as ``search_rowid`` when inserting listings and
+    then index them with ``index_rowids``. Call it in the inserting
+    transaction, which holds the write lock, so no other writer takes them.
+    """
+    if not is_enabled():
+        return None
+    table = AuctionsListing._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT max(coalesce((SELECT max(rowid) FROM {FTS_TABLE}), 0), "
+            f"coalesce((SELECT max(search_rowid) FROM {table}), 0))"
+        )
+        return cursor.fetchone()[0] + 1
+
+
+def index_rowids(first, last):
+    """Index the listings holding search rowids ``first`` to ``last``."""
+    if not is_enabled() or last < first:
+        return
+    table = AuctionsListing._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, tags) "
+            f"SELECT search_rowid, title, description, {TAGS_SQL} FROM {table} "
+            f"WHERE search_rowid BETWEEN %s AND %s",
+            [first, last],
+        )
+
+
+def reindex_listings(listing_ids):
+    """Refresh the indexed tags of listings whose category changed in bulk."""
+    if not is_enabled() or not listing_ids:
+        return
+    table = AuctionsListing._meta.db_table
+    pk = AuctionsListing._meta.pk
+    ids = [pk.get_db_prep_value(listing_id, connection) for listing_id in listing_ids]
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {FTS_TABLE} SET tags = ("
+            f"SELECT {TAGS_SQL} FROM {table} WHERE search_rowid = {FTS_TABLE}.rowid"
+            f") WHERE rowid IN ("
+            f"SELECT search_rowid FROM {table} WHERE id IN ({placeholders})"
+            f")",
+            ids,
+        )
+
+
+def index_listing(listing):
+    if not is_enabled():
+        return
+    values = [listing.title, listing.description, listing_tags(listing)]
+    with connection.cursor() as cursor:
+        if listing.search_rowid is not None:
+            cursor.execute(
+                f"UPDATE {FTS_TABLE} SET title = %s, description = %s, tags = %s "
+                f"WHERE rowid = %s",
+                [*values, listing.search_rowid],
+            )
+            if cursor.rowcount:
+                return
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (title, description, tags) VALUES (%s, %s, %s)",
+            values,
+        )
+        listing.search_rowid = cursor.lastrowid
+    AuctionsListing.objects.filter(pk=listing.pk).update(
+        search_rowid=listing.search_rowid
+    )
+
+
+def remove_listing(listing):
+    if not is_enabled() or listing.search_rowid is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [listing.search_rowid]
+        )
+
+
+def to_match_expression(query, category=None):
+    """Build an FTS5 expression that matches every word of ``query``.
+
+    Only the last word is a prefix match, as it may still be half-typed;
+    prefix queries merge many doclists and are much slower than exact terms.
+    """
+    terms = [f'"{term}"' for term in _terms.findall(query.lower())]
+    if not terms:
+        return ""
+    terms[-1] += "*"
+    expression = f"{{title description}} : ({' '.join(terms)})"
+    if category:
+        expression += f" AND tags : {category_tag(category)}"
+    return expression
+
+
+def search_listings(query, status=AuctionsListing.Status.ACTIVE, category=None, page=1):
+    """Return one page of listing cards ranked by relevance, and whether more exist."""
+    per_page = settings.LISTINGS_PER_PAGE
+    match = to_match_expression(query, category)
+    if not match:
+        return [], False
+
+    if not is_enabled():
+        queryset = AuctionsListing.objects.cards().filter(
+            Q(title__icontains=query) | Q(description__icontains=query)
+        )
+        if status:
+            queryset = queryset.filter(status=status)
+        if category:
+            queryset = queryset.filter(category=category)
+        rows = list(
+            queryset.order_by("-created_at")[
+                (page - 1) * per_page : page * per_page + 1
+            ]
+        )
+        return rows[:per_page], len(rows) > per_page
+
+    # Ranking every match of a very common term is linear in the corpus, so
+    # only the newest SEARCH_CANDIDATE_LIMIT matches are scored. FTS5 walks
+    # its doclists in rowid order, which makes that cut-off cheap.
+    table = AuctionsListing._meta.db_table
+    status_filter, params = "", [match]
+    if status:
+        status_filter = " AND listing.status = %s"
+        params.append(status)
+    params += [settings.SEARCH_CANDIDATE_LIMIT, per_page + 1, (page - 1) * per_page]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id FROM ("
+            f"SELECT listing.id, bm25({FTS_TABLE}, 10.0, 1.0, 0.0) AS score "
+            f"FROM {FTS_TABLE} "
+            f"JOIN {table} listing ON listing.search_rowid = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{status_filter} "
+            f"ORDER BY {FTS_TABLE}.rowid DESC LIMIT %s"
+            f") ORDER BY score LIMIT %s OFFSET %s",
+            params,
+        )
+        ids = [uuid.UUID(row[0]) for row in cursor.fetchall()]
+
+    has_next = len(ids) > per_page
+    ids = ids[:per_page]
+    listings = AuctionsListing.objects.cards().in_bulk(ids)
+    return [listings[listing_id] for listing_id in ids if listing_id in listings], has_next
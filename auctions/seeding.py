@@ -0,0 +1,169 @@
+"""Generate a realistic auction dataset for benchmarks and load tests.
+
+Activity follows a Zipf distribution: a few listings draw most of the bids,
+comments and watchers, and a few users place most of the bids. Comments
+mostly answer the latest comment on their listing, so busy listings grow
+deep threads. Rows are written with bulk_create, which skips the model
+signals, so the denormalized bid columns are filled in here and the search
+index, bid history rollups, category and watch counts are rebuilt at the end.
+"""
+
+import itertools
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from . import activity, bid_history, search
+from .models import AuctionCategories, AuctionsListing, Bids, Comments, User, Watchlist
+
+
+NOUNS = [
+    "lamp", "chair", "table", "guitar", "camera", "bicycle", "watch", "phone",
+    "laptop", "monitor", "keyboard", "mouse", "speaker", "jacket", "sneakers",
+    "backpack", "mirror", "sofa", "blender", "kettle", "drone", "tripod",
+    "novel", "vinyl", "poster", "rug", "vase", "clock", "printer", "router",
+]
+ADJECTIVES = [
+    "vintage", "new", "used", "wooden", "leather", "wireless", "compact",
+    "antique", "handmade", "portable", "classic", "modern", "rare", "signed",
+    "refurbished", "electric", "folding", "ceramic", "silver", "golden",
+]
+
+# Every seeded user logs in with this password; user0 is also staff.
+PASSWORD = "benchmark"
+
+DEFAULTS = {
+    "users": 1000,
+    "categories": 30,
+    "listings": 5000,
+    "bids": 50_000,
+    "comments": 20_000,
+    "watches": 10_000,
+}
+
+
+def add_arguments(parser):
+    """Add the dataset size options shared by the seeding commands."""
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def zipf(rng, population, exponent=1.0):
+    """Return a function drawing ``k`` items, the n-th weighted 1 / n**exponent."""
+    population = list(population)
+    weights = list(
+        itertools.accumulate(
+            1 / rank**exponent for rank in range(1, len(population) + 1)
+        )
+    )
+    return lambda k=1: rng.choices(population, cum_weights=weights, k=k)
+
+
+def seed(
+    rng, users, categories, listings, bids, comments, watches, batch_size=5000, **_
+):
+    """Write the dataset and return how many rows of each kind were created."""
+    password = make_password(PASSWORD)
+    user_rows = User.objects.bulk_create(
+        [
+            User(username=f"user{n}", password=password, is_staff=n == 0)
+            for n in range(users)
+        ],
+        batch_size=batch_size,
+    )
+    category_rows = AuctionCategories.objects.bulk_create(
+        [AuctionCategories(category=f"Category {n}") for n in range(categories)]
+    )
+
+    now = timezone.now()
+    listing_rows = [
+        listing(rng, rng.choice(user_rows), rng.choice(category_rows), now)
+        for _ in range(listings)
+    ]
+    # Shuffled so popularity does not follow creation order.
+    popular_listings = zipf(rng, rng.sample(listing_rows, len(listing_rows)))
+    active_bidders = zipf(rng, rng.sample(user_rows, len(user_rows)))
+
+    # Like add_listing, every listing opens with its owner's starting bid.
+    bid_rows = [
+        Bids(listing=row, created_by=row.created_by, value=row.current_bid)
+        for row in listing_rows
+    ]
+    for row, bidder in zip(popular_listings(bids), active_bidders(bids)):
+        row.current_bid += Decimal(rng.randint(1, 100)) / 100
+        row.bid_count += 1
+        row.current_leader = bidder
+        bid_rows.append(Bids(listing=row, created_by=bidder, value=row.current_bid))
+    for row in listing_rows:
+        if row.status == AuctionsListing.Status.SOLD and row.bid_count > 1:
+            row.winner = row.current_leader
+        elif row.status == AuctionsListing.Status.SOLD:
+            row.status = AuctionsListing.Status.INACTIVE
+    AuctionsListing.objects.bulk_create(listing_rows, batch_size=batch_size)
+    Bids.objects.bulk_create(bid_rows, batch_size=batch_size)
+
+    comment_rows, latest = [], {}
+    for row in popular_listings(comments):
+        roll = rng.random()
+        if roll < 0.5:
+            parent = latest.get(row.id)
+        elif roll < 0.7 and comment_rows:
+            parent = rng.choice(comment_rows)
+            row = parent.listing
+        else:
+            parent = None
+        comment = Comments(
+            listing=row,
+            parent_comment=parent,
+            created_by=rng.choice(user_rows),
+            user_comment=f"What about the {rng.choice(NOUNS)}?",
+        )
+        comment_rows.append(comment)
+        latest[row.id] = comment
+    Comments.objects.bulk_create(comment_rows, batch_size=batch_size)
+
+    watched = set()
+    for row in popular_listings(watches):
+        watched.add((rng.choice(user_rows), row))
+    Watchlist.objects.bulk_create(
+        [Watchlist(user=user, auctionlisting=row) for user, row in watched],
+        batch_size=batch_size,
+    )
+
+    search.rebuild_index()
+    bid_history.rebuild()
+    AuctionCategories.backfill_listing_counts()
+    activity.backfill_watch_counts()
+    return {
+        "users": len(user_rows),
+        "categories": len(category_rows),
+        "listings": len(listing_rows),
+        "bids": len(bid_rows),
+        "comments": len(comment_rows),
+        "watches": len(watched),
+    }
+
+
+def listing(rng, owner, category, now):
+    noun = rng.choice(NOUNS)
+    adjectives = rng.sample(ADJECTIVES, 2)
+    roll = rng.random()
+    return AuctionsListing(
+        created_by=owner,
+        category=category,
+        title=f"{adjectives[0].title()} {noun}",
+        description=(
+            f"A {adjectives[1]} {noun} in good condition, "
+            f"also great with a {rng.choice(NOUNS)}."
+        ),
+        status=(
+            AuctionsListing.Status.SOLD if roll < 0.1 else AuctionsListing.Status.ACTIVE
+        ),
+        ends_at=now + timedelta(hours=rng.randint(1, 168)) if roll > 0.7 else None,
+        current_bid=Decimal(rng.randint(100, 10_000)) / 100,
+        bid_count=1,
+        current_leader=owner,
+    )
@@ -0,0 +1,183 @@
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from . import events
+from .models import AuctionCategories, AuctionsListing, Bids
+
+
+BID_MAX_ATTEMPTS = 5
+BID_RETRY_DELAY = 0.01
+
+
+class BidRejected(Exception):
+    """Raised when a bid cannot be placed on a listing."""
+
+
+def is_valid_bid(bid_value, current_bid, bid_count):
+    # bid_count includes the starting bid, which may be matched but not undercut.
+    if current_bid is None:
+        return True
+    if bid_count <= 1:
+        return bid_value >= current_bid
+    return bid_value > current_bid
+
+
+def _open_listings():
+    # Listings past ends_at stay ACTIVE until the expiry worker closes them.
+    return AuctionsListing.objects.filter(
+        Q(ends_at__isnull=True) | Q(ends_at__gt=timezone.now()),
+        status=AuctionsListing.Status.ACTIVE,
+    )
+
+
+def _accepts_bid(bid_value):
+    return (
+        Q(current_bid__isnull=True)
+        | Q(current_bid__lt=bid_value)
+        | Q(bid_count__lte=1, current_bid__lte=bid_value)
+    )
+
+
+def _rejection_reason(listing_id, user):
+    listing = AuctionsListing.objects.filter(pk=listing_id).only(
+        "status", "ends_at", "created_by"
+    ).first()
+    if listing is None:
+        return BidRejected("This auction does not exist.")
+    if not listing.is_open:
+        return BidRejected("This auction is no longer accepting bids.")
+    if listing.created_by_id == user.pk:
+        return BidRejected("You cannot bid on your own auction.")
+    return BidRejected("Your bid must be higher than the current bid.")
+
+
+def _place_bid_locked(listing_id, user, bid_value):
+    listing = (
+        _open_listings()
+        .select_for_update()
+        .filter(pk=listing_id)
+        .exclude(created_by=user)
+        .only("current_bid", "bid_count")
+        .first()
+    )
+    if listing is None or not is_valid_bid(
+        bid_value, listing.current_bid, listing.bid_count
+    ):
+        return None
+    AuctionsListing.objects.filter(pk=listing_id).update(
+        current_bid=bid_value, bid_count=F("bid_count") + 1, current_leader=user
+    )
+    return Bids.objects.create(value=bid_value, listing_id=listing_id, created_by=user)
+
+
+def _place_bid_conditional(listing_id, user, bid_value):
+    # SQLite has no row locks; a single conditional UPDATE takes the write lock
+    # and validates against the committed price atomically.
+    updated = (
+        _open_listings()
+        .filter(_accepts_bid(bid_value), pk=listing_id)
+        .exclude(created_by=user)
+        .update(
+            current_bid=bid_value, bid_count=F("bid_count") + 1, current_leader=user
+        )
+    )
+    if not updated:
+        return None
+    return Bids.objects.create(value=bid_value, listing_id=listing_id, created_by=user)
+
+
+def place_bid(listing_id, user, bid_value):
+    """Validate and record a bid on a listing in a single transaction.
+
+    The price check and the Bids insert happen under the listing's write
+    lock, so concurrent bidders can never both win against the same price.
+    Lock conflicts are retried; a bid that is too low raises BidRejected.
+    """
+    place = (
+        _place_bid_locked
+        if connection.features.has_select_for_update
+        else _place_bid_conditional
+    )
+    for attempt in range(1, BID_MAX_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                bid = place(listing_id, user, bid_value)
+            break
+        except OperationalError:
+            if attempt == BID_MAX_ATTEMPTS:
+                raise
+            time.sleep(BID_RETRY_DELAY * attempt)
+    if bid is None:
+        raise _rejection_reason(listing_id, user)
+    return bid
+
+
+def deactivate_listings(queryset, **changes):
+    """Update the still-active listings of ``queryset`` out of ACTIVE.
+
+    The listings are locked and read first, so the active listing counts of
+    their categories drop by exactly the listings that were updated. Returns
+    the primary keys of the listings updated.
+    """
+    with transaction.atomic():
+        active = queryset.filter(status=AuctionsListing.Status.ACTIVE)
+        rows = list(active.select_for_update().values_list("pk", "category"))
+        if not rows:
+            return []
+        updated = [pk for pk, _ in rows]
+        AuctionsListing.objects.filter(pk__in=updated).update(**changes)
+        counts = Counter(category for _, category in rows)
+        AuctionCategories.count_listings(
+            {category: -count for category, count in counts.items()}
+        )
+    return updated
+
+
+def close_auctions(queryset, now=None):
+    """Close the still-active listings of ``queryset`` with one UPDATE.
+
+    The winner is the denormalized current leader, so no bids are read.
+    Listings with only the owner's starting bid close unsold as INACTIVE.
+    Bumping modified_at also retires their cached cards. Returns the primary
+    keys of the listings closed; already closed listings are left untouched.
+    """
+    now = now or timezone.now()
+    has_bids = Q(bid_count__gt=1)
+    return deactivate_listings(
+        queryset,
+        status=Case(
+            When(has_bids, then=Value(AuctionsListing.Status.SOLD)),
+            default=Value(AuctionsListing.Status.INACTIVE),
+        ),
+        winner=Case(When(has_bids, then=F("current_leader")), default=None),
+        modified_at=now,
+    )
+
+
+def close_expired_auctions(now=None, batch_size=None):
+    """Close every listing whose ends_at has passed, one UPDATE per batch.
+
+    Batches keep each write lock short. The UPDATE re-checks the status, so
+    overlapping or repeated runs close every listing exactly once, and only
+    the run that closed a listing publishes its "closed" event. Returns the
+    number of listings closed.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.AUCTION_EXPIRY_BATCH_SIZE
+    expired = AuctionsListing.objects.filter(
+        status=AuctionsListing.Status.ACTIVE, ends_at__lte=now
+    ).order_by("ends_at")
+    closed = 0
+    while True:
+        ids = list(expired.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return closed
+        ids = close_auctions(AuctionsListing.objects.filter(pk__in=ids), now)
+        if ids:
+            events.publish_listings(ids, "closed")
+        closed += len(ids)
@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    activity,
+    bid_history,
+    card_cache,
+    events,
+    metrics,
+    search,
+    watchlist_cache,
+)
+from .models import AuctionCategories, AuctionsListing, Bids, User, Watchlist
+
+
+@receiver(post_save, sender=AuctionsListing)
+@receiver(post_delete, sender=AuctionsListing)
+def invalidate_listing_card(sender, instance, **kwargs):
+    card_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=AuctionsListing)
+def index_listing_text(sender, instance, created, update_fields, **kwargs):
+    indexed = {"title", "description", "category"}
+    if created or update_fields is None or indexed & set(update_fields):
+        search.index_listing(instance)
+
+
+@receiver(post_delete, sender=AuctionsListing)
+def remove_listing_text(sender, instance, **kwargs):
+    search.remove_listing(instance)
+
+
+@receiver(pre_save, sender=AuctionsListing)
+def remember_counted_category(sender, instance, raw, **kwargs):
+    # The category whose active count includes the row as stored, if any.
+    instance._counted_category = (
+        None
+        if instance._state.adding
+        else AuctionsListing.objects.filter(
+            pk=instance.pk, status=AuctionsListing.Status.ACTIVE
+        )
+        .values_list("category", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=AuctionsListing)
+def count_active_listing(sender, instance, **kwargs):
+    before = instance.__dict__.pop("_counted_category", None)
+    after = (
+        instance.category_id
+        if instance.status == AuctionsListing.Status.ACTIVE
+        else None
+    )
+    if before != after:
+        AuctionCategories.count_listings({before: -1, after: 1})
+
+
+@receiver(post_delete, sender=AuctionsListing)
+def uncount_active_listing(sender, instance, **kwargs):
+    if instance.status == AuctionsListing.Status.ACTIVE:
+        AuctionCategories.count_listings({instance.category_id: -1})
+
+
+@receiver(post_save, sender=Bids)
+def invalidate_bid_listing_card(sender, instance, created, **kwargs):
+    if created:
+        card_cache.invalidate(instance.listing_id)
+
+
+@receiver(post_save, sender=Bids)
+def publish_bid(sender, instance, created, **kwargs):
+    # The listing's bid columns are updated in the same transaction, so the
+    # snapshot is read once it commits.
+    if created:
+        listing_id = instance.listing_id
+        transaction.on_commit(lambda: events.publish_listings([listing_id], "bid"))
+
+
+@receiver(post_save, sender=Bids)
+def roll_up_bid(sender, instance, created, **kwargs):
+    if created:
+        bid_history.record(instance.listing_id, instance.value, instance.created_at)
+
+
+@receiver(post_save, sender=Watchlist)
+def drop_cached_watchlist_on_watch(sender, instance, created, **kwargs):
+    if created and instance.user_id:
+        watchlist_cache.invalidate_on_commit(instance.user_id)
+
+
+@receiver(post_delete, sender=Watchlist)
+def drop_cached_watchlist_on_unwatch(sender, instance, **kwargs):
+    if instance.user_id:
+        watchlist_cache.invalidate_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=Watchlist)
+def count_watch(sender, instance, created, **kwargs):
+    if created:
+        activity.record_watch(instance.auctionlisting_id)
+
+
+@receiver(post_delete, sender=Watchlist)
+def count_unwatch(sender, instance, **kwargs):
+    activity.record_watch(instance.auctionlisting_id, -1)
+
+
+@receiver(post_delete, sender=User)
+def drop_cached_watchlist(sender, instance, **kwargs):
+    # Watchlist.user is SET_NULL, which updates the rows without signals.
+    watchlist_cache.invalidate(instance.pk)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.record_query)
+
+
+@receiver(post_migrate)
+def set_sqlite_journal_mode(sender, using, **kwargs):
+    connection = connections[using]
+    if (
+        sender.name == "auctions"
+        and settings.SQLITE_JOURNAL_MODE
+        and connection.vendor == "sqlite"
+    ):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
@@ -0,0 +1,163 @@
+"""Collected static files with hashed names, precompressed and cached forever.
+
+With ``STATIC_MANIFEST`` on, collectstatic stores every file under a name
+carrying a hash of its content (``styles.css`` becomes ``styles.<hash>.css``)
+and ``{% static %}`` renders those names, so a changed file gets a new URL.
+It also writes a gzip variant of each compressible file, and a brotli one
+when the ``brotli`` package is installed. ``StaticFilesMiddleware`` serves
+them from ``STATIC_ROOT``, picking the smallest encoding the client accepts,
+with an ETag per encoding; under ASGI the file is read in a worker thread.
+Hashed names are marked immutable so browsers never revalidate them; the
+original names stay fetchable with a short max-age.
+"""
+
+import gzip
+import mimetypes
+import os
+import posixpath
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    staticfiles_storage,
+)
+from django.core.files.base import ContentFile
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE = frozenset(
+    [".css", ".js", ".mjs", ".map", ".json", ".svg", ".ico", ".txt", ".xml", ".html"]
+)
+
+# Smaller files gain less than the Content-Encoding header costs.
+MIN_COMPRESS_SIZE = 256
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def _compressors():
+    yield ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield ".br", lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes .gz and .br variants of each file."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if posixpath.splitext(name)[1].lower() in COMPRESSIBLE:
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            # A variant that saves nothing is not worth a lookup.
+            if len(compressed) < len(data):
+                self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+
+
+def _etag(path, encoding):
+    stat = os.stat(path)
+    return quote_etag(f"{stat.st_size:x}-{int(stat.st_mtime):x}-{encoding}")
+
+
+def _read(path):
+    with open(path, "rb") as source:
+        return source.read()
+
+
+class StaticFiles:
+    """An index of the files under STATIC_ROOT, built once at startup."""
+
+    def __init__(self, root, prefix):
+        hashed = set()
+        if isinstance(staticfiles_storage, ManifestStaticFilesStorage):
+            hashed = set(staticfiles_storage.hashed_files.values())
+        self.files = {}
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                if name.endswith((".gz", ".br")):
+                    continue
+                self.files[prefix + name] = {
+                    "path": path,
+                    "etag": _etag(path, "identity"),
+                    # Each variant has its own ETag: a cached gzip body must
+                    # not be revalidated as the identity one, or vice versa.
+                    "encodings": [
+                        (encoding, path + suffix, _etag(path + suffix, encoding))
+                        for encoding, suffix in ENCODINGS
+                        if os.path.exists(path + suffix)
+                    ],
+                    "content_type": mimetypes.guess_type(name)[0]
+                    or "application/octet-stream",
+                    "cache_control": IMMUTABLE
+                    if name in hashed
+                    else f"public, max-age={settings.STATIC_MAX_AGE}",
+                }
+
+    def serve(self, request):
+        """Return the response for a static file URL, or None for other URLs."""
+        found = self.find(request)
+        if found is None:
+            return None
+        response, path = found
+        if path is not None:
+            response.content = _read(path)
+        return response
+
+    async def aserve(self, request):
+        """Like ``serve``, but read the file in a thread off the event loop."""
+        found = self.find(request)
+        if found is None:
+            return None
+        response, path = found
+        if path is not None:
+            response.content = await sync_to_async(_read, thread_sensitive=False)(path)
+        return response
+
+    def find(self, request):
+        """Return the response for a static file URL and the path of its body.
+
+        The response has no content yet; the path is None for a 304.
+        """
+        entry = self.files.get(request.path)
+        if entry is None or request.method not in ("GET", "HEAD"):
+            return None
+        path, etag = entry["path"], entry["etag"]
+        headers = {"Cache-Control": entry["cache_control"]}
+        if entry["encodings"]:
+            headers["Vary"] = "Accept-Encoding"
+            accepted = {
+                part.split(";")[0].strip()
+                for part in request.headers.get("Accept-Encoding", "").split(",")
+            }
+            for encoding, variant, variant_etag in entry["encodings"]:
+                if encoding in accepted:
+                    path, etag = variant, variant_etag
+                    headers["Content-Encoding"] = encoding
+                    break
+        headers["ETag"] = etag
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return HttpResponseNotModified(headers=headers), None
+        return HttpResponse(content_type=entry["content_type"], headers=headers), path
@@ -0,0 +1,32 @@
+from django import template
+
+from auctions import card_cache
+
+
+register = template.Library()
+
+
+class CachedCardNode(template.Node):
+    def __init__(self, nodelist, listing):
+        self.nodelist = nodelist
+        self.listing = listing
+
+    def render(self, context):
+        listing = self.listing.resolve(context)
+        return card_cache.get_or_render(listing, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def cachedcard(parser, token):
+    """Cache the enclosed card markup per listing version.
+
+    Usage::
+
+        {% cachedcard auction %}...{% endcachedcard %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes one argument.")
+    nodelist = parser.parse(("endcachedcard",))
+    parser.delete_first_token()
+    return CachedCardNode(nodelist, parser.compile_filter(bits[1]))
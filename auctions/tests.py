@@ -1,3 +1,1794 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+from wsgiref.util import setup_testing_defaults
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    activity,
+    bid_history,
+    card_cache,
+    events,
+    metrics,
+    ratelimit,
+    seeding,
+    services,
+    watchlist_cache,
+)
+from .middleware import RequestMetricsMiddleware
+from .models import (
+    AuctionCategories,
+    AuctionsListing,
+    BidRollup,
+    Bids,
+    Comments,
+    User,
+    Watchlist,
+)
+from .search import search_listings
+from .services import BidRejected, close_auctions, close_expired_auctions, place_bid
+
+
+def create_listing(owner, starting_bid=Decimal("10.00"), **kwargs):
+    listing = AuctionsListing.objects.create(
+        created_by=owner,
+        title=kwargs.pop("title", "Lamp"),
+        description=kwargs.pop("description", "A lamp"),
+        url="https://example.com/lamp.png",
+        **kwargs,
+    )
+    listing.record_bid(starting_bid, owner)
+    return listing
+
+
+@skipUnless(settings.DATABASE_PROFILE == "sqlite", "Tuned SQLite profile only.")
+class DatabaseProfileTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_connections_use_wal_and_tuned_pragmas(self):
+        # Switched on once by migrate; connections leave the file header alone.
+        self.assertEqual(self.pragma("journal_mode"), "wal")
+        init_command = connection.settings_dict["OPTIONS"]["init_command"]
+        self.assertNotIn("journal_mode", init_command)
+        self.assertEqual(self.pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(
+            self.pragma("busy_timeout"), settings.SQLITE_PRAGMAS["busy_timeout"]
+        )
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+
+class BidStatsTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.bidder = User.objects.create_user("bidder", password="pw")
+        self.listing = create_listing(self.owner)
+
+    def test_record_bid_updates_denormalized_columns(self):
+        self.listing.record_bid(Decimal("12.50"), self.bidder)
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_bid, Decimal("12.50"))
+        self.assertEqual(self.listing.bid_count, 2)
+        self.assertEqual(self.listing.current_leader, self.bidder)
+
+    def test_new_bid_view_maintains_columns(self):
+        self.client.force_login(self.bidder)
+        self.client.post(
+            reverse("new_bid", args=[self.listing.id]), {"new_bid": "11.00"}
+        )
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_bid, Decimal("11.00"))
+        self.assertEqual(self.listing.bid_count, 2)
+
+    def test_backfill_command_recomputes_from_bids(self):
+        Bids.objects.create(
+            value=Decimal("20.00"), listing=self.listing, created_by=self.bidder
+        )
+        AuctionsListing.objects.update(
+            current_bid=None, bid_count=0, current_leader=None
+        )
+
+        call_command("backfill_bid_stats", stdout=StringIO())
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_bid, Decimal("20.00"))
+        self.assertEqual(self.listing.bid_count, 2)
+        self.assertEqual(self.listing.current_leader, self.bidder)
+
+    def test_index_does_not_query_bids_per_card(self):
+        for i in range(5):
+            create_listing(self.owner, title=f"Lamp {i}")
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("index"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Price: R$ 10.00", count=6)
+
+
+class PlaceBidTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.bidder = User.objects.create_user("bidder", password="pw")
+        self.listing = create_listing(self.owner)
+
+    def test_starting_bid_can_be_matched_once(self):
+        place_bid(self.listing.id, self.bidder, Decimal("10.00"))
+
+        with self.assertRaises(BidRejected):
+            place_bid(self.listing.id, self.bidder, Decimal("10.00"))
+
+    def test_rejects_owner_and_closed_auctions(self):
+        with self.assertRaisesMessage(BidRejected, "your own auction"):
+            place_bid(self.listing.id, self.owner, Decimal("50.00"))
+
+        AuctionsListing.objects.filter(pk=self.listing.pk).update(
+            status=AuctionsListing.Status.SOLD
+        )
+        with self.assertRaisesMessage(BidRejected, "no longer accepting"):
+            place_bid(self.listing.id, self.bidder, Decimal("50.00"))
+
+    def test_low_bid_renders_error(self):
+        self.client.force_login(self.bidder)
+        response = self.client.post(
+            reverse("new_bid", args=[self.listing.id]), {"new_bid": "5.00"}
+        )
+
+        self.assertContains(response, "Your bid must be higher than the current bid.")
+        self.assertEqual(Bids.objects.filter(listing=self.listing).count(), 1)
+
+
+class PlaceBidStressTests(TransactionTestCase):
+    threads = 8
+    bids_per_thread = 50
+
+    def test_concurrent_bids_are_never_lost_or_reordered(self):
+        owner = User.objects.create_user("owner", password="pw")
+        bidders = [
+            User.objects.create_user(f"bidder{i}", password="pw")
+            for i in range(self.threads)
+        ]
+        listing = create_listing(owner, starting_bid=Decimal("1.00"))
+        accepted = []
+        errors = []
+        start = threading.Barrier(self.threads)
+
+        def bid(user, offset):
+            try:
+                start.wait()
+                for n in range(self.bids_per_thread):
+                    value = Decimal(2 + n * self.threads + offset)
+                    try:
+                        accepted.append(place_bid(listing.id, user, value).value)
+                    except BidRejected:
+                        pass
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        workers = [
+            threading.Thread(target=bid, args=(user, offset))
+            for offset, user in enumerate(bidders)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        listing.refresh_from_db()
+        history = list(
+            Bids.objects.filter(listing=listing)
+            .exclude(created_by=owner)
+            .values_list("value", flat=True)
+        )
+        self.assertEqual(len(history), len(accepted))
+        self.assertEqual(history, sorted(history))
+        self.assertEqual(len(set(history)), len(history))
+        self.assertEqual(listing.bid_count, len(history) + 1)
+        self.assertEqual(listing.current_bid, history[-1])
+        self.assertEqual(
+            listing.current_leader_id,
+            Bids.objects.filter(listing=listing).latest().created_by_id,
+        )
+
+
+class BidHistoryTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.bidder = User.objects.create_user("bidder", password="pw")
+        self.listing = create_listing(self.owner)
+
+    def rollups(self):
+        return list(
+            BidRollup.objects.order_by("resolution", "bucket").values_list(
+                "listing", "resolution", "bucket", *bid_history.BUCKET_FIELDS[1:]
+            )
+        )
+
+    def test_bids_fold_into_buckets(self):
+        start = timezone.now().replace(year=2030, month=1, day=1, hour=10, minute=0)
+        for minutes, value in [(0, "9.50"), (1, "100.00"), (61, "50.00")]:
+            bid_history.record(
+                self.listing.id, Decimal(value), start + timedelta(minutes=minutes)
+            )
+
+        # The starting bid was placed today, before these.
+        def buckets(resolution, limit):
+            return list(
+                bid_history.buckets(self.listing.id, resolution, limit).values_list(
+                    "open", "high", "low", "close", "count"
+                )
+            )
+
+        low, high, last = Decimal("9.50"), Decimal("100.00"), Decimal("50.00")
+        self.assertEqual(buckets("d", 1), [(low, high, low, last, 3)])
+        self.assertEqual(
+            buckets("h", 2), [(last, last, last, last, 1), (low, high, low, high, 2)]
+        )
+        self.assertEqual(len(buckets("m", 10)), 4)
+
+    def test_bids_fold_into_buckets_another_writer_started(self):
+        moment = timezone.now().replace(year=2030, month=1, day=1, hour=10)
+        # Another writer has started the day bucket but not the others.
+        BidRollup.objects.create(
+            listing=self.listing,
+            resolution=BidRollup.Resolution.DAY,
+            bucket=bid_history.bucket_start(moment, BidRollup.Resolution.DAY),
+            open=Decimal("20.00"),
+            high=Decimal("20.00"),
+            low=Decimal("20.00"),
+            close=Decimal("20.00"),
+            count=1,
+        )
+        bid_history.record(self.listing.id, Decimal("30.00"), moment)
+
+        twenty, thirty = Decimal("20.00"), Decimal("30.00")
+        rollups = BidRollup.objects.filter(bucket__year=2030).order_by("resolution")
+        self.assertEqual(
+            list(rollups.values_list("resolution", "open", "high", "close", "count")),
+            [
+                ("d", twenty, thirty, thirty, 2),
+                ("h", thirty, thirty, thirty, 1),
+                ("m", thirty, thirty, thirty, 1),
+            ],
+        )
+
+    def test_incremental_rollups_match_a_rebuild(self):
+        for value in ["11.00", "12.00", "15.00"]:
+            place_bid(self.listing.id, self.bidder, Decimal(value))
+        incremental = self.rollups()
+
+        call_command("rebuild_bid_history", stdout=StringIO())
+
+        self.assertEqual(self.rollups(), incremental)
+        days = BidRollup.objects.filter(resolution="d")
+        self.assertEqual(sum(days.values_list("count", flat=True)), 4)
+
+    def test_endpoint_serves_buckets_in_one_query(self):
+        place_bid(self.listing.id, self.bidder, Decimal("11.00"))
+        url = reverse("listing_bid_history", args=[self.listing.id])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"resolution": "day", "limit": 5})
+
+        [bucket] = response.json()["buckets"]
+        self.assertEqual(
+            (bucket["open"], bucket["close"], bucket["count"]), ("10.00", "11.00", 2)
+        )
+        self.assertEqual(self.client.get(url, {"resolution": "week"}).status_code, 400)
+        for listing_id in [uuid.uuid4(), "not-a-uuid"]:
+            response = self.client.get(
+                reverse("listing_bid_history", args=[listing_id])
+            )
+            self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    RATE_LIMITS={
+        "new_bid": {"user": "2/m", "ip": "3/m"},
+        "insert_comments": {"ip": "1/h"},
+    },
+    RATE_LIMIT_STORE="auctions.ratelimit.InProcessStore",
+)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        ratelimit.get_store().clear()
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.listing = create_listing(self.owner)
+        self.url = reverse("new_bid", args=[self.listing.id])
+
+    def bid(self, username, value):
+        self.client.force_login(User.objects.get_or_create(username=username)[0])
+        return self.client.post(self.url, {"new_bid": value})
+
+    def test_limits_each_user_and_each_ip(self):
+        self.assertEqual(self.bid("ann", "11.00").status_code, 302)
+        self.assertEqual(self.bid("ann", "12.00").status_code, 302)
+        response = self.bid("ann", "13.00")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        # A second user gets their own bucket, but shares the address.
+        self.assertEqual(self.bid("bob", "13.00").status_code, 302)
+        self.assertEqual(self.bid("bob", "14.00").status_code, 429)
+        self.assertEqual(Bids.objects.filter(listing=self.listing).count(), 4)
+
+        comment = reverse("insert_comments", args=[self.listing.id])
+        self.assertEqual(self.client.post(comment, {"comment": "Hi"}).status_code, 302)
+        self.assertEqual(self.client.post(comment, {"comment": "Hi"}).status_code, 429)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_buckets_refill_at_their_rate(self):
+        capacity, refill = ratelimit.parse_rate("2/m")
+        store = ratelimit.InProcessStore()
+        takes = [store.take("key", capacity, refill, now) for now in [0, 1, 2, 32, 33]]
+        self.assertEqual([round(wait, 6) for wait in takes], [0, 0, 28, 0, 27])
+
+    def test_store_evicts_least_recently_used_buckets_past_its_cap(self):
+        store = ratelimit.InProcessStore()
+        store.max_buckets = 3
+        capacity, refill = ratelimit.parse_rate("1/h")
+        for key in ["a", "b", "c"]:
+            store.take(key, capacity, refill, 0)
+        # Touching "a" makes "b" the least recently used bucket.
+        self.assertTrue(store.take("a", capacity, refill, 1))
+        store.take("d", capacity, refill, 2)
+        self.assertEqual(list(store.buckets), ["c", "a", "d"])
+
+        # However many fresh keys arrive, the cap holds.
+        for n in range(1000):
+            store.take(f"10.0.{n // 256}.{n % 256}", capacity, refill, 3)
+        self.assertEqual(len(store.buckets), 3)
+        # An evicted bucket starts over full.
+        self.assertEqual(store.take("a", capacity, refill, 4), 0)
+
+
+class CommentTreeTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.listing = create_listing(self.owner)
+
+    def comment(self, text, parent=None):
+        return Comments.objects.create(
+            user_comment=text, listing=self.listing, parent_comment=parent
+        )
+
+    def test_tree_is_loaded_in_one_query(self):
+        root = self.comment("root")
+        reply = self.comment("reply", root)
+        self.comment("nested", reply)
+        self.comment("other root")
+
+        with self.assertNumQueries(1):
+            tree = Comments.get_comment_tree(self.listing.id)
+            roots = tree["comments"]
+            nested = roots[1].replies[0].replies[0].user_comment
+
+        self.assertEqual([c.user_comment for c in roots], ["other root", "root"])
+        self.assertEqual(nested, "nested")
+        self.assertEqual(tree["total"], 2)
+
+    def test_depth_limit_flags_cut_off_replies(self):
+        parent = self.comment("level 0")
+        for depth in range(1, 4):
+            parent = self.comment(f"level {depth}", parent)
+
+        roots = Comments.get_comment_tree(self.listing.id, max_depth=2)["comments"]
+
+        self.assertEqual(roots[0].replies[0].replies, [])
+        self.assertTrue(roots[0].replies[0].has_more_replies)
+
+        thread = Comments.get_comment_tree(self.listing.id, root=parent.parent_comment_id)
+        self.assertEqual(thread["comments"][0].replies[0].user_comment, "level 3")
+
+    def test_top_level_comments_are_paginated(self):
+        for i in range(5):
+            self.comment(f"comment {i}")
+
+        first = Comments.get_comment_tree(self.listing.id, per_page=2)
+        last = Comments.get_comment_tree(self.listing.id, page=3, per_page=2)
+
+        self.assertEqual(len(first["comments"]), 2)
+        self.assertTrue(first["has_next"])
+        self.assertEqual([c.user_comment for c in last["comments"]], ["comment 0"])
+        self.assertFalse(last["has_next"])
+        self.assertTrue(last["has_previous"])
+
+    def test_pages_of_comments_sharing_a_timestamp_neither_repeat_nor_skip(self):
+        comments = [self.comment(f"comment {i}") for i in range(7)]
+        Comments.objects.update(created_at=timezone.now())
+
+        paged = [
+            comment.id
+            for page in range(1, 5)
+            for comment in Comments.get_comment_tree(
+                self.listing.id, page=page, per_page=2
+            )["comments"]
+        ]
+        self.assertEqual(paged, sorted((c.id for c in comments), reverse=True))
+
+    def test_listing_page_query_count_is_independent_of_thread_size(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse("listings", args=[self.listing.id]))
+            return len(ctx.captured_queries)
+
+        root = self.comment("root")
+        baseline = count_queries()
+        for i in range(10):
+            self.comment(f"reply {i}", self.comment(f"child {i}", root))
+
+        self.assertEqual(count_queries(), baseline)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.listings = [create_listing(self.owner, title=f"Lamp {i}") for i in range(5)]
+        # Share a timestamp between two listings so ties break on id.
+        AuctionsListing.objects.filter(pk=self.listings[2].pk).update(
+            created_at=self.listings[1].created_at
+        )
+        self.expected = list(
+            AuctionsListing.objects.order_by("created_at", "id").values_list(
+                "id", flat=True
+            )
+        )
+
+    def page(self, **params):
+        response = self.client.get(reverse("index"), {"page_size": 2, **params})
+        return response.context
+
+    def test_walks_forward_and_back_without_gaps(self):
+        seen, context = [], self.page()
+        while True:
+            seen += [auction.id for auction in context["auctions"]]
+            if not context["next_cursor"]:
+                break
+            context = self.page(after=context["next_cursor"])
+
+        self.assertEqual(seen, self.expected)
+        self.assertIsNotNone(context["previous_cursor"])
+
+        previous = self.page(before=context["previous_cursor"])
+        self.assertEqual(
+            [auction.id for auction in previous["auctions"]], self.expected[2:4]
+        )
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        context = self.page(after="not-a-cursor")
+
+        self.assertEqual(
+            [auction.id for auction in context["auctions"]], self.expected[:2]
+        )
+        self.assertIsNone(context["previous_cursor"])
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite syntax")
+class QueryPlanTests(TestCase):
+    """Fail when a hot query on an auctions table falls back to a full scan."""
+
+    full_scan = re.compile(r"^SCAN (\w+)")
+    table_alias = re.compile(r'\b(auctions_\w+)"?\s+(?:AS\s+)?"?(\w+)')
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.bidder = User.objects.create_user("bidder", password="pw")
+        self.category = AuctionCategories.objects.create(category="Lamps")
+        self.listing = create_listing(self.owner, category=self.category)
+        for i in range(3):
+            create_listing(self.owner, title=f"Lamp {i}")
+        self.listing.record_bid(Decimal("12.00"), self.bidder)
+        Watchlist.objects.create(user=self.bidder, auctionlisting=self.listing)
+        root = Comments.objects.create(user_comment="root", listing=self.listing)
+        Comments.objects.create(
+            user_comment="reply", listing=self.listing, parent_comment=root
+        )
+        self.client.force_login(self.bidder)
+
+    def assertNoFullScans(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            getattr(self.client, method)(url, data)
+
+        tables = {
+            model._meta.db_table
+            for model in apps.get_app_config("auctions").get_models()
+        }
+        scans = []
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                sql = query["sql"].strip()
+                if not sql.startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+                    continue
+                aliases = {
+                    alias
+                    for table, alias in self.table_alias.findall(sql)
+                    if table in tables
+                }
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                for row in cursor.fetchall():
+                    match = self.full_scan.match(row[-1])
+                    if match and match.group(1) in tables | aliases:
+                        scans.append(f"{row[-1]}: {sql}")
+        self.assertEqual(scans, [])
+
+    def test_index(self):
+        self.assertNoFullScans("get", reverse("index"))
+
+    def test_watchlist(self):
+        self.assertNoFullScans("get", reverse("watchlist"))
+
+    def test_category(self):
+        self.assertNoFullScans(
+            "get", reverse("filter_category", args=[self.category.pk])
+        )
+
+    def test_listing(self):
+        self.assertNoFullScans("get", reverse("listings", args=[self.listing.id]))
+
+    def test_new_bid(self):
+        self.assertNoFullScans(
+            "post", reverse("new_bid", args=[self.listing.id]), {"new_bid": "20.00"}
+        )
+
+    def test_toggle_watchlist(self):
+        self.assertNoFullScans(
+            "post", reverse("toggle_watchlist", args=[self.listing.id])
+        )
+
+    def test_close_auction(self):
+        self.client.force_login(self.owner)
+        self.assertNoFullScans("post", reverse("close_auction", args=[self.listing.id]))
+
+
+class ExpiryTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.bidder = User.objects.create_user("bidder", password="pw")
+        self.past = timezone.now() - timedelta(minutes=1)
+        self.sold = create_listing(self.owner, ends_at=self.past)
+        self.sold.record_bid(Decimal("12.00"), self.bidder)
+        self.unsold = create_listing(self.owner, ends_at=self.past)
+        self.running = create_listing(
+            self.owner, ends_at=timezone.now() + timedelta(days=1)
+        )
+        self.open_ended = create_listing(self.owner)
+
+    def statuses(self):
+        return {
+            listing.id: (listing.status, listing.winner_id)
+            for listing in AuctionsListing.objects.all()
+        }
+
+    def test_expired_listings_close_with_their_leader_as_winner(self):
+        self.assertEqual(close_expired_auctions(batch_size=1), 2)
+
+        self.assertEqual(
+            self.statuses(),
+            {
+                self.sold.id: (AuctionsListing.Status.SOLD, self.bidder.id),
+                self.unsold.id: (AuctionsListing.Status.INACTIVE, None),
+                self.running.id: (AuctionsListing.Status.ACTIVE, None),
+                self.open_ended.id: (AuctionsListing.Status.ACTIVE, None),
+            },
+        )
+
+    def test_rerunning_the_command_is_a_no_op(self):
+        call_command("expire_auctions", stdout=StringIO())
+        closed = self.statuses()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(close_expired_auctions(), 0)
+        self.assertEqual(self.statuses(), closed)
+
+    def test_only_the_run_that_closes_a_listing_publishes_it(self):
+        close = services.close_auctions
+
+        def close_after_another_run(queryset, now):
+            # An overlapping run closes the sold listing first.
+            close(AuctionsListing.objects.filter(pk=self.sold.pk), now)
+            return close(queryset, now)
+
+        with (
+            mock.patch.object(services, "close_auctions", close_after_another_run),
+            mock.patch.object(events, "publish_listings") as publish,
+        ):
+            self.assertEqual(close_expired_auctions(), 1)
+        publish.assert_called_once_with([self.unsold.pk], "closed")
+
+    def test_closing_bumps_the_card_version(self):
+        version = card_cache.card_version(self.sold)
+
+        close_expired_auctions()
+
+        self.sold.refresh_from_db()
+        self.assertNotEqual(card_cache.card_version(self.sold), version)
+
+    def test_ended_listing_rejects_bids_before_it_is_closed(self):
+        with self.assertRaisesMessage(BidRejected, "no longer accepting bids"):
+            place_bid(self.sold.id, self.bidder, Decimal("50.00"))
+
+    def test_close_auction_view_uses_the_current_leader(self):
+        self.running.record_bid(Decimal("15.00"), self.bidder)
+        self.client.force_login(self.owner)
+
+        self.client.post(reverse("close_auction", args=[self.running.id]))
+
+        self.running.refresh_from_db()
+        self.assertEqual(self.running.status, AuctionsListing.Status.SOLD)
+        self.assertEqual(self.running.winner, self.bidder)
+
+
+class CategoryCountTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.lamps = AuctionCategories.objects.create(category="Lamps")
+        self.rugs = AuctionCategories.objects.create(category="Rugs")
+        self.listings = [
+            create_listing(self.owner, category=self.lamps, title=f"Lamp {n}")
+            for n in range(4)
+        ]
+        create_listing(self.owner, category=self.rugs, title="Rug")
+        create_listing(self.owner, title="Uncategorized")
+
+    def counts(self):
+        counts = AuctionCategories.objects.values_list("category", "active_listings")
+        return dict(counts)
+
+    def test_counts_follow_closes_cancels_and_edits(self):
+        self.assertEqual(self.counts(), {"Lamps": 4, "Rugs": 1})
+        self.client.force_login(self.owner)
+
+        self.client.post(reverse("close_auction", args=[self.listings[0].id]))
+        self.client.post(reverse("close_auction", args=[self.listings[0].id]))
+        self.client.post(reverse("cancel_auction", args=[self.listings[1].id]))
+        moved = self.listings[2]
+        moved.category = self.rugs
+        moved.save()
+        AuctionsListing.objects.filter(pk=self.listings[3].pk).update(
+            ends_at=timezone.now() - timedelta(minutes=1)
+        )
+        close_expired_auctions()
+        self.assertEqual(self.counts(), {"Lamps": 0, "Rugs": 2})
+
+        self.listings[3].refresh_from_db()
+        self.listings[3].delete()
+        moved.delete()
+        self.assertEqual(self.counts(), {"Lamps": 0, "Rugs": 1})
+        AuctionCategories.backfill_listing_counts()
+        self.assertEqual(self.counts(), {"Lamps": 0, "Rugs": 1})
+
+    def test_categories_page_reads_counts_and_filters_by_key(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("categories"))
+        self.assertContains(
+            response, f'href="{reverse("filter_category", args=[self.lamps.pk])}"'
+        )
+        self.assertContains(response, '<span class="badge badge-secondary">4</span>')
+
+        response = self.client.get(reverse("filter_category", args=[self.rugs.pk]))
+        self.assertEqual(response.context["title"], "Rugs")
+        self.assertEqual(
+            [auction.title for auction in response.context["auctions"]], ["Rug"]
+        )
+        response = self.client.get(reverse("filter_category", args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, 404)
+
+
+class ListingEventsTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.bidder = User.objects.create_user("bidder", password="pw")
+        self.listing = create_listing(self.owner)
+        self.channel = events.channel_name(self.listing.id)
+
+    def bid(self, value):
+        with self.captureOnCommitCallbacks(execute=True):
+            place_bid(self.listing.id, self.bidder, Decimal(value))
+
+    async def test_broker_delivers_messages_published_from_other_threads(self):
+        broker = events.InProcessBroker()
+        async with broker.subscribe(self.channel) as subscription:
+            thread = threading.Thread(target=broker.publish, args=(self.channel, "hi"))
+            thread.start()
+            thread.join()
+
+            self.assertEqual(await subscription.get(timeout=1), "hi")
+        self.assertEqual(broker.subscriber_count(self.channel), 0)
+
+    async def test_stream_sends_a_snapshot_then_each_new_bid(self):
+        response = await self.async_client.get(
+            reverse("listing_events", args=[self.listing.id])
+        )
+        stream = aiter(response.streaming_content)
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertIn(b'"bid_count":1', await anext(stream))
+        await sync_to_async(self.bid)("12.00")
+        message = await anext(stream)
+        self.assertTrue(message.startswith(b"event: bid\n"))
+        self.assertIn(b'"current_bid":"12.00","bid_count":2', message)
+
+        # A client disconnect cancels the task waiting on the stream.
+        waiting = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertEqual(events.get_broker().subscriber_count(self.channel), 0)
+
+    async def test_router_serves_streams_and_delegates_other_requests(self):
+        delegated, sent = [], []
+        first_frame = asyncio.Event()
+
+        async def django_application(scope, receive, send):
+            delegated.append(scope["path"])
+
+        async def receive():
+            await first_frame.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "http.response.body":
+                first_frame.set()
+
+        router = events.ListingEventsRouter(django_application)
+        for path in [reverse("listing_events", args=[self.listing.id]), reverse("index")]:
+            await router(
+                {"type": "http", "method": "GET", "path": path}, receive, send
+            )
+
+        self.assertEqual(delegated, [reverse("index")])
+        self.assertEqual(sent[0]["status"], 200)
+        self.assertIn(b'"bid_count":1', sent[1]["body"])
+        self.assertEqual(events.get_broker().subscriber_count(self.channel), 0)
+
+    async def test_unknown_listing_is_not_found(self):
+        for listing_id in ["not-a-uuid", uuid.uuid4()]:
+            response = await self.async_client.get(
+                reverse("listing_events", args=[listing_id])
+            )
+            self.assertEqual(response.status_code, 404)
+
+
+class ListingEventsWSGITests(TransactionTestCase):
+    def test_wsgi_request_gets_the_current_state_and_ends(self):
+        owner = User.objects.create_user("owner", password="pw")
+        listing = create_listing(owner)
+        environ = {
+            "PATH_INFO": reverse("listing_events", args=[listing.id]),
+            "HTTP_HOST": "testserver",
+        }
+        setup_testing_defaults(environ)
+        served = {}
+
+        def serve():
+            statuses = []
+            response = WSGIHandler()(environ, lambda *start: statuses.append(start))
+            try:
+                served["body"] = b"".join(response)
+            finally:
+                response.close()
+            served["status"] = statuses[0][0]
+
+        # Run in a thread, so a stream that never ends fails the test.
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(served["status"], "200 OK")
+        self.assertTrue(served["body"].startswith(b"retry: "))
+        self.assertIn(b'"bid_count":1', served["body"])
+        channel = events.channel_name(listing.id)
+        self.assertEqual(events.get_broker().subscriber_count(channel), 0)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.category = AuctionCategories.objects.create(category="Lamps")
+        self.listing = create_listing(self.owner, category=self.category)
+        Watchlist.objects.create(user=self.owner, auctionlisting=self.listing)
+        Comments.objects.create(user_comment="Still works?", listing=self.listing)
+
+    async def test_pages_render_under_the_async_client(self):
+        await self.async_client.aforce_login(self.owner)
+        for url in [
+            reverse("index"),
+            reverse("categories"),
+            reverse("filter_category", args=[self.category.pk]),
+        ]:
+            response = await self.async_client.get(url)
+            self.assertContains(response, "Signed in as <strong>owner</strong>")
+
+        response = await self.async_client.get(
+            reverse("listings", args=[self.listing.id])
+        )
+        self.assertContains(response, "Remove from watchlist")
+        self.assertContains(response, "Still works?")
+        self.assertEqual(response.context["user"], self.owner)
+
+
+class WatchlistCacheTests(TestCase):
+    def setUp(self):
+        watchlist_cache.get_cache().clear()
+        owner = User.objects.create_user("owner", password="pw")
+        self.watcher = User.objects.create_user("watcher", password="pw")
+        self.listings = [create_listing(owner, title=f"Lamp {n}") for n in range(3)]
+        Watchlist.objects.create(user=self.watcher, auctionlisting=self.listings[0])
+        self.client.force_login(self.watcher)
+
+    def watchlist_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        table = Watchlist._meta.db_table
+        return response, [q["sql"] for q in ctx.captured_queries if table in q["sql"]]
+
+    def test_membership_is_read_from_the_cache(self):
+        url = reverse("listings", args=[self.listings[0].id])
+        response, queries = self.watchlist_queries(url)
+        self.assertEqual(len(queries), 1)
+
+        response, queries = self.watchlist_queries(url)
+        self.assertEqual(queries, [])
+        self.assertContains(response, "Remove from watchlist")
+
+    def test_toggle_refreshes_the_cached_set_and_badge(self):
+        self.assertEqual(watchlist_cache.count(self.watcher), 1)
+        toggle = reverse("toggle_watchlist", args=[self.listings[1].id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(toggle)
+        response, queries = self.watchlist_queries(reverse("index"))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.context["watchlist_count"], 2)
+        self.assertContains(response, '<span class="badge badge-secondary">2</span>')
+        response, queries = self.watchlist_queries(reverse("index"))
+        self.assertEqual(queries, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(toggle)
+        self.assertEqual(
+            watchlist_cache.listing_ids(self.watcher), {self.listings[0].id}
+        )
+        response = self.client.get(reverse("watchlist"))
+        self.assertEqual(
+            [listing.id for listing in response.context["auctions"]],
+            [self.listings[0].id],
+        )
+
+    def test_rolled_back_changes_leave_the_cache_alone(self):
+        self.assertEqual(watchlist_cache.count(self.watcher), 1)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(IntegrityError):
+                with transaction.atomic():
+                    Watchlist.objects.create(
+                        user=self.watcher, auctionlisting=self.listings[1]
+                    )
+                    raise IntegrityError
+        self.assertEqual(callbacks, [])
+        key = watchlist_cache.watchlist_key(self.watcher.id)
+        self.assertEqual(
+            watchlist_cache.get_cache().get(key), {self.listings[0].id}
+        )
+
+    def test_deleting_a_listing_or_user_updates_the_cache(self):
+        watchlist_cache.listing_ids(self.watcher)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listings[0].delete()
+        self.assertEqual(watchlist_cache.count(self.watcher), 0)
+
+        Watchlist.objects.create(user=self.watcher, auctionlisting=self.listings[1])
+        self.watcher.delete()
+        key = watchlist_cache.watchlist_key(self.watcher.id)
+        self.assertIsNone(watchlist_cache.get_cache().get(key))
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset_stats()
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.listing = create_listing(self.owner)
+
+    def test_stats_endpoint_reports_queries_per_view(self):
+        counts = []
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse("index"))
+            counts.append(len(ctx.captured_queries))
+        staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(staff)
+
+        stats = self.client.get(reverse("request_stats")).json()["views"]
+
+        self.assertEqual(stats["index"]["requests"], 2)
+        self.assertEqual(stats["index"]["sql_count"]["max"], max(counts))
+        self.assertGreater(stats["index"]["template"]["max_ms"], 0)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(reverse("request_stats")).status_code, 403)
+
+    @override_settings(REQUEST_BUDGETS={"index": {"queries": 0}})
+    def test_over_budget_requests_log_a_warning(self):
+        with self.assertLogs("auctions.requests", "WARNING") as logs:
+            self.client.get(reverse("index"))
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line["view"], line["over_budget"]), ("index", ["queries"]))
+        self.assertEqual(metrics.stats()["index"]["over_budget"], 1)
+
+    @override_settings(
+        REQUEST_BUDGETS={"index": {"queries": 0}}, REQUEST_BUDGET_STRICT=True
+    )
+    def test_strict_budgets_fail_the_request(self):
+        with self.assertRaises(metrics.BudgetExceeded):
+            self.client.get(reverse("index"))
+
+    @override_settings(
+        REQUEST_BUDGETS={"<unresolved>": {"queries": 0}}, REQUEST_BUDGET_STRICT=True
+    )
+    def test_strict_budgets_keep_the_views_own_exception(self):
+        def view(request):
+            User.objects.count()
+            raise ValueError("view failed")
+
+        middleware = RequestMetricsMiddleware(view)
+        with (
+            self.assertLogs("auctions.requests", "WARNING"),
+            self.assertRaisesMessage(ValueError, "view failed"),
+        ):
+            middleware(RequestFactory().get("/"))
+
+
+class QueryBudgetTests(TestCase):
+    """Fail when a page needs more queries than REQUEST_BUDGETS allows.
+
+    Only the query budgets are enforced; timings depend on the machine.
+    """
+
+    def setUp(self):
+        watchlist_cache.get_cache().clear()
+        owner = User.objects.create_user("owner", password="pw")
+        self.bidder = User.objects.create_user("bidder", password="pw")
+        self.category = AuctionCategories.objects.create(category="Lamps")
+        self.listings = [
+            create_listing(owner, category=self.category) for _ in range(10)
+        ]
+        for listing in self.listings[:5]:
+            listing.record_bid(Decimal("20.00"), self.bidder)
+            Watchlist.objects.create(user=self.bidder, auctionlisting=listing)
+        root = Comments.objects.create(user_comment="root", listing=self.listings[0])
+        for _ in range(3):
+            root = Comments.objects.create(
+                user_comment="reply", listing=self.listings[0], parent_comment=root
+            )
+
+    def test_pages_stay_within_their_query_budgets(self):
+        budgets = {
+            view: {"queries": budget["queries"]}
+            for view, budget in settings.REQUEST_BUDGETS.items()
+        }
+        pages = [
+            ("get", reverse("index"), None),
+            ("get", reverse("categories"), None),
+            ("get", reverse("filter_category", args=[self.category.pk]), None),
+            ("get", reverse("watchlist"), None),
+            ("get", reverse("listings", args=[self.listings[0].id]), None),
+            ("get", reverse("search"), {"q": "lamp"}),
+            ("post", reverse("new_bid", args=[self.listings[1].id]), {"new_bid": "30"}),
+        ]
+        with override_settings(REQUEST_BUDGETS=budgets, REQUEST_BUDGET_STRICT=True):
+            for user in [None, self.bidder]:
+                if user:
+                    self.client.force_login(user)
+                for method, url, data in pages:
+                    with self.subTest(url=url, user=user):
+                        getattr(self.client, method)(url, data)
+
+
+class SeedingTests(TestCase):
+    def setUp(self):
+        self.created = seeding.seed(
+            random.Random(0),
+            users=20,
+            categories=3,
+            listings=50,
+            bids=500,
+            comments=300,
+            watches=100,
+        )
+
+    def test_bid_columns_match_the_bids_table(self):
+        columns = ["id", "current_bid", "bid_count", "current_leader"]
+        seeded = list(AuctionsListing.objects.order_by("id").values_list(*columns))
+
+        AuctionsListing.backfill_bid_stats()
+
+        self.assertEqual(
+            list(AuctionsListing.objects.order_by("id").values_list(*columns)), seeded
+        )
+        self.assertEqual(Bids.objects.count(), self.created["bids"])
+        self.assertFalse(
+            AuctionsListing.objects.filter(status="S", winner__isnull=True).exists()
+        )
+
+    def test_activity_is_skewed_and_threads_are_deep(self):
+        counts = sorted(
+            AuctionsListing.objects.values_list("bid_count", flat=True), reverse=True
+        )
+        self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+
+        hot = (
+            Comments.objects.values("listing").annotate(n=Count("id")).order_by("-n")[0]
+        )
+        tree = Comments.get_comment_tree(hot["listing"], max_depth=3)
+        self.assertTrue(any(comment.replies for comment in tree["comments"]))
+
+    def test_listings_are_searchable(self):
+        self.assertTrue(search_listings("condition"))
+
+
+class AddListingTests(TestCase):
+    def test_listing_text_is_stored_inline(self):
+        owner = User.objects.create_user("owner", password="pw")
+        self.client.force_login(owner)
+
+        self.client.post(
+            reverse("add"),
+            {
+                "title": "Lamp",
+                "description": "A lamp",
+                "starting_bid": "10.00",
+                "image_url": "https://example.com/lamp.png",
+            },
+        )
+
+        listing = AuctionsListing.objects.get()
+        self.assertEqual(listing.title, "Lamp")
+        self.assertEqual(listing.url, "https://example.com/lamp.png")
+        self.assertEqual(listing.current_bid, Decimal("10.00"))
+
+
+class InlineListingTextMigrationTests(TransactionTestCase):
+    before = [("auctions", "0005_composite_indexes")]
+    after = [("auctions", "0006_inline_listing_text")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_text_survives_migrating_forwards_and_back(self):
+        old = self.migrate(self.before)
+        owner = old.get_model("auctions", "User").objects.create(username="owner")
+        texts = [
+            ("Lamp", "Brass", "https://example.com/lamp.png"),
+            ("Lamp", "Steel", ""),
+        ]
+        for title, description, url in texts:
+            old.get_model("auctions", "AuctionsListing").objects.create(
+                created_by=owner,
+                **{
+                    field: old.get_model("auctions", model).objects.get_or_create(
+                        **{field: value}
+                    )[0]
+                    for field, model, value in [
+                        ("title", "Titles", title),
+                        ("description", "Descriptions", description),
+                        ("url", "Urls", url),
+                    ]
+                },
+            )
+
+        new = self.migrate(self.after)
+        listings = new.get_model("auctions", "AuctionsListing").objects
+        self.assertCountEqual(
+            listings.values_list("title", "description", "url"), texts
+        )
+
+        old = self.migrate(self.before)
+        listings = old.get_model("auctions", "AuctionsListing").objects
+        self.assertCountEqual(
+            listings.values_list("title_id", "description_id", "url_id"), texts
+        )
+        titles = old.get_model("auctions", "Titles").objects
+        self.assertEqual(list(titles.values_list("title", flat=True)), ["Lamp"])
+
+
+class ListingCardQueryTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.category = AuctionCategories.objects.create(category="Lamps")
+
+    def test_card_pages_cost_constant_queries(self):
+        for total in (1, 10):
+            with self.subTest(listings=total):
+                while AuctionsListing.objects.count() < total:
+                    listing = create_listing(self.owner, category=self.category)
+                    listing.winner = self.owner
+                    listing.save()
+
+                with self.assertNumQueries(1):
+                    response = self.client.get(reverse("index"))
+                self.assertContains(response, "Category: Lamps", count=total)
+
+    def test_price_falls_back_to_latest_bid(self):
+        listing = create_listing(self.owner)
+        AuctionsListing.objects.filter(pk=listing.pk).update(current_bid=None)
+
+        card = AuctionsListing.objects.cards().get(pk=listing.pk)
+
+        self.assertEqual(card.price, Decimal("10.00"))
+
+
+class ListingCardCacheTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.bidder = User.objects.create_user("bidder", password="pw")
+        self.listing = create_listing(self.owner)
+        card_cache.get_cache().clear()
+        card_cache.reset_stats()
+
+    def render_index(self):
+        return self.client.get(reverse("index"))
+
+    def test_cards_are_served_from_cache_until_a_bid(self):
+        self.render_index()
+        self.render_index()
+        self.assertEqual(card_cache.stats()["hits"], 1)
+
+        place_bid(self.listing.id, self.bidder, Decimal("15.00"))
+        response = self.render_index()
+
+        self.assertContains(response, "Price: R$ 15.00")
+        self.assertEqual(card_cache.stats()["misses"], 2)
+        self.assertEqual(card_cache.stats()["hit_rate"], 1 / 3)
+
+    def test_closing_an_auction_invalidates_its_card(self):
+        self.render_index()
+        self.client.force_login(self.owner)
+
+        self.client.post(reverse("close_auction", args=[self.listing.id]))
+
+        self.assertIsNone(card_cache.get_cache().get(card_cache.card_key(self.listing.id)))
+
+    def test_file_based_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            cache_settings = {
+                **settings.CACHES,
+                "listing_cards": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": location,
+                },
+            }
+            with self.settings(CACHES=cache_settings):
+                self.render_index()
+                response = self.render_index()
+
+        self.assertContains(response, "Price: R$ 10.00")
+        self.assertEqual(card_cache.stats()["hits"], 1)
+
+
+@skipUnless(connection.vendor == "sqlite", "FTS5 search is SQLite-only")
+class SearchTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.lamps = AuctionCategories.objects.create(category="Lamps")
+        self.desk_lamp = create_listing(
+            self.owner, title="Desk lamp", description="Bright reading light"
+        )
+        self.floor_lamp = create_listing(
+            self.owner,
+            title="Floor light",
+            description="A tall lamp for the living room",
+            category=self.lamps,
+        )
+        create_listing(self.owner, title="Chair", description="Wooden chair")
+
+    def titles(self, query, **kwargs):
+        return [listing.title for listing in search_listings(query, **kwargs)[0]]
+
+    def test_ranks_title_matches_above_description_matches(self):
+        self.assertEqual(self.titles("lamp"), ["Desk lamp", "Floor light"])
+
+    def test_prefix_and_diacritic_insensitive_matching(self):
+        create_listing(self.owner, title="Lâmpada", description="Descrição")
+
+        self.assertEqual(self.titles("lampa"), ["Lâmpada"])
+        self.assertEqual(self.titles("descricao"), ["Lâmpada"])
+
+    def test_filters_by_status_and_category(self):
+        self.desk_lamp.status = AuctionsListing.Status.INACTIVE
+        self.desk_lamp.save()
+
+        self.assertEqual(self.titles("lamp"), ["Floor light"])
+        self.assertEqual(self.titles("lamp", status=""), ["Desk lamp", "Floor light"])
+        self.assertEqual(
+            self.titles("lamp", status="", category=self.lamps.id), ["Floor light"]
+        )
+
+    def test_edits_and_deletes_keep_the_index_in_sync(self):
+        self.desk_lamp.title = "Desk fan"
+        self.desk_lamp.description = "Quiet fan"
+        self.desk_lamp.save()
+        self.floor_lamp.delete()
+
+        self.assertEqual(self.titles("lamp"), [])
+        self.assertEqual(self.titles("fan"), ["Desk fan"])
+
+    def test_search_view_ignores_fts_syntax(self):
+        response = self.client.get(reverse("search"), {"q": 'lamp" OR NEAR('})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [listing.title for listing in response.context["auctions"]], []
+        )
+
+    def test_rebuild_command_reindexes_bulk_inserts(self):
+        AuctionsListing.objects.bulk_create(
+            [AuctionsListing(created_by=self.owner, title="Bulk lamp", description="")]
+        )
+
+        call_command("rebuild_search_index", stdout=StringIO())
+
+        self.assertIn("Bulk lamp", self.titles("lamp"))
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storage = "auctions.staticfiles.CompressedManifestStaticFilesStorage"
+        self.enterContext(
+            override_settings(
+                STATIC_MANIFEST=True,
+                STATIC_ROOT=directory.name,
+                STORAGES={
+                    **settings.STORAGES,
+                    "staticfiles": {"BACKEND": storage},
+                },
+            )
+        )
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def test_pages_link_hashed_assets_served_immutable_and_compressed(self):
+        page = self.client.get(reverse("index")).content.decode()
+        [styles] = re.findall(
+            r'href="(/static/auctions/styles\.[0-9a-f]{12}\.css)"', page
+        )
+        self.assertRegex(page, r'href="/static/images/favicon\.[0-9a-f]{12}\.ico"')
+
+        response = self.client.get(styles, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(
+            response["Cache-Control"], "public, max-age=31536000, immutable"
+        )
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        css = gzip.decompress(response.content)
+        self.assertIn(b"#comments-section", css)
+
+        response = self.client.get(
+            styles,
+            headers={"If-None-Match": response["ETag"], "Accept-Encoding": "gzip"},
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get("/static/auctions/styles.css")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response.content, css)
+
+    def test_each_encoding_has_its_own_etag(self):
+        styles = "/static/auctions/styles.css"
+        gzipped = self.client.get(styles, headers={"Accept-Encoding": "gzip"})
+        identity = self.client.get(styles)
+        self.assertNotEqual(gzipped["ETag"], identity["ETag"])
+
+        for etag, encoding, status in [
+            (gzipped["ETag"], "gzip", 304),
+            (gzipped["ETag"], "", 200),
+            (identity["ETag"], "gzip", 200),
+            (identity["ETag"], "", 304),
+        ]:
+            response = self.client.get(
+                styles, headers={"If-None-Match": etag, "Accept-Encoding": encoding}
+            )
+            self.assertEqual(response.status_code, status)
+
+    async def test_async_requests_are_served(self):
+        response = await self.async_client.get(
+            "/static/auctions/styles.css", headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn(b"#comments-section", gzip.decompress(response.content))
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", password="pw")
+        self.lamps = AuctionCategories.objects.create(category="Lamps")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return f"{self.directory.name}/{name}"
+
+    def import_file(self, name, content):
+        with open(self.path(name), "w", encoding="utf-8") as stream:
+            stream.write(content)
+        stdout = StringIO()
+        call_command(
+            "import_listings",
+            self.path(name),
+            owner="seller",
+            batch_size=2,
+            stdout=stdout,
+            stderr=StringIO(),
+        )
+        return json.loads(stdout.getvalue())
+
+    def test_import_sets_bid_columns_categories_and_search_index(self):
+        rows = [
+            {
+                "title": "Desk lamp",
+                "description": "Brass",
+                "category": "Lamps",
+                "starting_bid": "12.5",
+            },
+            {"title": "Rug", "description": "Wool", "category": "Floor"},
+            {"title": "", "description": "No title"},
+            {"title": "Vase", "description": "Blue", "starting_bid": "abc"},
+            {"title": "Clock", "description": "Wall", "ends_at": "2099-01-01T12:00"},
+        ]
+        totals = self.import_file(
+            "catalog.jsonl", "\n".join(json.dumps(row) for row in rows) + "\n{oops\n"
+        )
+
+        counts = ["listings", "bids", "categories", "skipped"]
+        self.assertEqual([totals[name] for name in counts], [3, 1, 1, 3])
+        lamp = AuctionsListing.objects.get(title="Desk lamp")
+        self.assertEqual(
+            (lamp.category, lamp.current_bid, lamp.bid_count, lamp.current_leader),
+            (self.lamps, Decimal("12.50"), 1, self.seller),
+        )
+        rug = AuctionsListing.objects.get(title="Rug")
+        self.assertEqual(rug.category.category, "Floor")
+        self.assertEqual(rug.category.active_listings, 1)
+        self.assertEqual(AuctionsListing.objects.get(title="Clock").ends_at.year, 2099)
+        self.assertEqual(
+            set(lamp.bid_rollups.values_list("resolution", "close")),
+            {(resolution, Decimal("12.50")) for resolution in "mhd"},
+        )
+        self.assertEqual(AuctionsListing.backfill_bid_stats(), 3)
+        lamp.refresh_from_db()
+        self.assertEqual((lamp.current_bid, lamp.bid_count), (Decimal("12.50"), 1))
+        if connection.vendor == "sqlite":
+            create_listing(self.seller, title="Floor lamp")
+            titles = [listing.title for listing in search_listings("lamp")[0]]
+            self.assertCountEqual(titles, ["Desk lamp", "Floor lamp"])
+
+    def test_import_skips_rows_the_model_fields_reject(self):
+        valid = {"title": "Lamp", "description": "Brass"}
+        rows = [
+            {**valid, "ends_at": "2024-13-45T00:00:00"},
+            {**valid, "title": 5},
+            {**valid, "url": "not a url"},
+            {**valid, "status": ["A"]},
+            {**valid, "title": "x" * 101},
+            {**valid, "url": "https://example.com/lamp.png"},
+        ]
+        totals = self.import_file(
+            "catalog.jsonl", "\n".join(json.dumps(row) for row in rows)
+        )
+
+        self.assertEqual((totals["listings"], totals["skipped"]), (1, 5))
+        self.assertEqual(
+            AuctionsListing.objects.get().url, "https://example.com/lamp.png"
+        )
+
+    def test_export_nests_bids_and_comments_and_reimports(self):
+        listing = create_listing(self.seller, category=self.lamps)
+        bidder = User.objects.create_user("bidder", password="pw")
+        listing.record_bid(Decimal("15.00"), bidder)
+        root = Comments.objects.create(user_comment="Works?", listing=listing)
+        Comments.objects.create(
+            user_comment="Yes", listing=listing, parent_comment=root
+        )
+
+        call_command("export_listings", self.path("out.jsonl"), stderr=StringIO())
+        with open(self.path("out.jsonl"), encoding="utf-8") as stream:
+            [record] = [json.loads(line) for line in stream]
+        self.assertEqual(record["category"], "Lamps")
+        self.assertEqual(record["starting_bid"], "10.00")
+        self.assertEqual(
+            [bid["bidder"] for bid in record["bids"]], ["seller", "bidder"]
+        )
+        self.assertEqual(
+            [comment["parent"] for comment in record["comments"]],
+            [None, str(root.id)],
+        )
+
+        call_command("export_listings", self.path("out.csv"), stderr=StringIO())
+        with open(self.path("out.csv"), encoding="utf-8") as stream:
+            exported = stream.read()
+        totals = self.import_file("out.csv", exported)
+        self.assertEqual((totals["listings"], totals["skipped"]), (1, 0))
+        copy = AuctionsListing.objects.exclude(pk=listing.pk).get()
+        self.assertEqual(
+            (copy.title, copy.category, copy.current_bid),
+            (listing.title, self.lamps, Decimal("10.00")),
+        )
+
+
+class ActivityTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.listings = [
+            create_listing(self.owner, title=f"Lamp {n}") for n in range(3)
+        ]
+        activity.flush()
+
+    def test_flush_coalesces_increments_into_one_update_per_batch(self):
+        for n in range(3000):
+            activity.record_view(self.listings[n % 3].id)
+        for n in range(1200):
+            activity.record_watch(self.listings[n % 2].id)
+        activity.record_watch(self.listings[0].id, -1)
+
+        with (
+            mock.patch.object(activity, "FLUSH_BATCH_SIZE", 2),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            self.assertEqual(activity.flush(), 3)
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(activity.pending(), {"views": {}, "watches": {}})
+        counts = dict(AuctionsListing.objects.values_list("title", "watch_count"))
+        self.assertEqual(counts, {"Lamp 0": 599, "Lamp 1": 600, "Lamp 2": 0})
+        self.assertEqual(
+            set(AuctionsListing.objects.values_list("view_count", flat=True)), {1000}
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(activity.flush(), 0)
+
+    def test_watchlist_changes_and_views_are_recorded(self):
+        watcher = User.objects.create_user("watcher", password="pw")
+        watch = Watchlist.objects.create(user=watcher, auctionlisting=self.listings[1])
+        self.client.get(reverse("listings", args=[self.listings[1].id]))
+        self.assertEqual(
+            activity.pending(),
+            {"views": {self.listings[1].id: 1}, "watches": {self.listings[1].id: 1}},
+        )
+        activity.flush()
+        watch.delete()
+        activity.flush()
+        self.listings[1].refresh_from_db()
+        self.assertEqual(
+            (self.listings[1].view_count, self.listings[1].watch_count), (1, 0)
+        )
+
+    def test_backfill_counts_watchlist_rows(self):
+        watcher = User.objects.create_user("watcher", password="pw")
+        Watchlist.objects.create(user=watcher, auctionlisting=self.listings[2])
+        AuctionsListing.objects.update(watch_count=7)
+        activity.backfill_watch_counts()
+        self.assertEqual(activity.pending()["watches"], {})
+        self.assertEqual(
+            sorted(AuctionsListing.objects.values_list("watch_count", flat=True)),
+            [0, 0, 1],
+        )
+
+    def test_trending_favours_recent_activity(self):
+        old, new, idle = self.listings
+        day = settings.TRENDING_HALF_LIFE
+        now = time.time()
+        for _ in range(30):
+            activity.record_view(old.id)
+        activity.flush(now - 3 * day)
+        for _ in range(10):
+            activity.record_view(new.id)
+        activity.flush(now)
+
+        response = self.client.get(reverse("index"), {"sort": "trending"})
+        titles = [auction.title for auction in response.context["auctions"]]
+        self.assertEqual(titles, [new.title, old.title, idle.title])
+        response = self.client.get(reverse("index"), {"sort": "viewed"})
+        titles = [auction.title for auction in response.context["auctions"]]
+        self.assertEqual(titles, [old.title, new.title, idle.title])
+
+    def test_sorted_pages_follow_cursors(self):
+        for views, listing in enumerate(self.listings):
+            for _ in range(views):
+                activity.record_view(listing.id)
+        activity.flush()
+
+        first = self.client.get(reverse("index"), {"sort": "viewed", "page_size": 2})
+        self.assertEqual(
+            [auction.title for auction in first.context["auctions"]],
+            ["Lamp 2", "Lamp 1"],
+        )
+        second = self.client.get(
+            reverse("index"),
+            {"sort": "viewed", "page_size": 2, "after": first.context["next_cursor"]},
+        )
+        self.assertEqual(
+            [auction.title for auction in second.context["auctions"]], ["Lamp 0"]
+        )
+        back = self.client.get(
+            reverse("index"),
+            {
+                "sort": "viewed",
+                "page_size": 2,
+                "before": second.context["previous_cursor"],
+            },
+        )
+        self.assertEqual(
+            [auction.title for auction in back.context["auctions"]],
+            ["Lamp 2", "Lamp 1"],
+        )
+
+
+class ConditionalListingTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pw")
+        self.listing = create_listing(self.owner)
+        self.url = reverse("listings", args=[self.listing.id])
+
+    def revalidate(self, response, **headers):
+        return self.client.get(
+            self.url,
+            headers={
+                "If-None-Match": response["ETag"],
+                "If-Modified-Since": response["Last-Modified"],
+                **headers,
+            },
+        )
+
+    def test_unchanged_listing_answers_304_in_one_query(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        with self.assertNumQueries(1):
+            response = self.revalidate(response)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(activity.pending()["views"][self.listing.id], 2)
+
+    def test_signed_in_revalidation_answers_304_without_rendering(self):
+        viewer = User.objects.create_user("viewer", password="pw")
+        self.client.force_login(viewer)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        # Session, user and validators; the watchlist is already cached.
+        with self.assertNumQueries(3):
+            response = self.revalidate(response)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_bids_comments_and_edits_change_the_validators(self):
+        response = self.client.get(self.url)
+        bidder = User.objects.create_user("bidder", password="pw")
+        changes = [
+            lambda: self.listing.record_bid(Decimal("12.00"), bidder),
+            lambda: Comments.objects.create(user_comment="Hi", listing=self.listing),
+            lambda: AuctionsListing.objects.filter(pk=self.listing.pk).update(
+                modified_at=timezone.now() + timedelta(seconds=1)
+            ),
+        ]
+        for change in changes:
+            change()
+            fresh = self.revalidate(response)
+            self.assertEqual(fresh.status_code, 200)
+            self.assertNotEqual(fresh["ETag"], response["ETag"])
+            response = fresh
+
+    def test_viewer_and_watchlist_are_part_of_the_etag(self):
+        anonymous = self.client.get(self.url)
+        viewer = User.objects.create_user("viewer", password="pw")
+        self.client.force_login(viewer)
+        signed_in = self.revalidate(anonymous)
+        self.assertEqual(signed_in.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Watchlist.objects.create(user=viewer, auctionlisting=self.listing)
+        watching = self.revalidate(signed_in)
+        self.assertEqual(watching.status_code, 200)
+        self.assertEqual(self.revalidate(watching).status_code, 304)
+
+    def test_missing_listing_is_404(self):
+        for listing_id in ["x", uuid.uuid4()]:
+            response = self.client.get(reverse("listings", args=[listing_id]))
+            self.assertEqual(response.status_code, 404)
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", password="pw")
+        self.bidder = User.objects.create_user("bidder", password="pw")
+        self.rival = User.objects.create_user("rival", password="pw")
+        self.listings = {
+            name: create_listing(self.seller, title=name)
+            for name in ["leading", "outbid", "won", "ended", "lost", "unbid"]
+        }
+        for name in ["leading", "outbid", "won", "ended", "lost"]:
+            self.listings[name].record_bid(Decimal("11.00"), self.bidder)
+        for name in ["outbid", "lost"]:
+            self.listings[name].record_bid(Decimal("12.00"), self.rival)
+        self.listings["leading"].record_bid(Decimal("13.00"), self.bidder)
+        past = timezone.now() - timedelta(minutes=1)
+        AuctionsListing.objects.filter(title__in=["won", "ended", "lost"]).update(
+            ends_at=past
+        )
+        close_auctions(AuctionsListing.objects.filter(title__in=["won", "lost"]))
+        self.own = create_listing(self.bidder, title="own")
+        self.client.force_login(self.bidder)
+
+    def test_sorts_bid_on_listings_by_standing(self):
+        standings = AuctionsListing.bid_standings(self.bidder, 10)
+        self.assertEqual(
+            {
+                section["standing"]: sorted(
+                    listing.title for listing in section["listings"]
+                )
+                for section in standings
+            },
+            {
+                "leading": ["leading"],
+                "outbid": ["outbid"],
+                "won": ["ended", "won"],
+                "lost": ["lost"],
+            },
+        )
+        [leading] = standings[0]["listings"]
+        self.assertEqual((leading.my_bid, leading.my_bids), (Decimal("13.00"), 2))
+
+    def test_sections_are_capped_with_their_totals(self):
+        for n in range(5):
+            listing = create_listing(self.seller, title=f"extra {n}")
+            listing.record_bid(Decimal("11.00"), self.bidder)
+        leading = AuctionsListing.bid_standings(self.bidder, 3)[0]
+        self.assertEqual(leading["total"], 6)
+        self.assertEqual(
+            [listing.title for listing in leading["listings"]],
+            ["extra 4", "extra 3", "extra 2"],
+        )
+
+    def test_dashboard_is_a_fixed_number_of_queries(self):
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["listings_total"], 1)
+        self.assertContains(response, "own")
+        for n in range(20):
+            listing = create_listing(self.seller, title=f"extra {n}")
+            listing.record_bid(Decimal("11.00"), self.bidder)
+            create_listing(self.bidder, title=f"mine {n}")
+        # Session, user, cold watchlist cache, listings and standings.
+        watchlist_cache.get_cache().clear()
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.context["listings_total"], 21)
+        self.assertEqual(response.context["standings"][0]["total"], 21)
+
+    def test_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 302)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", password="pw")
+        self.lamps = AuctionCategories.objects.create(category="Lamps")
+        self.listings = [
+            create_listing(self.seller, title=f"Lamp {n}", category=self.lamps)
+            for n in range(5)
+        ]
+        self.bidder = User.objects.create_user("bidder", password="pw")
+        self.listings[0].record_bid(Decimal("12.50"), self.bidder)
+
+    def get(self, name, *args, **params):
+        return self.client.get(reverse(name, args=args), params)
+
+    def assertJsonError(self, response, status_code):
+        self.assertEqual(response.status_code, status_code)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("error", response.json())
+
+    def test_listings_page_with_sparse_fields_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.get("api_listings", fields="title,current_bid")
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual(
+            page["results"][0], {"title": "Lamp 0", "current_bid": "12.50"}
+        )
+        self.assertEqual(len(page["results"]), 5)
+        self.assertNotIn(b", ", response.content)
+
+    def test_listings_follow_cursors_and_sorts(self):
+        first = self.get("api_listings", fields="title", page_size=2).json()
+        second = self.get(
+            "api_listings", fields="title", page_size=2, after=first["next"]
+        ).json()
+        self.assertEqual(
+            [row["title"] for row in first["results"] + second["results"]],
+            ["Lamp 0", "Lamp 1", "Lamp 2", "Lamp 3"],
+        )
+        AuctionsListing.objects.filter(pk=self.listings[3].pk).update(view_count=9)
+        viewed = self.get("api_listings", fields="title", sort="viewed").json()
+        self.assertEqual(viewed["results"][0], {"title": "Lamp 3"})
+
+    def test_invalid_fields_and_sorts_are_400(self):
+        for params in [{"fields": "title,password"}, {"sort": "cheapest"}]:
+            self.assertJsonError(self.get("api_listings", **params), 400)
+
+    def test_listing_detail(self):
+        listing = self.listings[0]
+        with self.assertNumQueries(1):
+            response = self.get("api_listing", listing.id)
+        data = response.json()
+        self.assertEqual(
+            (data["id"], data["category"], data["seller"], data["bid_count"]),
+            (str(listing.id), "Lamps", "seller", 2),
+        )
+        data = self.get("api_listing", listing.id, fields="winner").json()
+        self.assertEqual(data, {"winner": None})
+        self.assertJsonError(self.get("api_listing", uuid.uuid4()), 404)
+
+    def test_listing_bids_newest_first(self):
+        response = self.get("api_listing_bids", self.listings[0].id)
+        self.assertEqual(
+            [(bid["value"], bid["bidder"]) for bid in response.json()["results"]],
+            [("12.50", "bidder"), ("10.00", "seller")],
+        )
+        self.assertJsonError(self.get("api_listing_bids", uuid.uuid4()), 404)
+
+    def test_category_listings(self):
+        other = AuctionCategories.objects.create(category="Rugs")
+        create_listing(self.seller, title="Rug", category=other)
+        page = self.get("api_category_listings", other.pk, fields="title").json()
+        self.assertEqual(page["results"], [{"title": "Rug"}])
+        empty = AuctionCategories.objects.create(category="Clocks")
+        page = self.get("api_category_listings", empty.pk).json()
+        self.assertEqual(page["results"], [])
+        self.assertJsonError(self.get("api_category_listings", uuid.uuid4()), 404)
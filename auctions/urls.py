@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.index, name="index"),
@@ -8,14 +8,23 @@ urlpatterns = [
     path("logout", views.logout_view, name="logout"),
     path("register", views.register, name="register"),
     path("watchlist", views.watchlist, name="watchlist"),
+    path("dashboard", views.dashboard, name="dashboard"),
     path("listings/<str:listing_id>", views.listings, name="listings"),
     path("listings/<str:listing_id>/comment", views.new_comment, name="insert_comments"),
     path("listings/<str:listing_id>/<str:parent_comment>/comment", views.new_comment, name="insert_comments"),
     path("listings/<str:listing_id>/new_bid", views.new_bid, name="new_bid"),
+    path("listings/<str:listing_id>/events", views.listing_events, name="listing_events"),
+    path("listings/<str:listing_id>/bid_history", views.listing_bid_history, name="listing_bid_history"),
     path("toggle_watchlist/<str:listing_id>", views.toggle_watchlist, name="toggle_watchlist"),
     path("add", views.add_listing, name="add"),
     path("categories", views.search_by_category, name="categories"),
-    path("goto/<str:category_id>", views.go_to_category, name="filter_category"),
+    path("goto/<uuid:category_id>", views.go_to_category, name="filter_category"),
+    path("search", views.search, name="search"),
     path("close_auction/<str:listing_id>", views.close_auction, name="close_auction"),
     path("cancel_auction/<str:listing_id>", views.cancel_auction, name="cancel_auction"),
+    path("stats/requests", views.request_stats, name="request_stats"),
+    path("api/listings", api.listings, name="api_listings"),
+    path("api/listings/<uuid:listing_id>", api.listing, name="api_listing"),
+    path("api/listings/<uuid:listing_id>/bids", api.listing_bids, name="api_listing_bids"),
+    path("api/categories/<uuid:category_id>/listings", api.category_listings, name="api_category_listings"),
 ]
@@ -1,118 +1,217 @@
+import asyncio
+import hashlib
+import uuid
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
+from django.core.handlers.asgi import ASGIRequest
 from django.db import IntegrityError
-from django.db.models import Max
-from django.http import HttpResponseForbidden, HttpResponseRedirect
-from django.shortcuts import get_object_or_404, redirect, render
+from django.db.models import Count, Window
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import (
+    aget_object_or_404,
+    get_object_or_404,
+    redirect,
+    render,
+)
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 
 from .models import (
     AuctionCategories,
-    Bids,
     Comments,
-    Descriptions,
-    Titles,
-    Urls,
     User,
     AuctionsListing,
     Watchlist,
 )
+from . import (
+    activity,
+    bid_history,
+    card_cache,
+    events,
+    metrics,
+    ratelimit,
+    watchlist_cache,
+)
 from .forms import CreateListingForm, NewBiddingForm, NewCommentForm
+from .pagination import SORTS, apaginate_by_cursor, paginate_by_cursor
+from .search import search_listings
+from .services import (
+    BidRejected,
+    close_auctions,
+    deactivate_listings,
+    place_bid,
+)
 from django.utils import timezone
 
 
-def get_auction_listing(**kwargs):
-    return {
-        "auctions": AuctionsListing.objects.filter(
+async def get_auction_listing(request, **kwargs):
+    sort = request.GET.get("sort")
+    if sort not in SORTS:
+        sort = None
+    listings = await apaginate_by_cursor(
+        request,
+        AuctionsListing.objects.cards().filter(
             status=AuctionsListing.Status.ACTIVE, **kwargs
-        ).order_by("created_at")
-    }
+        ),
+        **({"key": SORTS[sort], "descending": True} if sort else {}),
+    )
+    listings.update(sort=sort, sorts=SORTS)
+    return listings
+
+
+def get_all_auctions(request, **kwargs):
+    return paginate_by_cursor(request, AuctionsListing.objects.cards().filter(**kwargs))
+
+
+def get_query_uuid(request, name):
+    try:
+        return uuid.UUID(request.GET[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def get_query_page(request, name):
+    try:
+        return max(int(request.GET[name]), 1)
+    except (KeyError, ValueError):
+        return 1
+
+
+async def auser_context(request):
+    """Resolve what layout.html reads about the user, for async views.
 
+    Templates read ``user`` from the context; resolving it here keeps the
+    context processors from querying synchronously during rendering.
+    """
+    user = await request.auser()
+    watched = await watchlist_cache.alisting_ids(user)
+    return {"user": user, "watchlist_count": len(watched)}
 
-def get_all_auctions(**kwargs):
-    return {"auctions": AuctionsListing.objects.filter(**kwargs).order_by("created_at")}
 
+def listing_page_queryset():
+    return AuctionsListing.objects.select_related("category", "created_by", "winner")
 
-def get_auction_context(listing_id, user):
-    auction = get_object_or_404(AuctionsListing, id=listing_id)
-    is_watchlist = False
-    if user.is_authenticated:
-        is_watchlist = Watchlist.objects.filter(
-            auctionlisting=listing_id, user=user
-        ).exists()
-    bid_count = auction.bids.count() - 1
-    latest_bid = auction.bids.last()
-    is_bidder_user = latest_bid.created_by == user if latest_bid else False
+
+async def aget_auction_context(
+    listing_id, user, comments_page=1, thread=None, auction=None
+):
+    if auction is None:
+        auction = await aget_object_or_404(listing_page_queryset(), id=listing_id)
+    # The watchlist lookup and the comment tree do not depend on each other.
+    watched, comments = await asyncio.gather(
+        watchlist_cache.alisting_ids(user),
+        sync_to_async(Comments.get_comment_tree)(
+            auction.id, page=comments_page, root=thread
+        ),
+    )
+    is_watchlist = auction.id in watched
+    bid_count = auction.bid_count - 1
+    is_bidder_user = (
+        user.is_authenticated and auction.current_leader_id == user.id
+    )
     return {
         "auction": auction,
-        "is_auction_active": auction.status == AuctionsListing.Status.ACTIVE,
+        "user": user,
+        "is_auction_active": auction.is_open,
         "is_owner": user == auction.created_by,
-        "can_bid": auction.status == AuctionsListing.Status.ACTIVE
+        "can_bid": auction.is_open
         and user.is_authenticated
         and user != auction.created_by,
         "bid_count": bid_count,
         "is_bidder_user": is_bidder_user,
-        "latest_bid": latest_bid,
+        "current_bid": auction.current_bid,
         "bid_form": NewBiddingForm(),
         "comment_form": NewCommentForm(),
-        "all_comments": auction.comments.filter(parent_comment__isnull=True),
+        "comments": comments,
+        "thread": thread,
         "watchlist_label": (
             "Remove from watchlist" if is_watchlist else "Add to watchlist"
         ),
         "btn_class": "btn-outline-danger" if is_watchlist else "btn-outline-primary",
+        "watchlist_count": len(watched),
     }
 
 
-def is_valid_bid(bid_value, latest_bid, bid_count):
-    print(100*"*")
-    print(bid_count)
-    if bid_count == 0 and bid_value >=latest_bid.value:
-        return True
-    else:    
-        return latest_bid and bid_value > latest_bid.value
+get_auction_context = async_to_sync(aget_auction_context)
 
 
-def index(request):
-    listings = get_auction_listing()
-    listings["title"] = "Active Listings"
+async def index(request):
+    listings, user_context = await asyncio.gather(
+        get_auction_listing(request), auser_context(request)
+    )
+    listings.update(title="Active Listings", **user_context)
     return render(request, "auctions/index.html", listings)
 
 
+@login_required
+def dashboard(request):
+    """Show the user's listings, the listings they bid on and their wins.
+
+    Two queries whatever the user's history: their latest listings with a
+    window count of all of them, and AuctionsListing.bid_standings.
+    """
+    limit = settings.DASHBOARD_ROWS
+    listings = list(
+        AuctionsListing.objects.cards()
+        .filter(created_by=request.user)
+        .annotate(total=Window(Count("pk")))
+        .order_by("-created_at", "-id")[:limit]
+    )
+    return render(
+        request,
+        "auctions/dashboard.html",
+        {
+            "auctions": listings,
+            "listings_total": listings[0].total if listings else 0,
+            "standings": AuctionsListing.bid_standings(request.user, limit),
+        },
+    )
+
+
 @login_required
 def watchlist(request):
-    listings = get_all_auctions(user_watchlist__user=request.user)
+    listings = get_all_auctions(
+        request, id__in=watchlist_cache.listing_ids(request.user)
+    )
     listings["title"] = f"{request.user.username.capitalize()}'s Watchlist"
 
     return render(request, "auctions/index.html", listings)
 
 
+@login_required
+@ratelimit.rate_limited
 def new_bid(request, listing_id):
     if request.method == "POST":
         bid_form = NewBiddingForm(request.POST)
 
         if bid_form.is_valid():
-            context = get_auction_context(listing_id, request.user)
-            bid_value = bid_form.cleaned_data["new_bid"]
-
-            if not is_valid_bid(bid_value, context["latest_bid"], context["bid_count"]):
-                
+            try:
+                place_bid(listing_id, request.user, bid_form.cleaned_data["new_bid"])
+            except BidRejected as error:
+                context = get_auction_context(listing_id, request.user)
                 context["bid_form"] = bid_form
-                context["error_message"] = (
-                    "Your bid must be higher than the current bid."
-                )
+                context["error_message"] = str(error)
                 return render(
                     request,
                     "auctions/listings.html",
                     context,
                 )
 
-            Bids.objects.create(
-                value=bid_value, created_by=request.user, listing=context["auction"]
-            )
-
     return redirect("listings", listing_id=listing_id)
 
 
+@ratelimit.rate_limited
 def new_comment(request, listing_id, parent_comment=None):
     if request.method == "POST":
         comment_form = NewCommentForm(request.POST)
@@ -132,12 +231,124 @@ def new_comment(request, listing_id, parent_comment=None):
     return redirect("listings", listing_id=listing_id)
 
 
-def listings(request, listing_id):
-    context = get_auction_context(listing_id, request.user)
-    return render(
-        request,
-        "auctions/listings.html",
-        context,
+async def alisting_validators(listing_id, user):
+    """Return the listing, and the ETag and Last-Modified of its page.
+
+    One query reads the listing with its latest bid and comment times; the
+    viewer's part (their watchlist) comes from the cache. The listing is the
+    one the page renders, so a full page costs no extra query.
+    """
+    try:
+        listing_id = uuid.UUID(listing_id)
+    except ValueError:
+        raise Http404("No AuctionsListing matches the given query.")
+    listing = await aget_object_or_404(
+        listing_page_queryset().freshness(), id=listing_id
+    )
+    watched = await watchlist_cache.alisting_ids(user)
+    moments = [listing.modified_at, listing.latest_bid_at, listing.latest_comment_at]
+    last_modified = max(moment for moment in moments if moment is not None)
+    # The page also changes when the auction runs out or the viewer changes.
+    version = [
+        *moments,
+        listing.bid_count,
+        listing.is_open,
+        user.pk,
+        listing.id in watched,
+        len(watched),
+    ]
+    digest = hashlib.md5(repr(version).encode(), usedforsecurity=False)
+    return listing, quote_etag(digest.hexdigest()), last_modified
+
+
+async def listings(request, listing_id):
+    user = await request.auser()
+    listing, etag, last_modified = await alisting_validators(listing_id, user)
+    activity.record_view(listing.id)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp())
+    )
+    if response is None:
+        context = await aget_auction_context(
+            listing.id,
+            user,
+            comments_page=get_query_page(request, "comments_page"),
+            thread=get_query_uuid(request, "thread"),
+            auction=listing,
+        )
+        response = render(
+            request,
+            "auctions/listings.html",
+            context,
+        )
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    # Browsers keep the page but ask each time whether it is still current.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+async def listing_events(request, listing_id):
+    """Stream a listing's price, bid count and status as Server-Sent Events.
+
+    Under ASGI, ``events.ListingEventsRouter`` answers this URL before it
+    reaches Django; this view streams for ASGI servers run without it.
+    Django runs a WSGI streaming response's async iterator to completion
+    before sending anything, so WSGI requests (runserver, commerce.wsgi)
+    get only the current state instead, and the browser polls by
+    reconnecting every LISTING_EVENTS_RETRY_MS.
+    """
+    if not isinstance(request, ASGIRequest):
+        frame = await events.listing_poll(listing_id)
+        if frame is None:
+            raise Http404("No AuctionsListing matches the given query.")
+        return HttpResponse(frame, headers=events.STREAM_HEADERS)
+    stream = await events.listing_stream(listing_id)
+    if stream is None:
+        raise Http404("No AuctionsListing matches the given query.")
+    return StreamingHttpResponse(stream, headers=events.STREAM_HEADERS)
+
+
+async def listing_bid_history(request, listing_id):
+    """Return a listing's bid prices as open/high/low/close buckets in JSON.
+
+    ``resolution`` is minute, hour (the default) or day, and ``limit`` caps
+    the number of buckets, the latest ones, at BID_HISTORY_MAX_BUCKETS.
+    """
+    resolution = request.GET.get("resolution", "hour")
+    if resolution not in bid_history.RESOLUTIONS:
+        return JsonResponse(
+            {"error": f"resolution must be one of {list(bid_history.RESOLUTIONS)}"},
+            status=400,
+        )
+    try:
+        listing_id = uuid.UUID(listing_id)
+        limit = int(request.GET.get("limit", settings.BID_HISTORY_MAX_BUCKETS))
+    except ValueError:
+        raise Http404("No AuctionsListing matches the given query.")
+    limit = min(max(limit, 1), settings.BID_HISTORY_MAX_BUCKETS)
+    buckets = [
+        bucket
+        async for bucket in bid_history.buckets(
+            listing_id, bid_history.RESOLUTIONS[resolution], limit
+        )
+    ]
+    # Every listing with a bid has buckets; only an empty answer needs a check.
+    listing = AuctionsListing.objects.filter(pk=listing_id)
+    if not buckets and not await listing.aexists():
+        raise Http404("No AuctionsListing matches the given query.")
+    buckets.reverse()
+    return JsonResponse(
+        {"listing": listing_id, "resolution": resolution, "buckets": buckets}
+    )
+
+
+@login_required
+def request_stats(request):
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    return JsonResponse(
+        {"views": metrics.stats(), "listing_card_cache": card_cache.stats()}
     )
 
 
@@ -203,16 +414,6 @@ def add_listing(request):
         form = CreateListingForm(request.POST)
         if form.is_valid():
             user = request.user
-            url_instance, _ = Urls.objects.get_or_create(
-                url=form.cleaned_data["image_url"]
-            )
-            title_instance, _ = Titles.objects.get_or_create(
-                title=form.cleaned_data["title"]
-            )
-            description_instance, _ = Descriptions.objects.get_or_create(
-                description=form.cleaned_data["description"]
-            )
-
             listing = AuctionsListing(
                 created_by=user,
                 category=(
@@ -220,17 +421,14 @@ def add_listing(request):
                     if form.cleaned_data["category"]
                     else None
                 ),
-                url=url_instance,
-                title=title_instance,
-                description=description_instance,
+                url=form.cleaned_data["image_url"],
+                title=form.cleaned_data["title"],
+                description=form.cleaned_data["description"],
                 status=AuctionsListing.Status.ACTIVE,
+                ends_at=form.cleaned_data["ends_at"],
             )
             listing.save()
-            Bids.objects.create(
-                value=form.cleaned_data["starting_bid"],
-                listing=listing,
-                created_by=user,
-            )
+            listing.record_bid(form.cleaned_data["starting_bid"], user)
             return redirect("index")
     else:
         return render(
@@ -238,18 +436,54 @@ def add_listing(request):
         )
 
 
-def search_by_category(request):
-    categories = AuctionCategories.objects.all()
-    return render(request, "auctions/categories.html", {"categories": categories})
+async def search_by_category(request):
+    counted = AuctionCategories.objects.only("category", "active_listings")
+    categories = [category async for category in counted]
+    return render(
+        request,
+        "auctions/categories.html",
+        {"categories": categories, **await auser_context(request)},
+    )
 
 
-def go_to_category(request, category_id):
-    listings = get_auction_listing(category__category=category_id)
-    listings["title"] = category_id
+async def go_to_category(request, category_id):
+    category, listings, user_context = await asyncio.gather(
+        aget_object_or_404(AuctionCategories.objects.only("category"), pk=category_id),
+        get_auction_listing(request, category=category_id),
+        auser_context(request),
+    )
+    listings.update(title=category.category, **user_context)
     return render(request, "auctions/index.html", listings)
 
 
+def search(request):
+    query = request.GET.get("q", "").strip()
+    category = get_query_uuid(request, "category")
+    status = request.GET.get("status", AuctionsListing.Status.ACTIVE)
+    if status not in AuctionsListing.Status.values:
+        status = ""
+    page = get_query_page(request, "page")
+    auctions, has_next = search_listings(
+        query, status=status, category=category, page=page
+    )
+    return render(
+        request,
+        "auctions/search.html",
+        {
+            "query": query,
+            "auctions": auctions,
+            "categories": AuctionCategories.objects.all(),
+            "selected_category": category,
+            "selected_status": status,
+            "statuses": [("", "Any status"), *AuctionsListing.Status.choices],
+            "previous_page": page - 1 if page > 1 else None,
+            "next_page": page + 1 if has_next else None,
+        },
+    )
+
+
 @login_required
+@ratelimit.rate_limited
 def toggle_watchlist(request, listing_id):
     if request.method == "POST":
         listing = get_object_or_404(AuctionsListing, id=listing_id)
@@ -264,20 +498,22 @@ def toggle_watchlist(request, listing_id):
 @login_required
 def close_auction(request, listing_id):
     if request.method == "POST":
-        listing = get_object_or_404(AuctionsListing, id=listing_id)
-        highest_bid = listing.bids.aggregate(Max("value"))["value__max"]
-        if highest_bid:
-            winning_bid = listing.bids.get(value=highest_bid)
-            listing.winner = winning_bid.created_by
-        listing.status = AuctionsListing.Status.SOLD
-        listing.save(update_fields=["winner", "status"])
-    return redirect("listings", listing_id=listing.id)
+        get_object_or_404(AuctionsListing.objects.only("id"), id=listing_id)
+        if close_auctions(AuctionsListing.objects.filter(id=listing_id)):
+            events.publish_listings([listing_id], "closed")
+        card_cache.invalidate(listing_id)
+    return redirect("listings", listing_id=listing_id)
 
 
 @login_required
 def cancel_auction(request, listing_id):
     if request.method == "POST":
-        listing = get_object_or_404(AuctionsListing, id=listing_id)
-        listing.status = AuctionsListing.Status.INACTIVE
-        listing.save()
+        get_object_or_404(AuctionsListing.objects.only("id"), id=listing_id)
+        if deactivate_listings(
+            AuctionsListing.objects.filter(id=listing_id),
+            status=AuctionsListing.Status.INACTIVE,
+            modified_at=timezone.now(),
+        ):
+            events.publish_listings([listing_id], "canceled")
+        card_cache.invalidate(listing_id)
     return redirect("listings", listing_id=listing_id)
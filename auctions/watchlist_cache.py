@@ -0,0 +1,73 @@
+"""Per-user watchlist membership, cached as a set of listing ids.
+
+Each user's watched listing ids are stored under ``watchlist:<user id>`` in
+the ``WATCHLIST_CACHE`` alias, so a membership check or the badge count is a
+single cache read. A miss loads the set with one query. Adding or deleting
+a Watchlist row through the ORM drops the user's set once the transaction
+commits, through the signals in ``signals.py``, and the next read loads it
+fresh. Deleting a user drops their set, since SQLite can hand the id to the
+next user. Any cache backend works: locmem in development and tests, Redis
+(or a Redis-protocol server) in production.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Watchlist
+
+
+def get_cache():
+    return caches[settings.WATCHLIST_CACHE]
+
+
+def watchlist_key(user_id):
+    return f"watchlist:{user_id}"
+
+
+def _query(user_id):
+    return Watchlist.objects.filter(user=user_id).values_list(
+        "auctionlisting_id", flat=True
+    )
+
+
+def listing_ids(user):
+    """Return the ids of the listings ``user`` watches, as a frozenset."""
+    if not user.is_authenticated:
+        return frozenset()
+    cache = get_cache()
+    key = watchlist_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(_query(user.pk))
+        cache.set(key, ids, settings.WATCHLIST_CACHE_TIMEOUT)
+    return ids
+
+
+async def alisting_ids(user):
+    if not user.is_authenticated:
+        return frozenset()
+    cache = get_cache()
+    key = watchlist_key(user.pk)
+    ids = await cache.aget(key)
+    if ids is None:
+        ids = frozenset([listing_id async for listing_id in _query(user.pk)])
+        await cache.aset(key, ids, settings.WATCHLIST_CACHE_TIMEOUT)
+    return ids
+
+
+def count(user):
+    return len(listing_ids(user))
+
+
+def invalidate(user_id):
+    get_cache().delete(watchlist_key(user_id))
+
+
+def invalidate_on_commit(user_id):
+    """Drop the user's set once the current transaction commits.
+
+    Not before: a read in between would cache the rows as they were. A
+    rolled back change leaves the cache alone.
+    """
+    transaction.on_commit(lambda: invalidate(user_id))
@@ -13,4 +13,11 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'commerce.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the app registry is ready.
+from auctions.activity import start_flusher  # noqa: E402
+from auctions.events import ListingEventsRouter  # noqa: E402
+
+application = ListingEventsRouter(django_application)
+start_flusher()
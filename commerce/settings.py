@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -41,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'auctions.middleware.StaticFilesMiddleware',
+    'auctions.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,7 +59,7 @@ ROOT_URLCONF = 'commerce.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'auctions.metrics.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'auctions.context_processors.watchlist',
             ],
         },
     },
@@ -75,15 +80,121 @@ WSGI_APPLICATION = 'commerce.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+# DATABASE_PROFILE picks one of the profiles below:
+#   sqlite         - WAL journal and tuned pragmas, persistent connections
+#   sqlite-legacy  - SQLite defaults, one connection per request
+#   postgres       - PostgreSQL through a psycopg connection pool (psycopg[pool])
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+
+# Readers no longer block the writer, and commits only append to the WAL.
+# The journal mode is stored in the database file, so it is switched once
+# after migrate (see auctions.signals) instead of on every connection.
+SQLITE_JOURNAL_MODE = 'WAL' if DATABASE_PROFILE == 'sqlite' else None
+
+# Per-connection pragmas, run by the sqlite profile's init_command.
+SQLITE_PRAGMAS = {
+    # Safe with WAL; a power loss can drop the last commits, never corrupt.
+    'synchronous': 'NORMAL',
+    # Milliseconds a writer waits for the lock before "database is locked".
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': -32000,
+    'temp_store': 'MEMORY',
+}
+
+SQLITE_DATABASE = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.environ.get('SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')),
+    # A file-backed test database lets threaded tests use real SQLite
+    # locking instead of shared-cache table locks.
+    'TEST': {
+        'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+    },
 }
 
+if DATABASE_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            **SQLITE_DATABASE,
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ';'.join(
+                    f'PRAGMA {name} = {value}' for name, value in SQLITE_PRAGMAS.items()
+                ),
+                # Take the write lock when a transaction starts, so a writer
+                # waits on busy_timeout instead of failing to upgrade a read
+                # lock halfway through.
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+elif DATABASE_PROFILE == 'sqlite-legacy':
+    DATABASES = {'default': SQLITE_DATABASE}
+elif DATABASE_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'commerce'),
+            'USER': os.environ.get('POSTGRES_USER', 'commerce'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # The pool keeps connections open, so Django must not also
+            # persist them.
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('POSTGRES_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('POSTGRES_POOL_MAX_SIZE', 20)),
+                    'timeout': 10,
+                },
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'Unknown DATABASE_PROFILE {DATABASE_PROFILE!r}.')
+
 AUTH_USER_MODEL = 'auctions.User'
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'listing_cards': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'listing-cards',
+    },
+    'watchlists': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'watchlists',
+    },
+}
+
+if os.environ.get('LISTING_CARD_CACHE_DIR'):
+    CACHES['listing_cards'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['LISTING_CARD_CACHE_DIR'],
+    }
+
+# Any Redis-protocol server (Redis, Valkey, KeyDB, ...); needs redis-py.
+if os.environ.get('WATCHLIST_CACHE_URL'):
+    CACHES['watchlists'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['WATCHLIST_CACHE_URL'],
+    }
+
+# Shares rate limit buckets between workers; see auctions.ratelimit.
+if os.environ.get('RATE_LIMIT_CACHE_URL'):
+    CACHES['rate_limits'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['RATE_LIMIT_CACHE_URL'],
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -122,5 +233,125 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
+# STATIC_MANIFEST=1 serves the files gathered by collectstatic under
+# content-hashed names, precompressed and cached forever; see
+# auctions.staticfiles. Run collectstatic after every deploy.
+STATIC_MANIFEST = os.environ.get('STATIC_MANIFEST') == '1'
+
+# Cache lifetime of the original, unhashed static file names.
+STATIC_MAX_AGE = 60 * 60
+
+if STATIC_MANIFEST:
+    STORAGES = {
+        'default': {
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        },
+        'staticfiles': {
+            'BACKEND': 'auctions.staticfiles.CompressedManifestStaticFilesStorage',
+        },
+    }
+
+
+# Auctions
+
+LISTINGS_PER_PAGE = 24
+
+LISTINGS_MAX_PER_PAGE = 100
+
+# Listings shown in each section of the dashboard.
+DASHBOARD_ROWS = 12
+
+COMMENTS_PER_PAGE = 20
+
+COMMENT_MAX_DEPTH = 5
+
+SEARCH_CANDIDATE_LIMIT = 2000
+
+AUCTION_EXPIRY_BATCH_SIZE = 1000
+
+LISTING_EVENTS_BROKER = 'auctions.events.InProcessBroker'
+
+LISTING_EVENTS_QUEUE_SIZE = 16
+
+LISTING_EVENTS_KEEPALIVE = 15
+
+LISTING_EVENTS_RETRY_MS = 3000
+
+LISTING_CARD_CACHE = 'listing_cards'
+
+LISTING_CARD_CACHE_TIMEOUT = 600
+
+WATCHLIST_CACHE = 'watchlists'
+
+WATCHLIST_CACHE_TIMEOUT = 24 * 60 * 60
+
+BID_HISTORY_MAX_BUCKETS = 500
+
+# Seconds between writes of the listing view and watch counters; 0 leaves
+# flushing to explicit auctions.activity.flush() calls.
+ACTIVITY_FLUSH_INTERVAL = int(os.environ.get('ACTIVITY_FLUSH_INTERVAL', 10))
+
+# Seconds for a view or watch to count half as much toward trending.
+TRENDING_HALF_LIFE = 24 * 60 * 60
+
+# Token buckets per URL name, for each signed-in user and each client IP:
+# "<requests>/<s|m|h>" allows bursts of <requests> refilled at that rate.
+RATE_LIMITS = {
+    'new_bid': {'user': '30/m', 'ip': '120/m'},
+    'insert_comments': {'user': '10/m', 'ip': '30/m'},
+    'toggle_watchlist': {'user': '60/m', 'ip': '240/m'},
+}
+
+RATE_LIMIT_CACHE = 'rate_limits'
+
+RATE_LIMIT_STORE = (
+    'auctions.ratelimit.CacheStore'
+    if RATE_LIMIT_CACHE in CACHES
+    else 'auctions.ratelimit.InProcessStore'
+)
+
+# Requests measured per view for the /stats/requests percentiles.
+REQUEST_METRICS_SAMPLES = 1000
+
+# Per-view limits keyed by URL name: "queries", "sql_ms", "template_ms" and
+# "total_ms". A request over budget logs a warning on auctions.requests, or
+# raises metrics.BudgetExceeded when REQUEST_BUDGET_STRICT is on. Query
+# budgets allow for a cold watchlist cache.
+REQUEST_BUDGETS = {
+    'index': {'queries': 4, 'sql_ms': 50, 'total_ms': 250},
+    'filter_category': {'queries': 4, 'sql_ms': 50, 'total_ms': 250},
+    'categories': {'queries': 4, 'sql_ms': 25, 'total_ms': 150},
+    'watchlist': {'queries': 4, 'sql_ms': 50, 'total_ms': 250},
+    'dashboard': {'queries': 5, 'sql_ms': 50, 'total_ms': 250},
+    'listings': {'queries': 5, 'sql_ms': 50, 'total_ms': 250},
+    'search': {'queries': 5, 'sql_ms': 100, 'total_ms': 300},
+    'new_bid': {'queries': 10, 'sql_ms': 100, 'total_ms': 300},
+    'listing_bid_history': {'queries': 2, 'sql_ms': 25, 'total_ms': 100},
+    'api_listings': {'queries': 1, 'sql_ms': 25, 'total_ms': 100},
+    'api_category_listings': {'queries': 2, 'sql_ms': 25, 'total_ms': 100},
+    'api_listing': {'queries': 1, 'sql_ms': 10, 'total_ms': 50},
+    'api_listing_bids': {'queries': 2, 'sql_ms': 25, 'total_ms': 100},
+}
+
+REQUEST_BUDGET_STRICT = os.environ.get('REQUEST_BUDGET_STRICT') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per request at INFO, budget overruns at WARNING.
+        'auctions.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
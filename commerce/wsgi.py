@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'commerce.settings')
 
 application = get_wsgi_application()
+
+# Imported once the app registry is ready.
+from auctions.activity import start_flusher  # noqa: E402
+
+start_flusher()